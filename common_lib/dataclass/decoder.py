@@ -0,0 +1,169 @@
+import dataclasses
+import types
+from datetime import datetime, timezone
+from decimal import Decimal
+from enum import Enum
+from functools import lru_cache
+from typing import (
+    Any,
+    Callable,
+    Literal,
+    TypeVar,
+    Union,
+    get_args,
+    get_origin,
+    get_type_hints,
+)
+from uuid import UUID
+
+T = TypeVar("T")
+
+_IDENTITY_TYPES = (dict, list, Any)
+# from_dict 와 같이 type 이 다른 값은 생성자로 변환한다 (예: "2" -> 2)
+_COERCE_TYPES = (str, int, float, bool, Decimal, UUID)
+
+
+class DecodeError(ValueError):
+    def __init__(self, path: str, message: str):
+        ValueError.__init__(self, f"{path}: {message}")
+        self.path = path
+
+
+def _identity(value, path: str):
+    return value
+
+
+def _make_converter(_type) -> Callable[[Any, str], Any]:
+    """
+    field type 에 맞는 변환 함수를 만듭니다. (class 당 한 번만 실행)
+    """
+    if _type in _IDENTITY_TYPES or _type is type(None):
+        return _identity
+
+    if _type in _COERCE_TYPES:
+
+        def convert_scalar(value, path):
+            if isinstance(value, _type):
+                return value
+            try:
+                return _type(value)
+            except (TypeError, ValueError, ArithmeticError) as e:
+                raise DecodeError(
+                    path, f"cannot convert {value!r} to {_type.__name__}"
+                ) from e
+
+        return convert_scalar
+
+    origin = get_origin(_type)
+    args = get_args(_type)
+
+    if origin in (Union, types.UnionType):
+        non_none = [x for x in args if x is not type(None)]
+        if len(non_none) == 1:
+            inner = _make_converter(non_none[0])
+            return lambda value, path: None if value is None else inner(value, path)
+        # 여러 type 의 Union 은 값을 그대로 둔다
+        return _identity
+
+    if origin is Literal:
+        allowed = frozenset(args)
+
+        def convert_literal(value, path):
+            if value not in allowed:
+                raise DecodeError(path, f"{value!r} not in {sorted(map(str, args))}")
+            return value
+
+        return convert_literal
+
+    if origin in (list, tuple, set, frozenset):
+        inner = _make_converter(args[0]) if args else _identity
+        if inner is _identity:
+            return lambda value, path: origin(value)
+        return lambda value, path: origin(
+            inner(x, f"{path}[{i}]") for i, x in enumerate(value)
+        )
+
+    if origin is dict:
+        inner = _make_converter(args[1]) if len(args) == 2 else _identity
+        if inner is _identity:
+            return _identity
+        return lambda value, path: {
+            key: inner(x, f"{path}.{key}") for key, x in value.items()
+        }
+
+    if isinstance(_type, type) and issubclass(_type, Enum):
+        return lambda value, path: _type(value)
+
+    if _type is datetime:
+
+        def convert_datetime(value, path):
+            if isinstance(value, datetime):
+                return value
+            if isinstance(value, (int, float)):
+                # from_dict 는 local timezone 으로 만들지만 같은 시각이다
+                return datetime.fromtimestamp(value, tz=timezone.utc)
+            return datetime.fromisoformat(value)
+
+        return convert_datetime
+
+    if dataclasses.is_dataclass(_type):
+        # 자기 자신을 참조하는 dataclass 가 있으므로 decoder 는 호출 시점에 가져온다
+        return lambda value, path: get_decoder(_type)(value, path)
+
+    return _identity
+
+
+@lru_cache(maxsize=None)
+def get_decoder(cls: type[T]) -> Callable[..., T]:
+    """
+    dict 를 cls (dataclass) 로 바꾸는 decoder 를 만들어서 cache 합니다.
+    dataclasses_json 의 from_dict 를 대신하되, type 분석을 class 당 한 번만 합니다.
+     + dataclasses_json config 의 field_name / letter_case / decoder 를 따릅니다.
+     + str / int / float / bool / Decimal / UUID 는 from_dict 와 같이 type 이 다르면 생성자로 변환합니다. ("2" -> 2)
+     + Enum / 중첩 dataclass 는 변환하고, Literal 은 허용된 값인지 확인합니다.
+     + datetime 은 timestamp 를 UTC timezone 의 datetime 으로 바꿉니다. (from_dict 는 local timezone, 같은 시각)
+       ISO format 문자열도 받습니다.
+     + 여러 type 의 Union 은 변환하지 않습니다. (from_dict 는 dataclass 후보로 변환을 시도함)
+     + 값이 없는 필수 field 는 DecodeError, 모르는 key 는 무시합니다. null 은 그대로 None 입니다.
+    :return: decoder(data: dict, path: str = cls.__name__) -> cls
+    """
+    hints = get_type_hints(cls)
+    class_config = getattr(cls, "dataclass_json_config", None) or {}
+    class_config = class_config.get("dataclasses_json", class_config)
+    fields = []
+    for field in dataclasses.fields(cls):
+        if not field.init:
+            continue
+        config = field.metadata.get("dataclasses_json", {})
+        key = field.name
+        letter_case = config.get("letter_case") or class_config.get("letter_case")
+        if letter_case is not None:
+            key = letter_case(field.name)
+        converter = config.get("decoder")
+        if converter is not None:
+            custom = converter
+            convert = lambda value, path, custom=custom: custom(value)  # noqa: E731
+        else:
+            convert = _make_converter(hints.get(field.name, Any))
+        required = (
+            field.default is dataclasses.MISSING
+            and field.default_factory is dataclasses.MISSING
+        )
+        fields.append((field.name, key, convert, required))
+
+    def decode(data: dict, path: str = cls.__name__) -> T:
+        if not isinstance(data, dict):
+            raise DecodeError(path, f"expected object, got {type(data).__name__}")
+        kwargs = {}
+        for name, key, convert, required in fields:
+            if key in data:
+                value = data[key]
+                if value is None or convert is _identity:
+                    kwargs[name] = value
+                else:
+                    kwargs[name] = convert(value, f"{path}.{key}")
+            elif required:
+                raise DecodeError(f"{path}.{key}", "missing required field")
+        return cls(**kwargs)
+
+    return decode
@@ -0,0 +1,179 @@
+import os
+import threading
+from typing import Optional
+
+import boto3
+from botocore.client import Config
+
+
+class Boto3ClientRegistry:
+    def __init__(self):
+        """
+        process 전체에서 boto3 session / client 를 공유합니다.
+         + client 는 (service, region, endpoint, config) 별로 처음 요청될 때 한 번만 만듭니다. (client 는 thread-safe)
+         + resource 는 thread-safe 하지 않으므로 thread 별로 만듭니다.
+         + queue url / bucket region 조회 결과를 기억해서 instance 를 만들 때마다 요청하지 않습니다.
+        fork 된 자식 process (gunicorn worker 등) 에서는 부모의 client (connection pool) 를 쓰지 않고 새로 만듭니다.
+        """
+        self._reset()
+
+    def _reset(self) -> None:
+        self._pid = os.getpid()
+        self._lock = threading.RLock()
+        self._session: Optional[boto3.session.Session] = None
+        self._clients: dict[tuple, any] = {}
+        self._local = threading.local()
+        self._queue_urls: dict[tuple, str] = {}
+        self._bucket_regions: dict[str, str] = {}
+
+    def _check_fork(self) -> None:
+        if self._pid != os.getpid():
+            self._reset()
+
+    def reset(self) -> None:
+        """
+        모든 client 와 조회 결과를 버립니다. (자격 증명 / endpoint 변경 시, 테스트 용)
+        """
+        self._reset()
+
+    def session(self) -> boto3.session.Session:
+        self._check_fork()
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    self._session = boto3.session.Session()
+        return self._session
+
+    def client(
+        self,
+        service: str,
+        region_name: Optional[str] = None,
+        endpoint_url: Optional[str] = None,
+        read_timeout: Optional[float] = None,
+        connect_timeout: Optional[float] = None,
+        max_pool_connections: Optional[int] = None,
+        max_retry: Optional[int] = None,
+    ):
+        """
+        공유 boto3 client 를 반환합니다. 같은 인자로 다시 요청하면 같은 client 를 반환합니다.
+        :param max_pool_connections: 같은 client 를 여러 thread 가 쓰는 경우 동시 요청 수 이상으로 설정
+        """
+        key = (
+            service,
+            region_name,
+            endpoint_url,
+            read_timeout,
+            connect_timeout,
+            max_pool_connections,
+            max_retry,
+        )
+        self._check_fork()
+        client = self._clients.get(key)
+        if client is not None:
+            return client
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                config = {
+                    "read_timeout": read_timeout,
+                    "connect_timeout": connect_timeout,
+                    "max_pool_connections": max_pool_connections,
+                }
+                config = {k: v for k, v in config.items() if v is not None}
+                if max_retry is not None:
+                    config["retries"] = {"max_attempts": max_retry}
+                # session.client 는 thread-safe 하지 않으므로 lock 안에서 만든다
+                client = self.session().client(
+                    service,
+                    region_name=region_name,
+                    endpoint_url=endpoint_url,
+                    config=Config(**config) if config else None,
+                )
+                self._clients[key] = client
+        return client
+
+    def local_session(self) -> boto3.session.Session:
+        """
+        현재 thread 의 boto3 session 을 반환합니다. (session 은 thread-safe 하지 않음)
+        """
+        self._check_fork()
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = boto3.session.Session()
+        return session
+
+    def resource(
+        self,
+        service: str,
+        region_name: Optional[str] = None,
+        endpoint_url: Optional[str] = None,
+    ):
+        """
+        현재 thread 의 boto3 resource 를 반환합니다.
+        """
+        self._check_fork()
+        resources = getattr(self._local, "resources", None)
+        if resources is None:
+            resources = self._local.resources = {}
+        key = (service, region_name, endpoint_url)
+        resource = resources.get(key)
+        if resource is None:
+            with self._lock:
+                resource = self.session().resource(
+                    service, region_name=region_name, endpoint_url=endpoint_url
+                )
+            resources[key] = resource
+        return resource
+
+    def queue_url(self, client, queue_name: str) -> str:
+        """
+        get_queue_url 결과를 (region, endpoint, queue name) 별로 기억합니다.
+        """
+        meta = getattr(client, "meta", None)
+        key = (
+            getattr(meta, "region_name", None),
+            getattr(meta, "endpoint_url", None),
+            queue_name,
+        )
+        self._check_fork()
+        url = self._queue_urls.get(key)
+        if url is None:
+            url = client.get_queue_url(QueueName=queue_name)["QueueUrl"]
+            self._queue_urls[key] = url
+        return url
+
+    def bucket_region(self, client, bucket: str) -> str:
+        """
+        get_bucket_location 결과를 bucket 별로 기억합니다.
+        LocationConstraint 가 없는 bucket 은 us-east-1 입니다.
+        """
+        self._check_fork()
+        region = self._bucket_regions.get(bucket)
+        if region is None:
+            result = client.get_bucket_location(Bucket=bucket)
+            region = result.get("LocationConstraint") or "us-east-1"
+            self._bucket_regions[bucket] = region
+        return region
+
+
+registry = Boto3ClientRegistry()
+
+if hasattr(os, "register_at_fork"):
+    # pid 확인과 별개로 fork 직후 자식 process 에서 바로 비운다
+    os.register_at_fork(after_in_child=registry.reset)
+
+
+def get_client(service: str, **kwargs):
+    return registry.client(service, **kwargs)
+
+
+def get_resource(service: str, **kwargs):
+    return registry.resource(service, **kwargs)
+
+
+def get_queue_url(client, queue_name: str) -> str:
+    return registry.queue_url(client, queue_name)
+
+
+def get_bucket_region(client, bucket: str) -> str:
+    return registry.bucket_region(client, bucket)
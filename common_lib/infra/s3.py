@@ -1,10 +1,329 @@
-import boto3
-from typing import Tuple, Union
+import errno
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import asdict, dataclass, field
+from typing import BinaryIO, Iterable, Iterator, Optional, Tuple, Union
+
 from botocore.exceptions import ClientError
-from botocore.client import Config
+
+from common_lib.infra.boto3_registry import get_bucket_region, get_client
+from common_lib.log.op_logger import OperationMetrics, RateLimitedLogger
+
+try:
+    import fcntl
+except ImportError:  # windows 에서는 worker 간 eviction lock 없이 동작
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+S3_MIN_PART_SIZE = 5 * 1024 * 1024  # 마지막 part 를 제외한 multipart part 최소 크기
+S3_MAX_PARTS = 10000
+S3_MAX_DELETE_KEYS = 1000  # delete_objects 한 번에 지울 수 있는 최대 key 수
+DEFAULT_PART_SIZE = 16 * 1024 * 1024
+
+
+@dataclass
+class S3TransferResult:
+    key: str
+    num_bytes: int
+    num_parts: int
+    elapsed: float
+    upload_id: Optional[str] = None
+
+    @property
+    def throughput(self) -> float:
+        """MB/s"""
+        return self.num_bytes / 1024 / 1024 / self.elapsed if self.elapsed > 0 else 0.0
+
+
+@dataclass
+class S3BulkResult:
+    succeeded: int = 0  # 삭제 / 저장된 object 수
+    errors: dict[str, str] = field(default_factory=dict)  # key 별 error message
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    def add(self, key: str, error: Optional[str]) -> None:
+        if error is None:
+            self.succeeded += 1
+        else:
+            self.errors[key] = error
+
+
+@dataclass
+class S3CacheStats:
+    hits: int = 0  # S3 요청 없이 disk 에서 읽음
+    revalidated: int = 0  # 조건부 GET (304) 후 disk 에서 읽음
+    misses: int = 0  # S3 에서 내려받음
+    evictions: int = 0  # 삭제된 cache 파일 수
+    errors: int = 0  # disk I/O 오류 (S3 에서 읽는 것으로 대체)
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+class S3DiskCache:
+    def __init__(
+        self,
+        cache_dir: str,
+        max_bytes: int = 10 * 1024 * 1024 * 1024,
+        ttl: float = 300.0,
+        low_watermark: float = 0.9,
+    ):
+        """
+        S3 object 를 local disk 에 저장해두는 read-through cache 입니다.
+        object 는 bucket / key / ETag 로 주소가 정해지므로 object 가 바뀌면 새 파일로 저장됩니다.
+        (bucket, key) 의 최근 ETag 는 ref 파일에 기록하고, ttl 이내에는 S3 요청 없이 disk 에서 읽습니다.
+        ttl 이 지나면 조건부 GET (If-None-Match) 으로 확인해서 바뀌지 않았으면 다시 disk 에서 읽습니다.
+        여러 gunicorn worker 가 같은 cache_dir 을 공유해도 되도록 임시 파일 + rename 으로 쓰고,
+        eviction 은 파일 lock 을 잡은 worker 하나만 수행합니다. (mtime 기준 LRU)
+        :param cache_dir: cache 디렉토리
+        :param max_bytes: cache 최대 크기, 넘으면 max_bytes * low_watermark 까지 오래된 파일부터 삭제
+        :param ttl: S3 확인 없이 cache 를 그대로 사용할 시간 (sec), 0 이면 매번 조건부 GET
+        :param low_watermark: eviction 후 남길 비율
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.low_watermark = low_watermark
+        self.stats = S3CacheStats()
+        self._objects_dir = os.path.join(cache_dir, "objects")
+        self._refs_dir = os.path.join(cache_dir, "refs")
+        os.makedirs(self._objects_dir, exist_ok=True)
+        os.makedirs(self._refs_dir, exist_ok=True)
+        self._lock_path = os.path.join(cache_dir, ".evict.lock")
+        self._lock = threading.Lock()
+        # 마지막 scan 이후 이 process 가 쓴 크기를 더한 추정치 (None 이면 아직 scan 전)
+        self._approx_bytes: Optional[int] = None
+
+    def record(self, **kwargs) -> None:
+        with self._lock:
+            for key, value in kwargs.items():
+                setattr(self.stats, key, getattr(self.stats, key) + value)
+
+    @staticmethod
+    def _hash(*parts: str) -> str:
+        return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
+    def _object_path(self, bucket: str, key: str, etag: str) -> str:
+        return self._ref_object_path(self._hash(bucket, key), etag)
+
+    def _ref_object_path(self, ref_digest: str, etag: str) -> str:
+        # ref 파일 이름과 내용 (ETag) 만으로 object 경로를 알 수 있어야 ref 를 정리할 수 있다
+        digest = self._hash(ref_digest, etag)
+        return os.path.join(self._objects_dir, digest[:2], digest)
+
+    def _ref_path(self, bucket: str, key: str) -> str:
+        digest = self._hash(bucket, key)
+        return os.path.join(self._refs_dir, digest[:2], digest)
+
+    @staticmethod
+    def _atomic_write(path: str, data: bytes) -> None:
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def lookup(self, bucket: str, key: str) -> tuple[Optional[str], bool]:
+        """
+        :return: (cache 된 ETag 또는 None, ttl 이내에 확인되었는지 여부)
+        """
+        try:
+            path = self._ref_path(bucket, key)
+            with open(path, "r") as f:
+                etag = f.read()
+            fresh = time.time() - os.stat(path).st_mtime < self.ttl
+            return etag or None, fresh
+        except FileNotFoundError:
+            return None, False
+
+    def touch(self, bucket: str, key: str) -> None:
+        """
+        (bucket, key) 의 ETag 가 여전히 유효함을 기록합니다.
+        """
+        try:
+            os.utime(self._ref_path(bucket, key))
+        except FileNotFoundError:
+            pass
+
+    def get(self, bucket: str, key: str, etag: str) -> Optional[bytes]:
+        path = self._object_path(bucket, key, etag)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)  # LRU
+            return data
+        except FileNotFoundError:
+            return None
+
+    def put(self, bucket: str, key: str, etag: str, data: bytes) -> None:
+        self._atomic_write(self._object_path(bucket, key, etag), data)
+        self._atomic_write(self._ref_path(bucket, key), etag.encode("utf-8"))
+        with self._lock:
+            if self._approx_bytes is not None:
+                self._approx_bytes += len(data)
+            need_evict = (
+                self._approx_bytes is None or self._approx_bytes > self.max_bytes
+            )
+        if need_evict:
+            self.evict()
+
+    def _scan(self) -> list[tuple[float, int, str]]:
+        entries = []
+        for root, _, files in os.walk(self._objects_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _prune_refs(self) -> None:
+        """
+        object 파일이 삭제된 ref 를 지웁니다.
+        hit 은 ref 의 mtime (ttl 기준) 을 바꾸지 않으므로 mtime 으로 지우면 자주 쓰는 key 의 ref 도 지워진다.
+        """
+        for root, _, files in os.walk(self._refs_dir):
+            for name in files:
+                if name.startswith(".tmp-"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    with open(path, "r") as f:
+                        etag = f.read()
+                    if not os.path.exists(self._ref_object_path(name, etag)):
+                        os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def evict(self) -> int:
+        """
+        cache 크기가 max_bytes 를 넘으면 오래 사용하지 않은 파일부터 삭제합니다.
+        다른 worker 가 eviction 중이면 바로 반환합니다.
+        :return: 삭제한 파일 수
+        """
+        lock_file = open(self._lock_path, "a")
+        try:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError as e:
+                    if e.errno in (errno.EAGAIN, errno.EACCES):
+                        # 추정치가 없으면 put 마다 evict 를 시도하므로 lock 없이 scan 한 크기로 시작한다
+                        if self._approx_bytes is None:
+                            total = sum(size for _, size, _ in self._scan())
+                            with self._lock:
+                                if self._approx_bytes is None:
+                                    self._approx_bytes = total
+                        return 0
+                    raise
+            entries = self._scan()
+            total = sum(size for _, size, _ in entries)
+            evicted = 0
+            if total > self.max_bytes:
+                target = self.max_bytes * self.low_watermark
+                for _, size, path in sorted(entries):
+                    if total <= target:
+                        break
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+                    total -= size
+                    evicted += 1
+            if evicted:
+                self._prune_refs()
+            with self._lock:
+                self._approx_bytes = total
+            self.record(evictions=evicted)
+            return evicted
+        finally:
+            lock_file.close()
+
+
+class S3TransferError(Exception):
+    def __init__(self, message: str, key: str, upload_id: Optional[str] = None):
+        """
+        :param upload_id: abort 하지 않은 multipart upload id (upload_stream(upload_id=...) 로 이어서 올릴 수 있음)
+        """
+        Exception.__init__(self, message)
+        self.key = key
+        self.upload_id = upload_id
+
+
+def _chain_parts(first: bytes, second: bytes, rest: Iterator[bytes]) -> Iterator[bytes]:
+    yield first
+    yield second
+    yield from rest
+
+
+def _body_size(data) -> int:
+    return len(data) if isinstance(data, (bytes, bytearray, str)) else 0
+
+
+def _iter_batches(items: Iterable, size: int) -> Iterator[list]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _iter_parts(
+    source: Union[BinaryIO, Iterable[bytes]], part_size: int
+) -> Iterator[bytes]:
+    """
+    file object 또는 bytes iterator 를 part_size 크기의 part 로 나눕니다. (마지막 part 는 더 작을 수 있음)
+    """
+    if hasattr(source, "read"):
+        while True:
+            data = source.read(part_size)
+            if not data:
+                return
+            # socket 등은 part_size 보다 적게 읽힐 수 있으므로 채워서 보낸다
+            while len(data) < part_size:
+                more = source.read(part_size - len(data))
+                if not more:
+                    break
+                data += more
+            yield data
+            if len(data) < part_size:
+                return
+    else:
+        buffer = bytearray()
+        for chunk in source:
+            buffer += chunk
+            while len(buffer) >= part_size:
+                yield bytes(buffer[:part_size])
+                del buffer[:part_size]
+        if buffer:
+            yield bytes(buffer)
 
 
 class S3:
+    # process 전체에서 공유하는 operation 별 metrics 와 반복 log 를 제한하는 logger
+    metrics = OperationMetrics()
+    op_logger = RateLimitedLogger(logger)
+
     def __init__(
         self,
         bucket,
@@ -12,18 +331,27 @@ class S3:
         boto3_connect_timeout: float = 10.0,
         boto3_max_retry: int = 10,
         boto3_max_pool_connections: int = 30,
+        cache: Optional[S3DiskCache] = None,
+        boto3_s3_client: Optional[any] = None,
     ):
-        self.client = boto3.client(
-            "s3",
-            config=Config(
+        """
+        boto3 client 와 bucket region 은 process 전체에서 공유하므로 요청마다 만들어도 비용이 거의 없습니다.
+        :param cache: (optional) get_file / get_image 에 사용할 S3DiskCache
+        :param boto3_s3_client: (optional) 사용할 boto3 s3 client (기본: boto3_registry 의 공유 client)
+        """
+        self.cache = cache
+        if boto3_s3_client is not None:
+            self.client = boto3_s3_client
+        else:
+            self.client = get_client(
+                "s3",
                 read_timeout=boto3_read_timeout,
                 connect_timeout=boto3_connect_timeout,
                 max_pool_connections=boto3_max_pool_connections,
-                retries={"max_attempts": boto3_max_retry},
-            ),
-        )
+                max_retry=boto3_max_retry,
+            )
         try:
-            result = self.client.get_bucket_location(Bucket=bucket)
+            region_name = get_bucket_region(self.client, bucket)
         except ClientError as e:
             raise Exception(
                 "boto3 client error in get_bucket_location_of_s3: " + e.__str__()
@@ -33,9 +361,19 @@ class S3:
                 "Unexpected error in get_bucket_location_of_s3 function: " + e.__str__()
             )
 
-        self.region_name = result.get("LocationConstraint", "ap-northeast-2")
+        self.region_name = region_name
         self.bucket_name = bucket
 
+    def __log_client_error(self, op: str, e: ClientError, **extra) -> None:
+        error = e.response.get("Error", {})
+        self.op_logger.warning(
+            f"s3_{op}_error",
+            op=op,
+            code=error.get("Code"),
+            error=error.get("Message"),
+            **extra,
+        )
+
     def put_image(
         self,
         img_path: str,
@@ -45,23 +383,91 @@ class S3:
     ) -> Tuple[bool, Union[ClientError, None]]:
         try:
             bucket_name = self.bucket_name if not bucket_name else bucket_name
-            self.client.put_object(
-                Bucket=bucket_name, Key=img_path, Body=data, ContentType=content_type
-            )
+            with self.metrics.track("put_image") as op:
+                self.client.put_object(
+                    Bucket=bucket_name,
+                    Key=img_path,
+                    Body=data,
+                    ContentType=content_type,
+                )
+                op.num_bytes = _body_size(data)
         except ClientError as e:
-            print(e.response["Error"]["Message"])
+            self.__log_client_error("put_image", e, key=img_path)
             return False, e
 
         return True, None
 
+    def __read_object(self, op: str, bucket_name: str, key: str) -> bytes:
+        """
+        cache 가 있으면 cache 를 거쳐서 object 를 읽습니다.
+        cache 오류는 무시하고 S3 에서 읽습니다. S3 의 ClientError 는 그대로 raise 합니다.
+        """
+        if self.cache is None:
+            with self.metrics.track(op) as tracker:
+                result = self.client.get_object(Bucket=bucket_name, Key=key)
+                data = result["Body"].read(result["ContentLength"])
+                tracker.num_bytes = len(data)
+            return data
+
+        cache = self.cache
+        etag = None
+        try:
+            etag, fresh = cache.lookup(bucket_name, key)
+            if etag is not None and fresh:
+                data = cache.get(bucket_name, key, etag)
+                if data is not None:
+                    cache.record(hits=1)
+                    self.metrics.record(f"{op}_cache_hit", 0.0, num_bytes=len(data))
+                    return data
+                etag = None
+        except OSError as e:
+            logger.warning("s3_cache_error", exc_info=e, extra={"key": key})
+            cache.record(errors=1)
+
+        kwargs = {"IfNoneMatch": etag} if etag is not None else {}
+        started_at = time.perf_counter()
+        try:
+            result = self.client.get_object(Bucket=bucket_name, Key=key, **kwargs)
+        except ClientError as e:
+            if etag is None or e.response["Error"]["Code"] not in (
+                "304",
+                "NotModified",
+            ):
+                self.metrics.record(op, time.perf_counter() - started_at, error=True)
+                raise
+            try:
+                data = cache.get(bucket_name, key, etag)
+            except OSError:
+                data = None
+            if data is not None:
+                cache.touch(bucket_name, key)
+                cache.record(revalidated=1)
+                self.metrics.record(
+                    f"{op}_cache_revalidated",
+                    time.perf_counter() - started_at,
+                    num_bytes=len(data),
+                )
+                return data
+            # 검사 사이에 evict 된 경우
+            result = self.client.get_object(Bucket=bucket_name, Key=key)
+
+        data = result["Body"].read(result["ContentLength"])
+        self.metrics.record(op, time.perf_counter() - started_at, num_bytes=len(data))
+        cache.record(misses=1)
+        try:
+            cache.put(bucket_name, key, result["ETag"], data)
+        except OSError as e:
+            logger.warning("s3_cache_error", exc_info=e, extra={"key": key})
+            cache.record(errors=1)
+        return data
+
     def get_image(self, img_path: str, bucket_name: str = None):
         try:
             bucket_name = self.bucket_name if not bucket_name else bucket_name
-            result = self.client.get_object(Bucket=bucket_name, Key=img_path)
-            data = result["Body"].read(result["ContentLength"])
+            data = self.__read_object("get_image", bucket_name, img_path)
 
         except ClientError as e:
-            print(e.response["Error"]["Message"])
+            self.__log_client_error("get_image", e, key=img_path)
             return None
 
         return data
@@ -72,9 +478,11 @@ class S3:
         try:
             bucket_name = self.bucket_name if not bucket_name else bucket_name
             file_path = file_name if folder is None else folder + "/" + file_name
-            self.client.put_object(Bucket=bucket_name, Key=file_path, Body=data)
+            with self.metrics.track("put_file") as op:
+                self.client.put_object(Bucket=bucket_name, Key=file_path, Body=data)
+                op.num_bytes = _body_size(data)
         except ClientError as e:
-            print(e.response["Error"]["Message"])
+            self.__log_client_error("put_file", e, key=file_path)
             raise Exception(e.response["Error"]["Message"])
 
         return (
@@ -88,74 +496,220 @@ class S3:
         try:
             bucket_name = self.bucket_name if not bucket_name else bucket_name
             file_path = path if folder is None else folder + "/" + path
-            self.client.delete_object(Bucket=bucket_name, Key=file_path)
+            with self.metrics.track("rm_file"):
+                self.client.delete_object(Bucket=bucket_name, Key=file_path)
 
-            print("{} DELETED -".format(file_path))
+            self.op_logger.debug("s3_rm_file", bucket=bucket_name, key=file_path)
             return True
 
         except ClientError as e:
-            print(e.response["Error"]["Message"])
+            self.__log_client_error("rm_file", e, key=file_path)
             return False
 
-    def rm_folder(self, folder, bucket_name: str = None):
+    def rm_folder(self, folder, bucket_name: str = None, max_workers: int = 8):
+        """
+        folder (prefix) 아래의 모든 object 를 삭제합니다. (1000 개 이상도 모두 삭제)
+        """
         try:
             bucket_name = self.bucket_name if not bucket_name else bucket_name
-
-            objects_to_delete = self.client.list_objects(
-                Bucket="MyBucket", Prefix=folder
+            result = self.delete_keys(
+                (obj["Key"] for obj in self.iter_objects(folder, bucket_name)),
+                bucket_name=bucket_name,
+                max_workers=max_workers,
+            )
+            if result.errors:
+                logger.error(
+                    "s3_rm_folder_error",
+                    extra={
+                        "bucket": bucket_name,
+                        "prefix": folder,
+                        "deleted": result.succeeded,
+                        "failed": len(result.errors),
+                    },
+                )
+                return False
+            logger.info(
+                "s3_rm_folder",
+                extra={
+                    "bucket": bucket_name,
+                    "prefix": folder,
+                    "deleted": result.succeeded,
+                },
             )
-            delete_keys = dict()
-            delete_keys["Objects"] = [
-                {"Key": k}
-                for k in [obj["Key"] for obj in objects_to_delete.get("Contents", [])]
-            ]
-            self.client.delete_objects(Bucket=bucket_name, Delete=delete_keys)
-            print("{} DELETED -".format(folder))
             return True
 
         except ClientError as e:
-            print(e.response["Error"]["Message"])
+            self.__log_client_error("rm_folder", e, prefix=folder)
             return False
 
     def get_file(self, file_name: str, folder: str = None, bucket_name: str = None):
         try:
             bucket_name = self.bucket_name if not bucket_name else bucket_name
             file_path = file_name if folder is None else folder + "/" + file_name
-            print(bucket_name + "," + file_path)
-            result = self.client.get_object(Bucket=bucket_name, Key=file_path)
-            data = result["Body"].read(result["ContentLength"])
-            return data
+            return self.__read_object("get_file", bucket_name, file_path)
 
         except ClientError as e:
-            print(e.response["Error"]["Message"])
+            self.__log_client_error("get_file", e, key=file_path)
             return None
 
     def exist_file(self, file_name: str, folder: str = None, bucket_name: str = None):
         try:
             bucket_name = self.bucket_name if not bucket_name else bucket_name
             file_path = file_name if folder is None else folder + "/" + file_name
-            print(bucket_name + "," + file_path)
-            res = self.client.list_objects_v2(
-                Bucket=bucket_name, Prefix=file_path, MaxKeys=1
-            )
+            with self.metrics.track("exist_file"):
+                res = self.client.list_objects_v2(
+                    Bucket=bucket_name, Prefix=file_path, MaxKeys=1
+                )
             return "Contents" in res
         except ClientError as e:
-            print(e.response["Error"]["Message"])
+            self.__log_client_error("exist_file", e, key=file_path)
             return None
 
     def get_file_list_all(self, folder: str = "", bucket_name: str = None):
         try:
             bucket_name = self.bucket_name if not bucket_name else bucket_name
             url_encoded_folder = folder
-            print(bucket_name + ", " + url_encoded_folder)
-            pages = self.client.list_objects(
-                Bucket=bucket_name, Prefix=url_encoded_folder
-            )["Contents"]
+            with self.metrics.track("get_file_list_all"):
+                pages = list(self.iter_objects(url_encoded_folder, bucket_name))
             return pages if pages else None
         except ClientError as e:
-            print(e.response["Error"]["Message"])
+            self.__log_client_error("get_file_list_all", e, prefix=folder)
             return None
 
+    def iter_objects(
+        self, prefix: str = "", bucket_name: str = None, page_size: int = 1000
+    ) -> Iterator[dict]:
+        """
+        prefix 아래의 object 를 list_objects_v2 page 단위로 가져오면서 하나씩 돌려줍니다.
+        전체 목록을 메모리에 올리지 않으므로 수백만 개의 object 도 순회할 수 있습니다.
+        :return: list_objects_v2 의 Contents 항목 (Key, Size, ETag, LastModified, ...)
+        """
+        bucket_name = self.bucket_name if not bucket_name else bucket_name
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(
+            Bucket=bucket_name,
+            Prefix=prefix,
+            PaginationConfig={"PageSize": page_size},
+        ):
+            yield from page.get("Contents", [])
+
+    def delete_keys(
+        self,
+        keys: Iterable[str],
+        bucket_name: str = None,
+        max_workers: int = 8,
+        batch_size: int = S3_MAX_DELETE_KEYS,
+    ) -> S3BulkResult:
+        """
+        key 들을 delete_objects 로 batch_size (최대 1000) 개씩 묶어서 병렬로 삭제합니다.
+        keys 는 generator 여도 되며, 동시에 메모리에 올라가는 batch 는 최대 max_workers + 1 개입니다.
+        :return: S3BulkResult (삭제된 수, 실패한 key 별 error)
+        """
+        bucket_name = self.bucket_name if not bucket_name else bucket_name
+        batch_size = min(batch_size, S3_MAX_DELETE_KEYS)
+        result = S3BulkResult()
+
+        def delete_batch(batch: list[str]) -> tuple[int, dict[str, str]]:
+            try:
+                with self.metrics.track("delete_keys"):
+                    response = self.client.delete_objects(
+                        Bucket=bucket_name,
+                        Delete={"Objects": [{"Key": k} for k in batch], "Quiet": True},
+                    )
+            except ClientError as e:
+                self.__log_client_error("delete_keys", e, num_keys=len(batch))
+                return 0, {k: e.response["Error"]["Message"] for k in batch}
+            errors = {
+                x["Key"]: x.get("Message", x["Code"])
+                for x in response.get("Errors", [])
+            }
+            return len(batch) - len(errors), errors
+
+        def collect(done: set[Future]):
+            for future in done:
+                deleted, errors = future.result()
+                result.succeeded += deleted
+                result.errors.update(errors)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending: set[Future] = set()
+            for batch in _iter_batches(keys, batch_size):
+                pending.add(executor.submit(delete_batch, batch))
+                if len(pending) >= max_workers:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(done)
+            collect(wait(pending).done)
+        return result
+
+    def get_many(
+        self, keys: Iterable[str], bucket_name: str = None, max_workers: int = 16
+    ) -> dict[str, Optional[bytes]]:
+        """
+        여러 object 를 병렬로 가져옵니다.
+        :param max_workers: 동시 요청 수 (boto3_max_pool_connections 이하)
+        :return: key 별 data, 가져오지 못한 key 는 None
+        """
+        bucket_name = self.bucket_name if not bucket_name else bucket_name
+
+        def get(key: str) -> Optional[bytes]:
+            try:
+                with self.metrics.track("get_many") as op:
+                    result = self.client.get_object(Bucket=bucket_name, Key=key)
+                    data = result["Body"].read()
+                    op.num_bytes = len(data)
+                return data
+            except ClientError as e:
+                self.__log_client_error("get_many", e, key=key)
+                return None
+
+        keys = list(dict.fromkeys(keys))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return dict(zip(keys, executor.map(get, keys)))
+
+    def put_many(
+        self,
+        items: Union[dict[str, bytes], Iterable[tuple[str, bytes]]],
+        bucket_name: str = None,
+        max_workers: int = 16,
+        content_type: str = None,
+    ) -> S3BulkResult:
+        """
+        여러 object 를 병렬로 저장합니다.
+        :param items: {key: data} 또는 (key, data) iterator
+        :param max_workers: 동시 요청 수 (boto3_max_pool_connections 이하)
+        :return: S3BulkResult (저장된 수, 실패한 key 별 error)
+        """
+        bucket_name = self.bucket_name if not bucket_name else bucket_name
+        if isinstance(items, dict):
+            items = items.items()
+        extra_args = {"ContentType": content_type} if content_type else {}
+        result = S3BulkResult()
+
+        def put(item: tuple[str, bytes]) -> Optional[str]:
+            key, data = item
+            try:
+                with self.metrics.track("put_many") as op:
+                    self.client.put_object(
+                        Bucket=bucket_name, Key=key, Body=data, **extra_args
+                    )
+                    op.num_bytes = _body_size(data)
+                return None
+            except ClientError as e:
+                self.__log_client_error("put_many", e, key=key)
+                return e.response["Error"]["Message"]
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending: dict[Future, str] = {}
+            for item in items:
+                pending[executor.submit(put, item)] = item[0]
+                if len(pending) >= max_workers * 2:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        result.add(pending.pop(future), future.result())
+            for future in wait(pending).done:
+                result.add(pending[future], future.result())
+        return result
+
     def create_multipart_upload(self, bucket_name: str = None, key_name: str = ""):
         bucket_name = self.bucket_name if not bucket_name else bucket_name
         try:
@@ -168,7 +722,7 @@ class S3:
                 else None
             )
         except ClientError as e:
-            print(e.response["Error"]["Message"])
+            self.__log_client_error("create_multipart_upload", e, key=key_name)
             return None
 
     def put_multipart_upload(
@@ -181,16 +735,18 @@ class S3:
     ):
         bucket_name = self.bucket_name if not bucket_name else bucket_name
         try:
-            upload_part_response = self.client.upload_part(
-                Bucket=bucket_name,
-                Key=key_name,
-                PartNumber=part_number,
-                UploadId=upload_id,
-                Body=data,
-            )
+            with self.metrics.track("put_multipart_upload") as op:
+                upload_part_response = self.client.upload_part(
+                    Bucket=bucket_name,
+                    Key=key_name,
+                    PartNumber=part_number,
+                    UploadId=upload_id,
+                    Body=data,
+                )
+                op.num_bytes = _body_size(data)
             return upload_part_response["ETag"] if upload_part_response else None
         except ClientError as e:
-            print(e.response["Error"]["Message"])
+            self.__log_client_error("put_multipart_upload", e, key=key_name)
             return None
 
     def complete_multipart_upload(
@@ -209,7 +765,7 @@ class S3:
                 MultipartUpload=parts,
             )
         except ClientError as e:
-            print(e.response["Error"]["Message"])
+            self.__log_client_error("complete_multipart_upload", e, key=key_name)
             return None
 
     def get_file_add_pre_signed_url(
@@ -227,5 +783,231 @@ class S3:
             )
             return response
         except ClientError as e:
-            print(e.response["Error"]["Message"])
+            self.__log_client_error("get_file_add_pre_signed_url", e, key=key_name)
             return None
+
+    def __retry(self, func, max_attempts: int, *args, **kwargs):
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                if attempt >= max_attempts:
+                    raise
+                time.sleep(0.2 * (2 ** (attempt - 1)))
+
+    def upload_stream(
+        self,
+        source: Union[BinaryIO, Iterable[bytes]],
+        key_name: str,
+        bucket_name: str = None,
+        part_size: int = DEFAULT_PART_SIZE,
+        max_workers: int = 8,
+        max_attempts: int = 3,
+        upload_id: Optional[str] = None,
+        abort_on_failure: bool = True,
+    ) -> S3TransferResult:
+        """
+        file object 또는 bytes iterator 를 multipart upload 로 병렬 전송합니다.
+        동시에 메모리에 올라가는 part 는 최대 max_workers + 1 개입니다. (part_size * (max_workers + 1))
+        part 하나 크기 이하의 작은 데이터는 put_object 한 번으로 올립니다.
+        :param source: 읽을 file object (binary) 또는 bytes iterator
+        :param key_name: 저장할 key
+        :param part_size: part 크기 (최소 5MB, 최대 10000 part)
+        :param max_workers: 동시 upload 수 (boto3_max_pool_connections 이하)
+        :param max_attempts: part 당 최대 시도 횟수
+        :param upload_id: (optional) 실패했던 upload 를 이어서 올릴 때의 upload id.
+                          source 를 처음부터 다시 주면 이미 올라간 part 는 건너뜁니다.
+        :param abort_on_failure: 실패 시 multipart upload 를 abort 할지 여부.
+                                 False 면 S3TransferError.upload_id 로 이어서 올릴 수 있습니다.
+        :return: S3TransferResult
+        """
+        if part_size < S3_MIN_PART_SIZE:
+            raise ValueError(f"part_size must be >= {S3_MIN_PART_SIZE}")
+        bucket_name = self.bucket_name if not bucket_name else bucket_name
+        started_at = time.time()
+        parts_iter = _iter_parts(source, part_size)
+
+        if upload_id is None:
+            first = next(parts_iter, b"")
+            second = next(parts_iter, None)
+            if second is None:
+                self.__retry(
+                    self.client.put_object,
+                    max_attempts,
+                    Bucket=bucket_name,
+                    Key=key_name,
+                    Body=first,
+                )
+                return S3TransferResult(
+                    key_name, len(first), 1, time.time() - started_at
+                )
+            parts_iter = _chain_parts(first, second, parts_iter)
+            upload_id = self.client.create_multipart_upload(
+                Bucket=bucket_name, Key=key_name
+            )["UploadId"]
+            uploaded = {}
+        else:
+            paginator = self.client.get_paginator("list_parts")
+            uploaded = {
+                part["PartNumber"]: part["ETag"]
+                for page in paginator.paginate(
+                    Bucket=bucket_name, Key=key_name, UploadId=upload_id
+                )
+                for part in page.get("Parts", [])
+            }
+
+        def upload_part(part_number: int, data: bytes) -> tuple[int, str]:
+            response = self.__retry(
+                self.client.upload_part,
+                max_attempts,
+                Bucket=bucket_name,
+                Key=key_name,
+                PartNumber=part_number,
+                UploadId=upload_id,
+                Body=data,
+            )
+            return part_number, response["ETag"]
+
+        etags = dict(uploaded)
+        num_bytes = 0
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                pending: set[Future] = set()
+                for part_number, data in enumerate(parts_iter, start=1):
+                    if part_number > S3_MAX_PARTS:
+                        raise ValueError("too many parts, increase part_size")
+                    num_bytes += len(data)
+                    if part_number in uploaded:
+                        continue
+                    pending.add(executor.submit(upload_part, part_number, data))
+                    if len(pending) >= max_workers:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        etags.update(x.result() for x in done)
+                etags.update(x.result() for x in wait(pending).done)
+
+            self.client.complete_multipart_upload(
+                Bucket=bucket_name,
+                Key=key_name,
+                UploadId=upload_id,
+                MultipartUpload={
+                    "Parts": [
+                        {"PartNumber": number, "ETag": etags[number]}
+                        for number in sorted(etags)
+                    ]
+                },
+            )
+        except Exception as e:
+            if abort_on_failure:
+                try:
+                    self.client.abort_multipart_upload(
+                        Bucket=bucket_name, Key=key_name, UploadId=upload_id
+                    )
+                except ClientError as abort_error:
+                    logger.error(
+                        "s3_abort_multipart_upload_error", exc_info=abort_error
+                    )
+            raise S3TransferError(
+                f"failed to upload {key_name}: {e!r}",
+                key=key_name,
+                upload_id=None if abort_on_failure else upload_id,
+            ) from e
+
+        result = S3TransferResult(
+            key_name, num_bytes, len(etags), time.time() - started_at, upload_id
+        )
+        self.metrics.record("upload_stream", result.elapsed, num_bytes=result.num_bytes)
+        logger.info(
+            "s3_upload_stream",
+            extra={
+                "key": key_name,
+                "num_bytes": result.num_bytes,
+                "num_parts": result.num_parts,
+                "throughput_mb": result.throughput,
+            },
+        )
+        return result
+
+    def download_to(
+        self,
+        key_name: str,
+        dest: Union[str, os.PathLike, BinaryIO],
+        bucket_name: str = None,
+        part_size: int = DEFAULT_PART_SIZE,
+        max_workers: int = 8,
+        max_attempts: int = 3,
+    ) -> S3TransferResult:
+        """
+        object 를 part_size 크기의 ranged GET 으로 병렬 download 해서 순서대로 씁니다.
+        동시에 메모리에 올라가는 part 는 최대 max_workers 개입니다. (전체 object 를 메모리에 올리지 않음)
+        모든 range 는 처음 조회한 ETag 와 같아야 하므로 download 중 object 가 바뀌면 실패합니다.
+        :param dest: 저장할 경로 또는 쓰기 가능한 file object (binary).
+                     경로인 경우 임시 파일에 받은 뒤 완료되면 교체하고, 실패하면 임시 파일을 지웁니다.
+        :param part_size: range 크기
+        :param max_workers: 동시 download 수 (boto3_max_pool_connections 이하)
+        :param max_attempts: range 당 최대 시도 횟수
+        :return: S3TransferResult
+        """
+        bucket_name = self.bucket_name if not bucket_name else bucket_name
+        started_at = time.time()
+        head = self.client.head_object(Bucket=bucket_name, Key=key_name)
+        size, etag = head["ContentLength"], head["ETag"]
+        ranges = [
+            (start, min(start + part_size, size) - 1)
+            for start in range(0, size, part_size)
+        ]
+
+        def get_range(start: int, end: int) -> bytes:
+            def _get():
+                result = self.client.get_object(
+                    Bucket=bucket_name,
+                    Key=key_name,
+                    Range=f"bytes={start}-{end}",
+                    IfMatch=etag,
+                )
+                return result["Body"].read()
+
+            return self.__retry(_get, max_attempts)
+
+        if isinstance(dest, (str, os.PathLike)):
+            tmp_path = f"{os.fspath(dest)}.{os.getpid()}.part"
+            try:
+                with open(tmp_path, "wb") as f:
+                    self.__download_ranges(get_range, ranges, f, max_workers)
+                os.replace(tmp_path, dest)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+        else:
+            self.__download_ranges(get_range, ranges, dest, max_workers)
+
+        result = S3TransferResult(key_name, size, len(ranges), time.time() - started_at)
+        self.metrics.record("download_to", result.elapsed, num_bytes=result.num_bytes)
+        logger.info(
+            "s3_download_to",
+            extra={
+                "key": key_name,
+                "num_bytes": result.num_bytes,
+                "num_parts": result.num_parts,
+                "throughput_mb": result.throughput,
+            },
+        )
+        return result
+
+    @staticmethod
+    def __download_ranges(get_range, ranges: list, fileobj: BinaryIO, max_workers: int):
+        """
+        앞에서부터 max_workers 개의 range 만 동시에 받고, 받은 순서와 관계없이 순서대로 씁니다.
+        """
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            window: dict[int, Future] = {}
+            next_submit = 0
+            for idx in range(len(ranges)):
+                while next_submit < len(ranges) and next_submit < idx + max_workers:
+                    window[next_submit] = executor.submit(
+                        get_range, *ranges[next_submit]
+                    )
+                    next_submit += 1
+                fileobj.write(window.pop(idx).result())
@@ -0,0 +1,151 @@
+import itertools
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Iterable, Iterator, Optional
+
+import numpy as np
+from botocore.exceptions import ClientError
+
+from common_lib.infra.boto3_registry import get_client
+from common_lib.models.img_feature import FeatureHashWithObjectKey
+from common_lib.utils.img_feature import deserialize_stacked
+
+logger = logging.getLogger(__name__)
+
+# 재시도해도 결과가 같은 S3 error code
+NON_RETRYABLE_ERROR_CODES = ("NoSuchKey", "NoSuchBucket", "AccessDenied", "404", "403")
+
+
+@dataclass
+class FeatureFetchFailure:
+    feat_hash: str
+    object_key: str
+    error: str
+    attempts: int
+
+
+class FeatureFetchError(Exception):
+    def __init__(self, key: FeatureHashWithObjectKey, attempts: int, cause: Exception):
+        Exception.__init__(self, f"failed to fetch {key.object_key}: {cause!r}")
+        self.key = key
+        self.attempts = attempts
+        self.cause = cause
+
+
+class S3FeatureFetcher:
+    def __init__(
+        self,
+        bucket: str,
+        max_workers: int = 32,
+        max_attempts: int = 3,
+        backoff_seconds: float = 0.2,
+        boto3_read_timeout: float = 20.0,
+        boto3_connect_timeout: float = 10.0,
+        boto3_max_retry: int = 3,
+        boto3_s3_client: Optional[any] = None,
+        feature_dim: Optional[int] = None,
+    ):
+        """
+        get_chunked_keys 결과의 feature proto 들을 병렬로 download 합니다.
+        :param bucket: feature 가 저장된 bucket
+        :param max_workers: 동시 download 수, botocore connection pool 크기도 같은 값으로 맞춥니다
+        :param max_attempts: key 당 최대 시도 횟수 (botocore 자체 retry 와 별개)
+        :param backoff_seconds: 재시도 대기 시간의 기준값 (attempt 마다 2배)
+        :param boto3_s3_client: (optional) 공유할 boto3 s3 client
+        :param feature_dim: (optional) feature 차원, 주어지면 차원이 다른 object 는 실패로 처리합니다
+        """
+        self.bucket = bucket
+        self.max_workers = max_workers
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.feature_dim = feature_dim
+        if boto3_s3_client is not None:
+            self.client = boto3_s3_client
+        else:
+            self.client = get_client(
+                "s3",
+                read_timeout=boto3_read_timeout,
+                connect_timeout=boto3_connect_timeout,
+                max_pool_connections=max_workers,
+                max_retry=boto3_max_retry,
+            )
+        self.failures: list[FeatureFetchFailure] = []
+
+    def _decode(self, data: bytes) -> np.ndarray:
+        feature = deserialize_stacked(data)
+        if feature.ndim != 2 or feature.shape[0] != 3 or feature.shape[1] == 0:
+            raise ValueError(f"invalid feature shape {feature.shape}")
+        if self.feature_dim is not None and feature.shape[1] != self.feature_dim:
+            raise ValueError(
+                f"feature dim {feature.shape[1]} != expected {self.feature_dim}"
+            )
+        return feature
+
+    def _fetch_one(self, key: FeatureHashWithObjectKey) -> tuple[str, np.ndarray]:
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                result = self.client.get_object(Bucket=self.bucket, Key=key.object_key)
+                data = result["Body"].read()
+            except Exception as e:
+                retryable = not (
+                    isinstance(e, ClientError)
+                    and e.response["Error"]["Code"] in NON_RETRYABLE_ERROR_CODES
+                )
+                if not retryable or attempt >= self.max_attempts:
+                    raise FeatureFetchError(key, attempt, e)
+                time.sleep(self.backoff_seconds * (2 ** (attempt - 1)))
+                continue
+            # 깨졌거나 비어있는 object 는 다시 받아도 같으므로 재시도하지 않는다
+            try:
+                return key.feat_hash, self._decode(data)
+            except Exception as e:
+                raise FeatureFetchError(key, attempt, e)
+
+    def _collect(self, futures: Iterable[Future]) -> Iterator[tuple[str, np.ndarray]]:
+        for future in futures:
+            try:
+                yield future.result()
+            except FeatureFetchError as e:
+                self.failures.append(
+                    FeatureFetchFailure(
+                        feat_hash=e.key.feat_hash,
+                        object_key=e.key.object_key,
+                        error=repr(e.cause),
+                        attempts=e.attempts,
+                    )
+                )
+
+    def fetch(
+        self, chunked_keys: Iterable[list[FeatureHashWithObjectKey]]
+    ) -> Iterator[tuple[str, np.ndarray]]:
+        """
+        download 가 끝나는 순서대로 (feat_hash, (3, D) float32 feature) 를 yield 합니다.
+        동시에 진행 중인 요청은 max_workers * 2 개로 제한되며, 실패한 key 는 self.failures 에 모입니다.
+        :param chunked_keys: get_chunked_keys 결과
+        """
+        self.failures = []
+        max_in_flight = self.max_workers * 2
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pending = set()
+            for key in itertools.chain.from_iterable(chunked_keys):
+                pending.add(executor.submit(self._fetch_one, key))
+                if len(pending) >= max_in_flight:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    yield from self._collect(done)
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                yield from self._collect(done)
+
+        if self.failures:
+            logger.warning(
+                "s3_feature_fetch_failed",
+                extra={
+                    "bucket": self.bucket,
+                    "num_failures": len(self.failures),
+                    "object_keys": [x.object_key for x in self.failures[:10]],
+                },
+            )
@@ -1,5 +1,6 @@
 import boto3
 from typing import Optional
+from common_lib.infra.boto3_registry import registry
 from common_lib.utils.singleton import Singleton, initialize_once
 
 
@@ -11,8 +12,8 @@ class S3Session(Singleton):
         self.s3 = None
 
     def initialize(self):
-        self.session = boto3.Session()
-        self.s3 = self.session.client("s3")
+        self.session = registry.session()
+        self.s3 = registry.client("s3")
 
     def get_s3(self):
         if self.s3 is None:
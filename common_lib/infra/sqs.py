@@ -1,14 +1,23 @@
 import json
+import logging
+import time
 import uuid
-from typing import Optional
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Iterator, Optional
 
-import boto3
 from botocore.exceptions import ClientError
-from botocore.client import Config
+
+from common_lib.infra.boto3_registry import get_client, get_queue_url
+from common_lib.log.op_logger import OperationMetrics, RateLimitedLogger
+
+logger = logging.getLogger(__name__)
 
 
 class SQS:
     MAX_SQS_COUNT = 10
+    # process 전체에서 공유하는 operation 별 metrics 와 반복 log 를 제한하는 logger
+    metrics = OperationMetrics()
+    op_logger = RateLimitedLogger(logger)
 
     def __init__(
         self,
@@ -19,19 +28,31 @@ class SQS:
         boto3_max_pool_connections: int = 30,
         boto3_sqs_client: Optional[any] = None,
     ):
+        """
+        boto3 client 와 queue url 은 process 전체에서 공유하므로 요청마다 만들어도 비용이 거의 없습니다.
+        :param boto3_sqs_client: (optional) 사용할 boto3 sqs client (기본: boto3_registry 의 공유 client)
+        """
         if boto3_sqs_client is not None:
             self.sqs = boto3_sqs_client
         else:
-            self.sqs = boto3.client(
+            self.sqs = get_client(
                 "sqs",
-                config=Config(
-                    read_timeout=boto3_read_timeout,
-                    connect_timeout=boto3_connect_timeout,
-                    max_pool_connections=boto3_max_pool_connections,
-                    retries={"max_attempts": boto3_max_retry},
-                ),
+                read_timeout=boto3_read_timeout,
+                connect_timeout=boto3_connect_timeout,
+                max_pool_connections=boto3_max_pool_connections,
+                max_retry=boto3_max_retry,
             )
-        self.sqs_url = self.sqs.get_queue_url(QueueName=que_name)
+        self.sqs_url = {"QueueUrl": get_queue_url(self.sqs, que_name)}
+
+    def __log_client_error(self, op: str, e: ClientError) -> None:
+        error = e.response.get("Error", {})
+        self.op_logger.warning(
+            f"sqs_{op}_error",
+            op=op,
+            queue_url=self.sqs_url["QueueUrl"],
+            code=error.get("Code"),
+            error=error.get("Message"),
+        )
 
     def send_message(self, message):
         """
@@ -96,12 +117,13 @@ class SQS:
         """
         response = dict()
         try:
-            response = self.sqs.receive_message(
-                QueueUrl=self.sqs_url["QueueUrl"],
-                AttributeNames=["ApproximateReceiveCount"],
-            )
+            with self.metrics.track("receive_message"):
+                response = self.sqs.receive_message(
+                    QueueUrl=self.sqs_url["QueueUrl"],
+                    AttributeNames=["ApproximateReceiveCount"],
+                )
         except ClientError as e:
-            print(e.response["Error"]["Message"])
+            self.__log_client_error("receive_message", e)
         message = response.get("Messages", [dict()])
         return message[0]
 
@@ -140,17 +162,23 @@ class SQS:
         """
         response = dict()
         try:
-            response = self.sqs.receive_message(
-                QueueUrl=self.sqs_url["QueueUrl"],
-                AttributeNames=["ApproximateReceiveCount"],
-                MaxNumberOfMessages=SQS.MAX_SQS_COUNT,
-            )
+            with self.metrics.track("receive_message_batch"):
+                response = self.sqs.receive_message(
+                    QueueUrl=self.sqs_url["QueueUrl"],
+                    AttributeNames=["ApproximateReceiveCount"],
+                    MaxNumberOfMessages=SQS.MAX_SQS_COUNT,
+                )
         except ClientError as e:
-            print(e.response["Error"]["Message"])
+            self.__log_client_error("receive_message_batch", e)
         messages = response.get("Messages", list())
         return messages
 
-    def receive_message_batch_no_wait(self, max_num) -> list:
+    def receive_message_batch_no_wait(
+        self,
+        max_num,
+        max_workers: int = 1,
+        deadline_seconds: Optional[float] = None,
+    ) -> list:
         """
         Default getting message number is 1
         Raw received message is like below
@@ -175,6 +203,9 @@ class SQS:
             'RetryAttempts': 0
           }
         }
+        :param max_num: 최대로 가져올 message 수
+        :param max_workers: 동시에 진행할 receive 요청 수 (1 이면 기존처럼 순차로 가져옴)
+        :param deadline_seconds: (optional) 이 시간 (sec) 이 지나면 새 receive 요청을 보내지 않음
         :return: A message dict from 'Messages' list
         {
           'Body': '{...}',
@@ -183,6 +214,14 @@ class SQS:
           'ReceiptHandle': 'AQEBiXQ3h.....Ob/XJVzmoFog=='
         }
         """
+        if max_workers > 1 or deadline_seconds is not None:
+            results = list()
+            for messages in self.iter_message_batches(
+                max_num, max_workers=max_workers, deadline_seconds=deadline_seconds
+            ):
+                results += messages
+            return results
+
         results = list()
         while True:
             message_count = min(max_num, SQS.MAX_SQS_COUNT)
@@ -203,6 +242,64 @@ class SQS:
                 break
         return results
 
+    def iter_message_batches(
+        self,
+        max_num: int,
+        max_workers: int = 4,
+        deadline_seconds: Optional[float] = None,
+    ) -> Iterator[list]:
+        """
+        WaitTimeSeconds=0 receive 요청을 max_workers 개씩 동시에 보내서 쌓여있는 message 를 가져옵니다.
+        응답이 오는 순서대로 batch (최대 10개) 를 yield 하므로 첫 batch 부터 바로 처리할 수 있습니다.
+        진행 중인 요청은 최대 max_workers 개이므로 메모리에 올라오는 message 는 yield 된 batch 외에
+        최대 max_workers * 10 개입니다.
+        max_num 만큼 가져오거나, 빈 응답을 받거나, deadline_seconds 가 지나면 새 요청을 멈춥니다.
+        generator 를 중간에 닫으면 이미 받은 message 는 처리되지 않고 visibility timeout 이후 다시 보입니다.
+        :param max_num: 최대로 가져올 message 수
+        :param max_workers: 동시에 진행할 receive 요청 수 (boto3 max_pool_connections 이하)
+        :param deadline_seconds: (optional) 이 시간 (sec) 이 지나면 새 receive 요청을 보내지 않음
+        :return: receive_message 의 'Messages' list 를 batch 단위로 yield
+        """
+        deadline = None if deadline_seconds is None else time.time() + deadline_seconds
+        remaining = max_num  # 아직 요청하지 않은 message 수
+        drained = False
+
+        def receive(count: int) -> list:
+            with self.metrics.track("receive_message_batch"):
+                response = self.sqs.receive_message(
+                    QueueUrl=self.sqs_url["QueueUrl"],
+                    AttributeNames=["ApproximateReceiveCount"],
+                    MaxNumberOfMessages=count,
+                    WaitTimeSeconds=0,
+                )
+            return response.get("Messages", list())
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = dict()
+            while True:
+                while (
+                    not drained
+                    and remaining > 0
+                    and len(pending) < max_workers
+                    and (deadline is None or time.time() < deadline)
+                ):
+                    count = min(remaining, SQS.MAX_SQS_COUNT)
+                    pending[executor.submit(receive, count)] = count
+                    remaining -= count
+                if not pending:
+                    break
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    count = pending.pop(future)
+                    messages = future.result()
+                    # 요청한 만큼 받지 못한 수량은 다시 요청할 수 있다
+                    remaining += count - len(messages)
+                    if messages:
+                        yield messages
+                    else:
+                        drained = True
+
     def delete_message(self, message):
         self.sqs.delete_message(
             QueueUrl=self.sqs_url["QueueUrl"],
@@ -231,11 +328,12 @@ class SQS:
     def get_queue_attributes(self):
         response = None
         try:
-            response = self.sqs.get_queue_attributes(
-                QueueUrl=self.sqs_url["QueueUrl"], AttributeNames=["All"]
-            )
+            with self.metrics.track("get_queue_attributes"):
+                response = self.sqs.get_queue_attributes(
+                    QueueUrl=self.sqs_url["QueueUrl"], AttributeNames=["All"]
+                )
         except ClientError as e:
-            print(e.response["Error"]["Message"])
+            self.__log_client_error("get_queue_attributes", e)
         messages = None
         if response:
             messages = response.get("Attributes", None)
@@ -0,0 +1,281 @@
+import asyncio
+import contextlib
+import logging
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Optional
+
+from common_lib.errors import ErrorWithExtraInfo
+from common_lib.errors.exception import ExtraModel
+from common_lib.infra.sqs_bulk import (
+    PACKING_SEQUENTIAL,
+    RECEIVE_ATTRIBUTE_NAMES,
+    RECEIVE_MESSAGE_ATTRIBUTE_NAMES,
+    SQS_MAX_ENTRIES,
+    ChunkSendState,
+    PublishBatchResult,
+    decode_bodies,
+    encode_bodies,
+    make_message_header,
+    make_publish_chunks,
+    merge_publish_results,
+)
+from common_lib.infra.sqs_codec import MessageCodec
+from common_lib.infra.sqs_payload import S3PayloadStore
+from common_lib.models.message import ModelMessage, ModelMessageHeader
+
+try:
+    from aiobotocore.config import AioConfig
+    from aiobotocore.session import get_session
+except ImportError:  # client 를 직접 주입하는 경우에는 필요 없음
+    AioConfig = None
+    get_session = None
+
+logger = logging.getLogger(__name__)
+
+
+@contextlib.asynccontextmanager
+async def create_async_sqs_client(
+    endpoint_url: Optional[str] = None,
+    region_name: Optional[str] = None,
+    read_timeout: float = 30.0,
+    connect_timeout: float = 10.0,
+    max_pool_connections: int = 50,
+    max_retry: int = 3,
+) -> AsyncIterator[any]:
+    """
+    aiobotocore SQS client 를 생성합니다. 여러 AsyncSQSClient 에 같은 client 를 주면
+    하나의 HTTP connection pool 을 공유합니다.
+    read_timeout 은 long polling 시간 (최대 20초) 보다 길어야 합니다.
+    :param endpoint_url: (optional) ElasticMQ / localstack 등 local queue 주소
+    :param max_pool_connections: 동시에 진행할 수 있는 요청 수 (= 동시 long poll 수)
+    """
+    if get_session is None:
+        raise ImportError("create_async_sqs_client requires the 'aiobotocore' package")
+    session = get_session()
+    async with session.create_client(
+        "sqs",
+        endpoint_url=endpoint_url,
+        region_name=region_name,
+        config=AioConfig(
+            read_timeout=read_timeout,
+            connect_timeout=connect_timeout,
+            max_pool_connections=max_pool_connections,
+            retries={"max_attempts": max_retry},
+        ),
+    ) as client:
+        yield client
+
+
+class AsyncSQSClient:
+    def __init__(
+        self,
+        sqs_name: str,
+        client: any,
+        max_num_of_message: int = 10,
+        wait_time_seconds: int = 20,
+        codec: Optional[MessageCodec] = None,
+        payload_store: Optional[S3PayloadStore] = None,
+    ):
+        """
+        SQSClient 와 같은 interface 의 asyncio client. long poll 동안 thread 를 점유하지 않으므로
+        하나의 event loop 에서 여러 queue 를 동시에 polling 할 수 있습니다.
+        사용 전에 open() 으로 queue url 을 조회해야 합니다. (또는 AsyncSQSClient.create)
+        :param sqs_name: SQS Queue Name
+        :param client: create_async_sqs_client 로 만든 aiobotocore client
+                       (또는 같은 method 를 가진 async 객체, test 용 local queue 등)
+        :param max_num_of_message: 동시에 수신할 message 수 (최대 10 을 넘으면 여러 번 receive)
+        :param wait_time_seconds: long pooling 시 최대로 wait 할 시간: (기본: 20, 최소: 0, 최대: 20)
+        :param codec: (optional) publish 하는 body 압축 codec
+        :param payload_store: (optional) 큰 body 를 S3 에 저장할 store (S3 호출은 thread 에서 실행)
+        """
+        self.sqs_name = sqs_name
+        self.client = client
+        self.max_num_of_message = max_num_of_message
+        self.wait_time_seconds = wait_time_seconds
+        self.codec = codec
+        self.payload_store = payload_store
+        self.queue_url: Optional[str] = None
+
+    @classmethod
+    async def create(cls, sqs_name: str, client: any, **kwargs) -> "AsyncSQSClient":
+        sqs = cls(sqs_name, client, **kwargs)
+        await sqs.open()
+        return sqs
+
+    async def open(self) -> None:
+        response = await self.client.get_queue_url(QueueName=self.sqs_name)
+        self.queue_url = response["QueueUrl"]
+
+    async def __recv_up_to(
+        self, max_num_of_message: int, wait_time_seconds: int
+    ) -> list[dict]:
+        msgs = []
+        while len(msgs) < max_num_of_message:
+            response = await self.client.receive_message(
+                QueueUrl=self.queue_url,
+                AttributeNames=RECEIVE_ATTRIBUTE_NAMES,
+                MessageAttributeNames=RECEIVE_MESSAGE_ATTRIBUTE_NAMES,
+                MaxNumberOfMessages=min(
+                    max_num_of_message - len(msgs), SQS_MAX_ENTRIES
+                ),
+                # 첫 요청만 long polling, 이후는 이미 쌓인 message 만 가져온다
+                WaitTimeSeconds=wait_time_seconds if not msgs else 0,
+            )
+            _msgs = response.get("Messages", [])
+            if not _msgs:
+                break
+            msgs.extend(_msgs)
+        return msgs
+
+    def _parse(self, msg: dict) -> ModelMessage:
+        header = make_message_header(
+            msg["MessageId"],
+            self.queue_url,
+            msg["ReceiptHandle"],
+            dict(msg.get("Attributes", {})),
+            msg.get("MessageAttributes"),
+        )
+        return ModelMessage(header=header, body=msg["Body"])
+
+    async def recv(
+        self, timeout: int = None, wait_time_seconds: int = None
+    ) -> list[ModelMessage]:
+        """
+        Receive message from SQS (SQSClient.recv 와 같은 동작)
+        :param timeout: (optional) Timeout이 None이 아닐 경우, sent time 기준으로 timeout 된 message는 처리 없이 삭제함
+        :param wait_time_seconds: (optional) Long pooling 제어를 위한 파라메터
+        """
+        if wait_time_seconds is None:
+            wait_time_seconds = self.wait_time_seconds
+        msgs = await self.__recv_up_to(self.max_num_of_message, wait_time_seconds)
+
+        parsed_messages = []
+        message_attributes = []
+        for msg in msgs:
+            message = self._parse(msg)
+            if timeout is not None:
+                timeout_at = message.header.attributes["SentTimestamp"] + timedelta(
+                    seconds=timeout
+                )
+                if datetime.now() >= timeout_at:
+                    await self.ack(message.header)
+                    raise TimeoutError(
+                        f"[msg_id: {message.header.id}] Message Timeout (> {timeout} sec), dropped"
+                    )
+            parsed_messages.append(message)
+            message_attributes.append(msg.get("MessageAttributes"))
+
+        if self.payload_store is not None:
+            # S3 download 는 thread 에서 실행한다
+            parsed_messages = await asyncio.to_thread(
+                decode_bodies, parsed_messages, message_attributes, self.payload_store
+            )
+        elif any(message_attributes):
+            parsed_messages = decode_bodies(parsed_messages, message_attributes, None)
+        return parsed_messages
+
+    async def ack(self, message_header: ModelMessageHeader) -> None:
+        await self.client.delete_message(
+            QueueUrl=self.queue_url, ReceiptHandle=message_header.handle
+        )
+
+    async def ack_batch(self, message_headers: list[ModelMessageHeader]) -> None:
+        """
+        10개씩 나누어 동시에 삭제합니다.
+        """
+        await asyncio.gather(
+            *(
+                self.client.delete_message_batch(
+                    QueueUrl=self.queue_url,
+                    Entries=[
+                        {"Id": x.id, "ReceiptHandle": x.handle}
+                        for x in message_headers[sp : sp + SQS_MAX_ENTRIES]
+                    ],
+                )
+                for sp in range(0, len(message_headers), SQS_MAX_ENTRIES)
+            )
+        )
+
+    async def __encode_bodies(
+        self, bodies: list[str]
+    ) -> tuple[list[str], list[dict], list[int]]:
+        if self.payload_store is None:
+            return encode_bodies(bodies, self.codec, None)
+        # S3 upload 는 thread 에서 실행한다
+        return await asyncio.to_thread(
+            encode_bodies, bodies, self.codec, self.payload_store
+        )
+
+    async def publish(self, body: str) -> dict:
+        bodies, attributes, _ = await self.__encode_bodies([body])
+        kwargs = {"MessageAttributes": attributes[0]} if attributes[0] else {}
+        return await self.client.send_message(
+            QueueUrl=self.queue_url, MessageBody=bodies[0], DelaySeconds=0, **kwargs
+        )
+
+    async def __send_chunk_with_retry(
+        self,
+        bodies: list[str],
+        attributes: list[dict],
+        chunk: list[int],
+        semaphore: asyncio.Semaphore,
+        max_attempts: int,
+        backoff_seconds: float,
+    ) -> PublishBatchResult:
+        state = ChunkSendState(bodies, attributes, chunk, max_attempts, backoff_seconds)
+        while (entries := state.next_entries()) is not None:
+            try:
+                async with semaphore:
+                    delay = state.on_response(
+                        await self.client.send_message_batch(
+                            QueueUrl=self.queue_url, Entries=entries
+                        )
+                    )
+            except Exception as e:
+                delay = state.on_error(e)
+            if delay:
+                await asyncio.sleep(delay)
+        return state.result
+
+    async def publish_batch(
+        self,
+        bodies: list[str],
+        logger=None,
+        packing: str = PACKING_SEQUENTIAL,
+        max_concurrency: int = 8,
+        max_attempts: int = 3,
+        backoff_seconds: float = 0.2,
+        raise_on_failure: bool = True,
+    ) -> PublishBatchResult:
+        """
+        SQSClient.publish_batch_concurrent 와 같은 방식으로 chunk 를 동시에 보냅니다.
+        :param max_concurrency: 동시에 진행할 send_message_batch 호출 수
+        :param raise_on_failure: 재시도 후에도 실패한 message 가 있으면 ErrorWithExtraInfo 발생
+        :return: PublishBatchResult
+        """
+        bodies, attributes, sizes = await self.__encode_bodies(bodies)
+        semaphore = asyncio.Semaphore(max_concurrency)
+        chunk_results = await asyncio.gather(
+            *(
+                self.__send_chunk_with_retry(
+                    bodies, attributes, chunk, semaphore, max_attempts, backoff_seconds
+                )
+                for chunk in make_publish_chunks(sizes, packing=packing)
+            )
+        )
+        result = merge_publish_results(chunk_results)
+
+        if result.failed:
+            extra = {
+                "queue": self.sqs_name,
+                "num_sent": len(result.sent),
+                "num_failed": len(result.failed),
+                "failed": [vars(x) for x in result.failed[:10]],
+            }
+            if logger:
+                logger.error("publish_batch_error", extra=extra)
+            if raise_on_failure:
+                raise ErrorWithExtraInfo(
+                    message="publish_batch_error", extra=ExtraModel(etc=extra)
+                )
+        return result
@@ -1,18 +1,421 @@
+import logging
 import math
+import time
 import uuid
-from base64 import b64encode
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta
-from typing import NamedTuple, Optional
+from typing import Optional
 
-import boto3
+import ujson
 from botocore.exceptions import ClientError
 
+from common_lib.dataclass.decoder import get_decoder
 from common_lib.errors import ErrorWithExtraInfo
 from common_lib.errors.exception import ExtraModel
-from common_lib.models.message import ModelMessage, ModelMessageHeader
+from common_lib.infra.boto3_registry import registry
+from common_lib.infra.sqs_codec import (
+    CODEC_ATTRIBUTE,
+    MessageCodec,
+    decode_body,
+    message_attributes_size,
+)
+from common_lib.infra.sqs_payload import S3PayloadStore
+from common_lib.models.message import (
+    MessageDecodeFailure,
+    ModelMessage,
+    ModelMessageHeader,
+    TypedMessageSet,
+)
+
+logger = logging.getLogger(__name__)
 
 SQS_MAX_BYTES = 180 * 1024  # 256 KB - 5KB (여유분)
+SQS_MAX_BATCH_BYTES = 256 * 1024  # SQS Max payload size (batch 합계)
 SQS_MAX_ENTRIES = 10  # SQS Max entry size
+SQS_MAX_DELAY_SECONDS = 15 * 60  # SQS Max DelaySeconds
+SQS_MAX_MESSAGE_ATTRIBUTES = 10  # SQS Max message attributes per message
+
+RETRY_COUNT_ATTRIBUTE = "retry-count"
+DEAD_LETTER_REASON_ATTRIBUTE = "dead-letter-reason"
+DEAD_LETTER_SOURCE_ATTRIBUTE = "dead-letter-source"
+RECEIVE_MESSAGE_ATTRIBUTE_NAMES = [CODEC_ATTRIBUTE, RETRY_COUNT_ATTRIBUTE]
+# retry_later / DLQ 로 다시 보낼 때 producer 가 붙인 attribute 도 그대로 보내야 하므로 전부 받는다
+ALL_MESSAGE_ATTRIBUTE_NAMES = ["All"]
+RECEIVE_ATTRIBUTE_NAMES = [
+    "ApproximateFirstReceiveTimestamp",
+    "SentTimestamp",
+    "ApproximateReceiveCount",
+]
+
+DEAD_LETTER_EXPIRED = "expired"
+DEAD_LETTER_POISON = "poison"
+
+PACKING_SEQUENTIAL = "sequential"
+PACKING_DECREASING = "decreasing"
+
+
+def utf8_size(body: str) -> int:
+    """
+    body 의 UTF-8 byte 수. ASCII 문자열은 encode 하지 않고 길이만 사용한다.
+    """
+    if body.isascii():
+        return len(body)
+    return len(body.encode("utf-8"))
+
+
+def _find_root(parent: list[int], pos: int) -> int:
+    """
+    parent 를 따라가서 자기 자신을 가리키는 위치를 찾고, 지나온 경로를 root 로 바로 잇는다. (path compression)
+    """
+    root = pos
+    while parent[root] != root:
+        root = parent[root]
+    while parent[pos] != root:
+        parent[pos], pos = root, parent[pos]
+    return root
+
+
+def make_publish_chunks(
+    sizes: list[int],
+    max_bytes: int = SQS_MAX_BATCH_BYTES,
+    max_entries: int = SQS_MAX_ENTRIES,
+    packing: str = PACKING_SEQUENTIAL,
+) -> list[list[int]]:
+    """
+    message 크기 목록을 batch 단위 index 목록으로 나눈다.
+     + PACKING_SEQUENTIAL: 입력 순서대로 채우다가 개수/크기 제한을 넘기 직전에 자른다. O(n)
+     + PACKING_DECREASING: first-fit-decreasing 변형. batch 마다 남은 slot 을 작은 message 로
+       채울 여유를 두고 큰 message 부터 넣는다. 개수 제한(10)과 크기 제한을 함께 고려하기 때문에
+       크기가 제각각인 경우 send_messages 호출 수가 줄어든다. 순서는 보장하지 않는다. O(n log n)
+    :param sizes: message 별 byte 수
+    :return: batch 별 index 목록
+    """
+    oversized = [idx for idx, size in enumerate(sizes) if size > max_bytes]
+    if oversized:
+        raise ValueError(
+            f"message size exceeds {max_bytes} bytes: index {oversized[:10]}"
+        )
+
+    if packing == PACKING_SEQUENTIAL:
+        chunks, chunk, chunk_bytes = [], [], 0
+        for idx, size in enumerate(sizes):
+            if len(chunk) >= max_entries or chunk_bytes + size > max_bytes:
+                chunks.append(chunk)
+                chunk, chunk_bytes = [], 0
+            chunk.append(idx)
+            chunk_bytes += size
+        if chunk:
+            chunks.append(chunk)
+        return chunks
+
+    if packing == PACKING_DECREASING:
+        order = sorted(range(len(sizes)), key=sizes.__getitem__)
+        sorted_sizes = [sizes[idx] for idx in order]
+        # 꺼낸 message 는 목록에서 지우지 않고 건너뛴다. (list.pop 은 O(n) 이라 전체 O(n^2))
+        # lower[pos + 1] / upper[pos] 는 pos 이하 / 이상에서 아직 남은 가장 가까운 위치로 이어진다
+        lower = list(range(len(order) + 1))  # 0 은 남은 것이 없음
+        upper = list(range(len(order) + 1))  # len(order) 는 남은 것이 없음
+        chunks = []
+        num_remaining = len(order)
+        while num_remaining:
+            chunk, capacity = [], max_bytes
+            while num_remaining and len(chunk) < max_entries:
+                # 남은 slot 을 가장 작은 message 들로 채울 수 있을 만큼 byte 를 남겨두고
+                # 그 안에 들어가는 가장 큰 message 를 고른다
+                reserved, pos = 0, _find_root(upper, 0)
+                for _ in range(max_entries - len(chunk) - 1):
+                    if pos == len(order):
+                        break
+                    reserved += sorted_sizes[pos]
+                    pos = _find_root(upper, pos + 1)
+                pos = _find_root(lower, bisect_right(sorted_sizes, capacity - reserved))
+                if pos == 0:
+                    pos = _find_root(lower, bisect_right(sorted_sizes, capacity))
+                    if pos == 0:
+                        break
+                lower[pos], upper[pos - 1] = pos - 1, pos
+                chunk.append(order[pos - 1])
+                capacity -= sorted_sizes[pos - 1]
+                num_remaining -= 1
+            chunks.append(chunk)
+        return chunks
+
+    raise ValueError(f"unknown packing: {packing}")
+
+
+@dataclass
+class PublishFailure:
+    index: int  # publish 요청한 bodies 에서의 index
+    code: str
+    message: str
+    sender_fault: bool
+    attempts: int
+
+
+@dataclass
+class PublishBatchResult:
+    sent: dict[int, str] = field(default_factory=dict)  # index -> SQS MessageId
+    failed: list[PublishFailure] = field(default_factory=list)
+    num_calls: int = 0
+
+    @property
+    def ok(self) -> bool:
+        return not self.failed
+
+    @property
+    def failed_indices(self) -> list[int]:
+        return sorted(x.index for x in self.failed)
+
+
+@dataclass
+class RecvPolicy:
+    """
+    recv 에서 처리하지 않을 message 를 다루는 방법
+     + expired: recv(timeout=...) 기준으로 timeout 된 message
+     + poison: num_trial 이 max_trials 를 넘은 message
+    dead_letter_queue 가 있으면 그 queue 로 옮기고, 없으면 ack 해서 버린다.
+    DLQ 로 옮기는 message 는 받은 body 와 모든 message attribute 에 dead-letter-reason / dead-letter-source 를 붙여서 보낸다.
+    retry_later 는 retry_base_delay * 2^(num_trial - 1) (최대 retry_max_delay) 초 뒤에 다시 보이도록 재전송한다.
+    """
+
+    max_trials: Optional[int] = None
+    dead_letter_queue: Optional["SQSClient"] = None
+    expired_to_dlq: bool = False  # False 면 expired message 는 DLQ 로 보내지 않고 버린다
+    retry_base_delay: int = 5
+    retry_max_delay: int = SQS_MAX_DELAY_SECONDS
+
+    def classify(
+        self, header: ModelMessageHeader, timeout: Optional[int], now: datetime
+    ) -> Optional[str]:
+        if timeout is not None and "SentTimestamp" in header.attributes:
+            if now >= header.attributes["SentTimestamp"] + timedelta(seconds=timeout):
+                return DEAD_LETTER_EXPIRED
+        if self.max_trials is not None and header.num_trial > self.max_trials:
+            return DEAD_LETTER_POISON
+        return None
+
+    def retry_delay(self, num_trial: int) -> int:
+        delay = self.retry_base_delay * (2 ** max(num_trial - 1, 0))
+        return int(min(delay, self.retry_max_delay, SQS_MAX_DELAY_SECONDS))
+
+
+def _copy_message_attributes(attributes: Optional[dict]) -> dict:
+    return {
+        name: {
+            key: value[key]
+            for key in ("DataType", "StringValue", "BinaryValue")
+            if value.get(key) is not None
+        }
+        for name, value in (attributes or {}).items()
+    }
+
+
+def _put_message_attribute(
+    attributes: dict, name: str, value: str, data_type: str = "String"
+) -> None:
+    """
+    attribute 개수 제한을 넘지 않을 때만 붙인다. (이미 있는 이름은 덮어씀, producer 의 attribute 를 우선)
+    """
+    if name in attributes or len(attributes) < SQS_MAX_MESSAGE_ATTRIBUTES:
+        attributes[name] = {"DataType": data_type, "StringValue": value}
+
+
+# 아래 helper 들은 SQSClient 와 AsyncSQSClient 가 함께 사용한다. (I/O 는 호출한 쪽에서)
+
+
+def make_entry(entry_id: str, body: str, attributes: dict) -> dict:
+    entry = {"Id": entry_id, "MessageBody": body}
+    if attributes:
+        entry["MessageAttributes"] = attributes
+    return entry
+
+
+def make_message_header(
+    message_id: str,
+    queue_url: str,
+    receipt_handle: str,
+    attributes: dict,
+    message_attributes: Optional[dict],
+) -> ModelMessageHeader:
+    """
+    receive_message 의 message 로 header 를 만듭니다.
+    timestamp attribute 는 datetime 으로 바꾸고, retry_later 로 재전송된 message 는
+    RETRY_COUNT_ATTRIBUTE 만큼 이전 시도 횟수를 num_trial 에 더합니다.
+    """
+    for name in ("ApproximateFirstReceiveTimestamp", "SentTimestamp"):
+        if name in attributes:
+            attributes[name] = datetime.fromtimestamp(float(attributes[name]) / 1000)
+    header = ModelMessageHeader(
+        id=message_id,
+        queue_url=queue_url,
+        handle=receipt_handle,
+        attributes=attributes,
+        num_trial=int(attributes.get("ApproximateReceiveCount", "1")),
+        message_attributes=message_attributes,
+    )
+    if message_attributes and RETRY_COUNT_ATTRIBUTE in message_attributes:
+        header.num_trial += int(
+            message_attributes[RETRY_COUNT_ATTRIBUTE]["StringValue"]
+        )
+    return header
+
+
+def encode_bodies(
+    bodies: list[str],
+    codec: Optional[MessageCodec],
+    payload_store: Optional[S3PayloadStore],
+) -> tuple[list[str], list[dict], list[int]]:
+    """
+    publish 전에 body 를 압축하고 (codec), 그래도 큰 body 는 S3 로 보냅니다. (payload_store)
+    payload_store 가 있으면 S3 upload 가 일어나므로 async 에서는 thread 에서 실행합니다.
+    :return: (보낼 body, MessageAttributes, SQS 기준 entry 크기) 목록
+    """
+    if codec is not None:
+        encoded = [codec.encode(x) for x in bodies]
+        bodies = [body for body, _ in encoded]
+        attributes = [attrs for _, attrs in encoded]
+    else:
+        attributes = [{} for _ in bodies]
+    sizes = [utf8_size(x) for x in bodies]
+    if payload_store is not None:
+        bodies = payload_store.offload_many(bodies, sizes)
+        sizes = [utf8_size(x) for x in bodies]
+    sizes = [
+        size + message_attributes_size(attrs) for size, attrs in zip(sizes, attributes)
+    ]
+    return bodies, attributes, sizes
+
+
+def decode_bodies(
+    messages: list[ModelMessage],
+    message_attributes: list[Optional[dict]],
+    payload_store: Optional[S3PayloadStore],
+) -> list[ModelMessage]:
+    """
+    S3 pointer body 를 병렬로 download 하고, 압축된 body 를 풀어서 원래 body 로 바꿉니다.
+    실패한 message 는 ack 하지 않고 제외합니다. (visibility timeout 이후 재전송)
+    payload_store 가 있으면 S3 download 가 일어나므로 async 에서는 thread 에서 실행합니다.
+    """
+    bodies = [x.body for x in messages]
+    if payload_store is not None:
+        bodies = payload_store.resolve_many(bodies)
+    decoded = []
+    for message, body, attributes in zip(messages, bodies, message_attributes):
+        try:
+            if body is None:
+                raise ValueError("failed to resolve payload")
+            message.raw_body = message.body
+            message.body = decode_body(body, attributes)
+        except Exception as e:
+            logger.error(
+                "sqs_body_decode_error",
+                exc_info=e,
+                extra={"msg_id": message.header.id},
+            )
+            continue
+        decoded.append(message)
+    return decoded
+
+
+class ChunkSendState:
+    def __init__(
+        self,
+        bodies: list[str],
+        attributes: list[dict],
+        chunk: list[int],
+        max_attempts: int,
+        backoff_seconds: float,
+    ):
+        """
+        chunk 하나를 send_message_batch 로 보내는 재시도 상태. (I/O 없음)
+        Failed 로 돌아온 entry 중 재시도 가능한 것만 backoff 후 다시 보낸다.
+        SenderFault 인 entry (잘못된 body 등) 는 재시도하지 않는다.
+        usage:
+            while (entries := state.next_entries()) is not None:
+                try:
+                    delay = state.on_response(client.send_message_batch(...))
+                except Exception as e:
+                    delay = state.on_error(e)
+                if delay:
+                    sleep(delay)
+            return state.result
+        """
+        self.bodies = bodies
+        self.attributes = attributes
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.result = PublishBatchResult()
+        self.pending = list(chunk)
+        self.attempt = 0
+
+    def next_entries(self) -> Optional[list[dict]]:
+        """
+        :return: 보낼 entry 목록, 더 보낼 것이 없으면 None
+        """
+        if not self.pending:
+            return None
+        self.attempt += 1
+        return [
+            make_entry(str(idx), self.bodies[idx], self.attributes[idx])
+            for idx in self.pending
+        ]
+
+    def _backoff(self) -> float:
+        return self.backoff_seconds * (2 ** (self.attempt - 1))
+
+    def on_error(self, error: Exception) -> float:
+        """
+        호출 자체가 실패한 경우
+        :return: 다음 시도 전에 기다릴 시간 (sec)
+        """
+        self.result.num_calls += 1
+        if self.attempt < self.max_attempts:
+            return self._backoff()
+        code = (
+            error.response["Error"]["Code"]
+            if isinstance(error, ClientError)
+            else type(error).__name__
+        )
+        self.result.failed.extend(
+            PublishFailure(idx, code, str(error), False, self.attempt)
+            for idx in self.pending
+        )
+        self.pending = []
+        return 0.0
+
+    def on_response(self, response: dict) -> float:
+        """
+        :return: 다음 시도 전에 기다릴 시간 (sec)
+        """
+        self.result.num_calls += 1
+        for entry in response.get("Successful", []):
+            self.result.sent[int(entry["Id"])] = entry["MessageId"]
+        retry = []
+        for entry in response.get("Failed", []):
+            failure = PublishFailure(
+                index=int(entry["Id"]),
+                code=entry.get("Code", ""),
+                message=entry.get("Message", ""),
+                sender_fault=entry.get("SenderFault", False),
+                attempts=self.attempt,
+            )
+            if failure.sender_fault or self.attempt >= self.max_attempts:
+                self.result.failed.append(failure)
+            else:
+                retry.append(failure.index)
+        self.pending = retry
+        return self._backoff() if retry else 0.0
+
+
+def merge_publish_results(results) -> PublishBatchResult:
+    merged = PublishBatchResult()
+    for result in results:
+        merged.sent.update(result.sent)
+        merged.failed.extend(result.failed)
+        merged.num_calls += result.num_calls
+    return merged
 
 
 class SQSClient:
@@ -23,37 +426,74 @@ class SQSClient:
         wait_time_seconds: int = 20,
         endpoint_url: str = None,
         boto3_sqs_resource: Optional[any] = None,
+        payload_store: Optional[S3PayloadStore] = None,
+        codec: Optional[MessageCodec] = None,
+        recv_policy: Optional[RecvPolicy] = None,
     ):
         """
         SQS Client를 초기화합니다.
         :param sqs_name: SQS Queue Name
         :param max_num_of_message: 동시에 수신할 message 수 (기본: 1, 최대: 10)
         :param wait_time_seconds: long pooling 시 최대로 wait 할 시간: (기본: 20, 최소: 0, 최대: 20)
+        :param payload_store: (optional) 주어지면 threshold 를 넘는 body 는 S3 에 저장하고 pointer 만 보내며,
+                              recv 시 pointer 를 원래 body 로 바꿔서 반환합니다.
+        :param codec: (optional) 주어지면 publish 하는 body 를 압축합니다. (GzipCodec / ZstdCodec)
+                      recv 는 codec 설정과 관계없이 message attribute 를 보고 압축된 body 만 풉니다.
+        :param recv_policy: (optional) 주어지면 recv 에서 timeout / poison message 를 batch 를 중단하지 않고
+                            DLQ 로 옮기거나 버립니다. 없으면 timeout 시 TimeoutError 를 발생시킵니다. (기존 동작)
+        SQS 요청은 모두 thread-safe 한 boto3 client 로 보내므로 여러 thread (consumer / heartbeat /
+        publish_batch_concurrent) 에서 같은 SQSClient 를 사용해도 됩니다.
         """
         self.sqs_name = sqs_name
+        self.payload_store = payload_store
+        self.codec = codec
+        self.recv_policy = recv_policy
         self.max_num_of_message = max_num_of_message
         self.wait_time_seconds = wait_time_seconds
         self.conn_variable = dict()
         if endpoint_url is not None:
             self.conn_variable["endpoint_url"] = endpoint_url
 
-        self.conn = boto3.session.Session()
-
+        self._sqs_resource = boto3_sqs_resource
         if boto3_sqs_resource is not None:
-            self.sqs = boto3_sqs_resource
+            self.client = boto3_sqs_resource.meta.client
         else:
-            self.sqs = self.conn.resource("sqs", **self.conn_variable)
+            self.client = registry.client("sqs", **self.conn_variable)
 
         try:
-            self.queue = self.sqs.get_queue_by_name(QueueName=self.sqs_name)
-            if not self.queue:
-                raise Exception(
-                    "no response from get_queue_by_name(%s)" % self.sqs_name
-                )
-            self.queue_url = self.queue.url
+            # queue url 은 process 전체에서 기억하므로 같은 queue 는 한 번만 조회한다
+            self.queue_url = registry.queue_url(self.client, self.sqs_name)
         except ClientError as e:
             raise e
 
+    @property
+    def conn(self):
+        """
+        (호환용) boto3 session. session 은 thread-safe 하지 않으므로 thread 별로 만든다.
+        SQS 요청은 self.client 를 사용한다.
+        """
+        return registry.local_session()
+
+    @property
+    def sqs(self):
+        """
+        (호환용) boto3 SQS resource. resource 는 thread-safe 하지 않으므로 주입되지 않았으면 thread 별로 만든다.
+        """
+        if self._sqs_resource is not None:
+            return self._sqs_resource
+        return registry.resource("sqs", **self.conn_variable)
+
+    @property
+    def queue(self):
+        """
+        (호환용) boto3 SQS Queue resource
+        """
+        return self.sqs.Queue(self.queue_url)
+
+    def __receive_messages(self, **kwargs) -> list[dict]:
+        response = self.client.receive_message(QueueUrl=self.queue_url, **kwargs)
+        return response.get("Messages", [])
+
     def __recv_up_to(
         self, max_num_of_message: int, wait_time_seconds: int = None
     ) -> list:
@@ -63,12 +503,9 @@ class SQSClient:
             _wait_time_seconds = wait_time_seconds
 
         num_to_be_received = min(max_num_of_message, 10)
-        msgs = self.queue.receive_messages(
-            AttributeNames=[
-                "ApproximateFirstReceiveTimestamp",
-                "SentTimestamp",
-                "ApproximateReceiveCount",
-            ],
+        msgs = self.__receive_messages(
+            AttributeNames=RECEIVE_ATTRIBUTE_NAMES,
+            MessageAttributeNames=ALL_MESSAGE_ATTRIBUTE_NAMES,
             MaxNumberOfMessages=num_to_be_received,
             WaitTimeSeconds=_wait_time_seconds,
         )
@@ -80,12 +517,9 @@ class SQSClient:
             if num_to_be_received < 1:
                 break
 
-            _msgs = self.queue.receive_messages(
-                AttributeNames=[
-                    "ApproximateFirstReceiveTimestamp",
-                    "SentTimestamp",
-                    "ApproximateReceiveCount",
-                ],
+            _msgs = self.__receive_messages(
+                AttributeNames=RECEIVE_ATTRIBUTE_NAMES,
+                MessageAttributeNames=ALL_MESSAGE_ATTRIBUTE_NAMES,
                 MaxNumberOfMessages=num_to_be_received,
                 WaitTimeSeconds=0,
             )
@@ -102,6 +536,7 @@ class SQSClient:
         """
         Receive message from SQS
         :param timeout: (optional) Timeout이 None이 아닐 경우, sent time 기준으로 timeout 된 message는 처리 없이 삭제함
+                        (recv_policy 가 있으면 나머지 message 는 그대로 반환하고, 없으면 TimeoutError 발생)
         :param wait_time_seconds: (optional) Long pooling 제어를 위한 파라메터
         :return: (message header, body) 오류 발생시에는 (None, None)
         """
@@ -119,49 +554,223 @@ class SQSClient:
             return []
 
         parsed_messages = []
+        message_attributes = []
+        dead_letters = []
+        now = datetime.now()
 
         for msg in msgs:
-            msg_attributes = msg.attributes
-            if "ApproximateFirstReceiveTimestamp" in msg_attributes:
-                msg_attributes[
-                    "ApproximateFirstReceiveTimestamp"
-                ] = datetime.fromtimestamp(
-                    float(msg.attributes["ApproximateFirstReceiveTimestamp"]) / 1000
-                )
-            if "SentTimestamp" in msg_attributes:
-                msg_attributes["SentTimestamp"] = datetime.fromtimestamp(
-                    float(msg.attributes["SentTimestamp"]) / 1000
-                )
-
-            header = ModelMessageHeader(
-                id=msg.message_id,
-                queue_url=msg.queue_url,
-                handle=msg.receipt_handle,
-                attributes=msg_attributes,
-                num_trial=int(msg_attributes.get("ApproximateReceiveCount", "1")),
+            header = make_message_header(
+                msg["MessageId"],
+                self.queue_url,
+                msg["ReceiptHandle"],
+                dict(msg.get("Attributes", {})),
+                msg.get("MessageAttributes"),
             )
+            msg_attributes = header.attributes
 
-            if timeout is not None:
+            if self.recv_policy is not None:
+                reason = self.recv_policy.classify(header, timeout, now)
+                if reason is not None:
+                    dead_letters.append((msg, header, reason))
+                    continue
+            elif timeout is not None:
                 timeout_at = msg_attributes["SentTimestamp"] + timedelta(
                     seconds=timeout
                 )
                 if datetime.now() >= timeout_at:
                     self.ack(header)
                     raise TimeoutError(
-                        f"[msg_id: {msg.message_id}] Message Timeout (> {timeout} sec), dropped"
+                        f"[msg_id: {header.id}] Message Timeout (> {timeout} sec), dropped"
                     )
 
-            parsed_messages.append(ModelMessage(header=header, body=msg.body))
+            parsed_messages.append(ModelMessage(header=header, body=msg["Body"]))
+            message_attributes.append(msg.get("MessageAttributes"))
+
+        if dead_letters:
+            self.__route_dead_letters(dead_letters)
+        if self.payload_store is not None or any(message_attributes):
+            parsed_messages = decode_bodies(
+                parsed_messages, message_attributes, self.payload_store
+            )
         return parsed_messages
 
+    def recv_typed(
+        self,
+        model_cls: Optional[type] = None,
+        timeout: int = None,
+        wait_time_seconds: int = None,
+    ) -> tuple[list[TypedMessageSet], list[MessageDecodeFailure]]:
+        """
+        recv 후 body 를 ujson 으로 parse 하고 model_cls 로 decode 합니다.
+        decoder 는 class 마다 한 번 만들어서 재사용합니다. (common_lib.dataclass.decoder.get_decoder)
+        parse / decode 에 실패한 message 는 batch 전체를 실패시키지 않고 failures 로 반환하며 ack 하지 않습니다.
+        :param model_cls: (optional) body 를 decode 할 dataclass, 없으면 parsed dict 만 채움
+        :param timeout: recv 의 timeout
+        :param wait_time_seconds: recv 의 wait_time_seconds
+        :return: (decode 된 message 목록, 실패한 message 목록)
+        """
+        decoder = get_decoder(model_cls) if model_cls is not None else None
+        results, failures = [], []
+        for message in self.recv(timeout=timeout, wait_time_seconds=wait_time_seconds):
+            try:
+                parsed = ujson.loads(message.body)
+                data = decoder(parsed) if decoder is not None else None
+            except Exception as e:
+                failures.append(MessageDecodeFailure(message=message, error=repr(e)))
+                continue
+            results.append(
+                TypedMessageSet(header=message.header, parsed=parsed, data=data)
+            )
+        if failures:
+            logger.warning(
+                "sqs_recv_typed_decode_error",
+                extra={
+                    "queue": self.sqs_name,
+                    "errors": [
+                        {"msg_id": x.message.header.id, "error": x.error}
+                        for x in failures
+                    ],
+                },
+            )
+        return results, failures
+
+    def __route_dead_letters(
+        self, dead_letters: list[tuple[dict, ModelMessageHeader, str]]
+    ):
+        """
+        처리하지 않을 message 를 DLQ 로 옮기거나 버립니다. (받은 그대로의 body / attribute 로 보냄)
+        attribute 개수 제한을 넘으면 dead-letter-source, dead-letter-reason 순으로 붙이지 않습니다.
+        DLQ 전송에 실패한 message 는 ack 하지 않습니다. (visibility timeout 이후 재전송)
+        """
+        policy = self.recv_policy
+        to_drop, to_move = [], []
+        for msg, header, reason in dead_letters:
+            if policy.dead_letter_queue is None or (
+                reason == DEAD_LETTER_EXPIRED and not policy.expired_to_dlq
+            ):
+                to_drop.append((header, reason))
+            else:
+                to_move.append((msg, header, reason))
+
+        if to_move:
+            entries = []
+            for msg, header, reason in to_move:
+                attributes = _copy_message_attributes(msg.get("MessageAttributes"))
+                _put_message_attribute(attributes, DEAD_LETTER_REASON_ATTRIBUTE, reason)
+                _put_message_attribute(
+                    attributes, DEAD_LETTER_SOURCE_ATTRIBUTE, self.sqs_name
+                )
+                entries.append(make_entry(str(len(entries)), msg["Body"], attributes))
+            failed = set(policy.dead_letter_queue.send_entries(entries))
+            to_drop.extend(
+                (header, reason)
+                for idx, (_, header, reason) in enumerate(to_move)
+                if str(idx) not in failed
+            )
+            if failed:
+                logger.error(
+                    "sqs_dead_letter_error",
+                    extra={
+                        "queue": self.sqs_name,
+                        "msg_ids": [to_move[int(x)][1].id for x in failed],
+                    },
+                )
+
+        if to_drop:
+            self.ack_batch([header for header, _ in to_drop])
+            logger.warning(
+                "sqs_dead_lettered",
+                extra={
+                    "queue": self.sqs_name,
+                    "dead_letter_queue": getattr(
+                        policy.dead_letter_queue, "sqs_name", None
+                    ),
+                    "messages": [
+                        {
+                            "msg_id": header.id,
+                            "reason": reason,
+                            "trial": header.num_trial,
+                        }
+                        for header, reason in to_drop
+                    ],
+                },
+            )
+
+    def send_entries(self, entries: list[dict]) -> list[str]:
+        """
+        이미 만들어진 send_message_batch entry 들을 크기 제한에 맞게 나누어 보냅니다.
+        (codec / payload_store 를 적용하지 않음)
+        :return: 전송에 실패한 entry Id 목록
+        """
+        sizes = [
+            utf8_size(x["MessageBody"])
+            + message_attributes_size(x.get("MessageAttributes", {}))
+            for x in entries
+        ]
+        failed_ids = []
+        for chunk in make_publish_chunks(sizes):
+            chunk_entries = [entries[idx] for idx in chunk]
+            try:
+                response = self.client.send_message_batch(
+                    QueueUrl=self.queue_url, Entries=chunk_entries
+                )
+            except Exception as e:
+                logger.error("sqs_send_entries_error", exc_info=e)
+                failed_ids.extend(x["Id"] for x in chunk_entries)
+                continue
+            failed_ids.extend(x["Id"] for x in response.get("Failed", []))
+        return failed_ids
+
+    def retry_later(
+        self, messages: list[ModelMessage], policy: Optional[RecvPolicy] = None
+    ) -> list[str]:
+        """
+        처리에 실패한 message 를 지수적으로 늘어나는 DelaySeconds 로 다시 보내고 원래 message 는 ack 합니다.
+        재전송된 message 의 num_trial 은 이전 시도 횟수를 이어서 셉니다.
+        recv 로 받은 body (압축 / S3 pointer) 와 producer 의 message attribute 는 받은 그대로 보내므로
+        S3 payload 를 다시 만들지 않습니다. decode 하지 않은 message 만 codec / payload_store 를 적용합니다.
+        :param messages: recv 로 받은 message
+        :param policy: (optional) delay 계산에 사용할 정책 (기본: recv_policy 또는 RecvPolicy())
+        :return: 재전송에 실패해서 ack 하지 않은 message id 목록
+        """
+        policy = policy or self.recv_policy or RecvPolicy()
+        bodies, attributes, _ = encode_bodies(
+            [x.body for x in messages if x.raw_body is None],
+            self.codec,
+            self.payload_store,
+        )
+        encoded = iter(zip(bodies, attributes))
+        entries = []
+        for message in messages:
+            attrs = _copy_message_attributes(message.header.message_attributes)
+            if message.raw_body is not None:
+                body = message.raw_body
+            else:
+                body, codec_attrs = next(encoded)
+                attrs.pop(CODEC_ATTRIBUTE, None)
+                attrs.update(codec_attrs)
+            _put_message_attribute(
+                attrs, RETRY_COUNT_ATTRIBUTE, str(message.header.num_trial), "Number"
+            )
+            entry = make_entry(str(len(entries)), body, attrs)
+            entry["DelaySeconds"] = policy.retry_delay(message.header.num_trial)
+            entries.append(entry)
+
+        failed = set(self.send_entries(entries))
+        sent = [x.header for idx, x in enumerate(messages) if str(idx) not in failed]
+        if sent:
+            self.ack_batch(sent)
+        return [messages[int(x)].header.id for x in sorted(failed, key=int)]
+
     def ack(self, message_header: ModelMessageHeader) -> None:
         """
         처리가 완료된 메시지를 삭제합니다.
         :param message_header:
         :return: None
         """
-        self.queue.delete_messages(
-            Entries=[{"Id": message_header.id, "ReceiptHandle": message_header.handle}]
+        self.client.delete_message_batch(
+            QueueUrl=self.queue_url,
+            Entries=[{"Id": message_header.id, "ReceiptHandle": message_header.handle}],
         )
 
     def ack_batch(self, message_headers: list[ModelMessageHeader]) -> None:
@@ -178,9 +787,36 @@ class SQSClient:
             )
             chunk = message_headers[sp : (sp + chunk_size)]
             sp += chunk_size
-            self.queue.delete_messages(
-                Entries=[{"Id": x.id, "ReceiptHandle": x.handle} for x in chunk]
+            self.client.delete_message_batch(
+                QueueUrl=self.queue_url,
+                Entries=[{"Id": x.id, "ReceiptHandle": x.handle} for x in chunk],
+            )
+
+    def change_visibility_batch(
+        self, message_headers: list[ModelMessageHeader], visibility_timeout: int
+    ) -> list[str]:
+        """
+        여러 메시지의 visibility timeout 을 변경합니다. (10개씩 나누어 호출)
+        :param message_headers:
+        :param visibility_timeout: 지금부터 다시 보이지 않을 시간 (sec, 최대 43200)
+        :return: 변경에 실패한 message id 목록
+        """
+        failed_ids = []
+        for sp in range(0, len(message_headers), SQS_MAX_ENTRIES):
+            chunk = message_headers[sp : sp + SQS_MAX_ENTRIES]
+            response = self.client.change_message_visibility_batch(
+                QueueUrl=self.queue_url,
+                Entries=[
+                    {
+                        "Id": x.id,
+                        "ReceiptHandle": x.handle,
+                        "VisibilityTimeout": visibility_timeout,
+                    }
+                    for x in chunk
+                ],
             )
+            failed_ids.extend(x["Id"] for x in response.get("Failed", []))
+        return failed_ids
 
     def publish(self, body: str) -> dict:
         """
@@ -188,66 +824,47 @@ class SQSClient:
         :param body:
         :return:
         """
-        response = self.queue.send_message(MessageBody=body, DelaySeconds=0)
-        return response
+        attributes = {}
+        if self.codec is not None:
+            body, attributes = self.codec.encode(body)
+        if self.payload_store is not None:
+            body = self.payload_store.offload(body)
+        kwargs = {"MessageAttributes": attributes} if attributes else {}
+        return self.client.send_message(
+            QueueUrl=self.queue_url, MessageBody=body, DelaySeconds=0, **kwargs
+        )
 
     @staticmethod
-    def __make_chunk_to_publish(entries: list[str]) -> list[list[str]]:
+    def __make_chunk_to_publish(
+        sizes: list[int], packing: str = PACKING_SEQUENTIAL
+    ) -> list[list[int]]:
         """
         SQS의 batch send message 에는 다음 두 가지 제약이 있다.
          + 한 번에 send 가능한 총 message 수는 10개 이내
          + 한 번에 send 가능한 총 message size는 256 KB 이내
         위 제약사항을 준수하면서 원하는 수량의 message 를 적절히 나누어주는 역할을 한다.
-        :param entries: 보내고싶은 모든 message
-        :return: 적절히 나누어진 message
+        크기는 압축/offload 이후의 body 와 MessageAttributes 를 합친 byte 수이다.
+        :param sizes: 보내고싶은 모든 message 의 크기
+        :param packing: PACKING_SEQUENTIAL (순서 유지) / PACKING_DECREASING (호출 수 최소화)
+        :return: 적절히 나누어진 message index
         """
-        lengths = [len(b64encode(x.encode("utf-8"))) for x in entries]
-        chunks = []
-
-        class State(NamedTuple):
-            start_idx: int = 0
-            end_idx: int = 1
-            length: int = 0
-            num_entry: int = 0
-
-        state = State()
-
-        for idx, length in enumerate(lengths):
-            next_state = State(
-                start_idx=state.start_idx,
-                end_idx=state.end_idx + 1,
-                length=state.length + length,
-                num_entry=state.num_entry + 1,
-            )
-            if (
-                next_state.num_entry >= SQS_MAX_ENTRIES
-                or next_state.length >= SQS_MAX_BYTES
-            ):
-                chunks.append(entries[state.start_idx : state.end_idx])
-                state = State(
-                    start_idx=state.end_idx,
-                    end_idx=state.end_idx + 1,
-                    length=length,
-                    num_entry=0,
-                )
-            else:
-                state = next_state
-        if state.num_entry > 0:
-            chunks.append(entries[state.start_idx : state.end_idx])
-        return chunks
+        return make_publish_chunks(sizes, packing=packing)
 
-    def publish_batch(self, bodies: list[str], logger=None):
-        chunks = self.__make_chunk_to_publish(bodies)
-        for chunk in chunks:
+    def publish_batch(
+        self, bodies: list[str], logger=None, packing: str = PACKING_SEQUENTIAL
+    ):
+        bodies, attributes, sizes = encode_bodies(
+            bodies, self.codec, self.payload_store
+        )
+        for chunk_idx in self.__make_chunk_to_publish(sizes, packing):
+            chunk = [bodies[idx] for idx in chunk_idx]
             try:
-                self.queue.send_messages(
+                self.client.send_message_batch(
+                    QueueUrl=self.queue_url,
                     Entries=[
-                        {
-                            "Id": str(uuid.uuid4()),
-                            "MessageBody": x,
-                        }
-                        for x in chunk
-                    ]
+                        make_entry(str(uuid.uuid4()), bodies[idx], attributes[idx])
+                        for idx in chunk_idx
+                    ],
                 )
             except Exception as e:
                 if logger:
@@ -261,3 +878,72 @@ class SQSClient:
                 raise ErrorWithExtraInfo(
                     message="", exc_info=e, extra=ExtraModel(etc={"chunk": chunk})
                 )
+
+    def __send_chunk_with_retry(
+        self,
+        bodies: list[str],
+        attributes: list[dict],
+        chunk: list[int],
+        max_attempts: int,
+        backoff_seconds: float,
+    ) -> PublishBatchResult:
+        state = ChunkSendState(bodies, attributes, chunk, max_attempts, backoff_seconds)
+        while (entries := state.next_entries()) is not None:
+            try:
+                delay = state.on_response(
+                    self.client.send_message_batch(
+                        QueueUrl=self.queue_url, Entries=entries
+                    )
+                )
+            except Exception as e:
+                delay = state.on_error(e)
+            if delay:
+                time.sleep(delay)
+        return state.result
+
+    def publish_batch_concurrent(
+        self,
+        bodies: list[str],
+        logger=None,
+        packing: str = PACKING_SEQUENTIAL,
+        max_workers: int = 8,
+        max_attempts: int = 3,
+        backoff_seconds: float = 0.2,
+    ) -> PublishBatchResult:
+        """
+        publish_batch 와 같은 방식으로 나눈 chunk 들을 thread pool 에서 동시에 보냅니다.
+        한 chunk 의 실패가 다른 chunk 를 멈추지 않으며, 실패한 entry 만 backoff 후 재시도합니다.
+        :param bodies: 보내고싶은 모든 message
+        :param logger: (optional) 최종 실패가 있으면 warning 을 남길 logger
+        :param packing: PACKING_SEQUENTIAL / PACKING_DECREASING
+        :param max_workers: 동시에 진행할 send_message_batch 호출 수
+                            (boto3 기본 connection pool 크기인 10 이하 권장)
+        :param max_attempts: entry 당 최대 시도 횟수
+        :param backoff_seconds: 재시도 대기 시간의 기준값 (attempt 마다 2배)
+        :return: PublishBatchResult (index 기준 성공 MessageId / 실패 목록)
+        """
+        bodies, attributes, sizes = encode_bodies(
+            bodies, self.codec, self.payload_store
+        )
+        chunks = self.__make_chunk_to_publish(sizes, packing)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            result = merge_publish_results(
+                executor.map(
+                    lambda chunk: self.__send_chunk_with_retry(
+                        bodies, attributes, chunk, max_attempts, backoff_seconds
+                    ),
+                    chunks,
+                )
+            )
+
+        if result.failed and logger:
+            logger.warning(
+                "publish_batch_failed",
+                extra={
+                    "queue": self.sqs_name,
+                    "num_sent": len(result.sent),
+                    "num_failed": len(result.failed),
+                    "failed": [vars(x) for x in result.failed[:10]],
+                },
+            )
+        return result
@@ -0,0 +1,122 @@
+import gzip
+import threading
+from abc import ABC, abstractmethod
+from base64 import b64decode, b64encode
+from typing import Optional
+
+try:
+    import zstandard
+except ImportError:  # zstd codec 을 쓰지 않으면 필요 없음
+    zstandard = None
+
+CODEC_ATTRIBUTE = "content-encoding"
+
+
+class MessageCodec(ABC):
+    name: str = ""
+
+    def __init__(self, min_bytes: int = 1024):
+        """
+        SQS message body 압축 codec. 압축한 body 는 base64 문자열로 보내고,
+        사용한 codec 이름은 CODEC_ATTRIBUTE message attribute 로 표시합니다.
+        :param min_bytes: 이 byte 수 이상인 body 만 압축 (작은 body 는 base64 때문에 오히려 커짐)
+        """
+        self.min_bytes = min_bytes
+
+    @abstractmethod
+    def compress(self, data: bytes) -> bytes:
+        pass
+
+    @abstractmethod
+    def decompress(self, data: bytes) -> bytes:
+        pass
+
+    def encode(self, body: str) -> tuple[str, dict]:
+        """
+        :return: (보낼 body, MessageAttributes). 압축 이득이 없으면 원래 body 와 빈 dict
+        """
+        data = body.encode("utf-8")
+        if len(data) < self.min_bytes:
+            return body, {}
+        encoded = b64encode(self.compress(data)).decode("ascii")
+        if len(encoded) >= len(data):
+            return body, {}
+        return encoded, {
+            CODEC_ATTRIBUTE: {"DataType": "String", "StringValue": self.name}
+        }
+
+    def decode(self, body: str) -> str:
+        return self.decompress(b64decode(body)).decode("utf-8")
+
+
+class GzipCodec(MessageCodec):
+    name = "gzip+base64"
+
+    def __init__(self, min_bytes: int = 1024, level: int = 6):
+        MessageCodec.__init__(self, min_bytes)
+        self.level = level
+
+    def compress(self, data: bytes) -> bytes:
+        return gzip.compress(data, compresslevel=self.level)
+
+    def decompress(self, data: bytes) -> bytes:
+        return gzip.decompress(data)
+
+
+class ZstdCodec(MessageCodec):
+    name = "zstd+base64"
+
+    def __init__(self, min_bytes: int = 1024, level: int = 3):
+        if zstandard is None:
+            raise ImportError("ZstdCodec requires the 'zstandard' package")
+        MessageCodec.__init__(self, min_bytes)
+        self.level = level
+        # zstandard 의 compressor / decompressor 는 여러 thread 가 동시에 쓸 수 없으므로 thread 별로 만든다
+        self._local = threading.local()
+
+    def compress(self, data: bytes) -> bytes:
+        compressor = getattr(self._local, "compressor", None)
+        if compressor is None:
+            compressor = self._local.compressor = zstandard.ZstdCompressor(
+                level=self.level
+            )
+        return compressor.compress(data)
+
+    def decompress(self, data: bytes) -> bytes:
+        decompressor = getattr(self._local, "decompressor", None)
+        if decompressor is None:
+            decompressor = self._local.decompressor = zstandard.ZstdDecompressor()
+        return decompressor.decompress(data)
+
+
+CODECS = {GzipCodec.name: GzipCodec, ZstdCodec.name: ZstdCodec}
+_decoders: dict[str, MessageCodec] = {}
+
+
+def get_decoder(name: str) -> MessageCodec:
+    if name not in _decoders:
+        if name not in CODECS:
+            raise ValueError(f"unknown message codec: {name}")
+        _decoders[name] = CODECS[name]()
+    return _decoders[name]
+
+
+def message_attributes_size(attributes: dict) -> int:
+    """
+    SQS 가 payload 크기에 포함하는 MessageAttributes 의 byte 수 (이름 + type + 값)
+    """
+    return sum(
+        len(name) + len(value["DataType"]) + len(value.get("StringValue", ""))
+        for name, value in attributes.items()
+    )
+
+
+def decode_body(body: str, message_attributes: Optional[dict]) -> str:
+    """
+    CODEC_ATTRIBUTE 가 있는 message 만 decode 합니다. (압축하지 않은 message 는 그대로 반환)
+    codec 설정과 관계없이 attribute 의 codec 으로 decode 하므로 producer 만 먼저 바꿀 수 있습니다.
+    """
+    if not message_attributes or CODEC_ATTRIBUTE not in message_attributes:
+        return body
+    name = message_attributes[CODEC_ATTRIBUTE]["StringValue"]
+    return get_decoder(name).decode(body)
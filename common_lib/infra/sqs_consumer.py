@@ -0,0 +1,368 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import BrokenExecutor, Executor, Future, ThreadPoolExecutor
+from dataclasses import dataclass, field, asdict
+from typing import Callable, Optional
+
+from common_lib.infra.sqs_bulk import SQSClient, SQS_MAX_ENTRIES
+from common_lib.infra.sqs_heartbeat import VisibilityHeartbeat
+from common_lib.infra.sqs_idempotency import IdempotencyCache
+from common_lib.models.message import ModelMessage, ModelMessageHeader
+from common_lib.utils.graceful_kill_helper import GracefulKillHelper
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SQSConsumerMetrics:
+    started_at: float = field(default_factory=time.time)
+    received: int = 0
+    processed: int = 0
+    failed: int = 0
+    acked: int = 0
+    ack_calls: int = 0
+    ack_latency_sum: float = 0.0
+    ack_latency_max: float = 0.0
+
+    @property
+    def throughput(self) -> float:
+        """처리 완료된 message / sec"""
+        elapsed = time.time() - self.started_at
+        return self.processed / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def ack_latency_avg(self) -> float:
+        """처리 완료부터 ack 까지 걸린 평균 시간 (sec)"""
+        return self.ack_latency_sum / self.acked if self.acked else 0.0
+
+    def to_dict(self) -> dict:
+        result = asdict(self)
+        result["throughput"] = self.throughput
+        result["ack_latency_avg"] = self.ack_latency_avg
+        return result
+
+
+def submit_in_flight(
+    executor: Executor,
+    permits: threading.Semaphore,
+    fn: Callable,
+    message: ModelMessage,
+    on_done: Callable[[Future], None],
+) -> Optional[Exception]:
+    """
+    permit 을 얻은 상태에서 message 를 executor 에 넘깁니다.
+    처리가 끝나면 on_done 을 호출한 뒤 permit 을 돌려줍니다.
+    submit 자체가 실패하면 permit 을 바로 돌려주고 exception 을 반환합니다. (돌려주지 않으면 drain 이 끝나지 않는다)
+    """
+    try:
+        future = executor.submit(fn, message)
+    except Exception as e:
+        permits.release()
+        return e
+
+    def done(f: Future) -> None:
+        try:
+            on_done(f)
+        finally:
+            permits.release()
+
+    future.add_done_callback(done)
+    return None
+
+
+def is_executor_dead(error: Exception) -> bool:
+    """
+    executor 가 죽었거나 shutdown 된 경우 이후 message 도 처리할 수 없다
+    """
+    return isinstance(error, (BrokenExecutor, RuntimeError))
+
+
+def drain_in_flight(permits: threading.Semaphore, max_in_flight: int) -> None:
+    """
+    모든 permit 을 회수하면 처리 중인 message 가 없다
+    """
+    for _ in range(max_in_flight):
+        permits.acquire()
+    for _ in range(max_in_flight):
+        permits.release()
+
+
+class AckBuffer:
+    def __init__(
+        self,
+        client: SQSClient,
+        metrics: SQSConsumerMetrics,
+        metrics_lock,
+        batch_size: int = SQS_MAX_ENTRIES,
+        flush_interval: float = 1.0,
+        wakeup: Optional[threading.Event] = None,
+        on_acked: Optional[Callable[[list[ModelMessageHeader]], None]] = None,
+    ):
+        """
+        처리 완료된 message 를 모아서 ack_batch 로 ack 합니다. (thread-safe)
+        ack 가 실패한 message 는 visibility timeout 이후 다시 받습니다.
+        :param metrics: acked / ack_calls / ack_latency 를 기록할 metrics
+        :param metrics_lock: metrics 를 보호하는 lock
+        :param wakeup: (optional) batch_size 개가 모이면 set 해서 ack loop 를 깨운다
+        :param on_acked: (optional) ack 된 header 목록을 받는 callback
+        """
+        self.client = client
+        self.metrics = metrics
+        self.metrics_lock = metrics_lock
+        self.batch_size = min(batch_size, SQS_MAX_ENTRIES)
+        self.flush_interval = flush_interval
+        self.wakeup = wakeup
+        self.on_acked = on_acked
+        self._items: list[tuple[ModelMessageHeader, float]] = []
+        self._lock = threading.Lock()
+
+    def add(self, header: ModelMessageHeader) -> None:
+        with self._lock:
+            self._items.append((header, time.time()))
+            full = len(self._items) >= self.batch_size
+        if full and self.wakeup is not None:
+            self.wakeup.set()
+
+    def flush(self, force: bool = False) -> None:
+        with self._lock:
+            if not self._items:
+                return
+            if not (
+                force
+                or len(self._items) >= self.batch_size
+                or time.time() - self._items[0][1] >= self.flush_interval
+            ):
+                return
+            pending, self._items = self._items, []
+
+        headers = [header for header, _ in pending]
+        try:
+            self.client.ack_batch(headers)
+        except Exception as e:
+            logger.error(
+                "sqs_consumer_ack_error",
+                exc_info=e,
+                extra={
+                    "queue": self.client.sqs_name,
+                    "msg_ids": [header.id for header in headers],
+                },
+            )
+            return
+        if self.on_acked is not None:
+            self.on_acked(headers)
+        now = time.time()
+        latencies = [now - done_at for _, done_at in pending]
+        with self.metrics_lock:
+            self.metrics.acked += len(pending)
+            self.metrics.ack_calls += -(-len(pending) // SQS_MAX_ENTRIES)
+            self.metrics.ack_latency_sum += sum(latencies)
+            self.metrics.ack_latency_max = max(
+                self.metrics.ack_latency_max, max(latencies)
+            )
+
+
+def run_ack_loop(
+    buffers: list[AckBuffer],
+    flush_interval: float,
+    done: threading.Event,
+    wakeup: threading.Event,
+) -> None:
+    """
+    done 이 set 될 때까지 주기적으로 (또는 wakeup 이 set 되면 바로) ack buffer 를 비우고,
+    마지막으로 남은 ack 를 모두 보냅니다. 종료할 때는 done 과 wakeup 을 모두 set 합니다.
+    """
+    while not done.is_set():
+        wakeup.wait(timeout=flush_interval / 2)
+        wakeup.clear()
+        for buffer in buffers:
+            buffer.flush()
+    for buffer in buffers:
+        buffer.flush(force=True)
+
+
+class SQSConsumer:
+    def __init__(
+        self,
+        client: SQSClient,
+        handler: Callable[[ModelMessage], any],
+        max_workers: int = 10,
+        executor: Optional[Executor] = None,
+        max_in_flight: Optional[int] = None,
+        ack_batch_size: int = SQS_MAX_ENTRIES,
+        ack_flush_interval: float = 1.0,
+        recv_timeout: Optional[int] = None,
+        heartbeat: Optional[VisibilityHeartbeat] = None,
+        idempotency: Optional[IdempotencyCache] = None,
+    ):
+        """
+        recv -> process -> ack 를 pipeline 으로 실행합니다.
+         + 별도 thread 가 다음 batch 를 미리 receive 합니다. (prefetch)
+         + message 는 하나씩 worker pool 로 dispatch 되어 느린 message 가 batch 전체를 막지 않습니다.
+         + 처리 완료된 message 는 ack_batch_size 개가 모이거나 ack_flush_interval 초가 지나면 한 번에 ack 합니다.
+         + GracefulKillHelper.kill_now 또는 stop() 이후에는 receive 를 멈추고, 받은 message 를 모두 처리/ack 한 뒤 종료합니다.
+        handler 에서 exception 이 발생한 message 는 ack 하지 않습니다. (visibility timeout 이후 재전송)
+        :param client: SQSClient
+        :param handler: message 하나를 처리하는 함수 (ProcessPoolExecutor 사용 시 pickle 가능해야 함)
+        :param max_workers: executor 를 주지 않은 경우 생성할 ThreadPoolExecutor 크기
+        :param executor: (optional) ThreadPoolExecutor / ProcessPoolExecutor
+        :param max_in_flight: 동시에 처리 중일 수 있는 message 수 (기본: max_workers * 2)
+        :param ack_batch_size: ack 를 모아서 보낼 크기 (최대 10)
+        :param ack_flush_interval: ack buffer 를 비우는 최대 주기 (sec)
+        :param recv_timeout: SQSClient.recv 의 timeout
+        :param heartbeat: (optional) 주어지면 처리 중인 message 의 visibility timeout 을 ack 할 때까지 연장
+        :param idempotency: (optional) 주어지면 이미 처리 완료된 message 는 handler 없이 바로 ack
+        """
+        self.client = client
+        self.handler = handler
+        self.max_workers = max_workers
+        self._executor = executor
+        self._own_executor = executor is None
+        self.max_in_flight = max_in_flight or max_workers * 2
+        self.ack_batch_size = min(ack_batch_size, SQS_MAX_ENTRIES)
+        self.ack_flush_interval = ack_flush_interval
+        self.recv_timeout = recv_timeout
+        self.heartbeat = heartbeat
+        self.idempotency = idempotency
+
+        self.metrics = SQSConsumerMetrics()
+        self._metrics_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._batches: queue.Queue = queue.Queue(maxsize=1)
+        self._in_flight = threading.BoundedSemaphore(self.max_in_flight)
+
+        self._ack_wakeup = threading.Event()
+        self._acks = AckBuffer(
+            client,
+            self.metrics,
+            self._metrics_lock,
+            batch_size=self.ack_batch_size,
+            flush_interval=ack_flush_interval,
+            wakeup=self._ack_wakeup,
+            on_acked=self._untrack if heartbeat is not None else None,
+        )
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+    @property
+    def stopping(self) -> bool:
+        return self._stop_event.is_set() or GracefulKillHelper.kill_now
+
+    def _count(self, **kwargs) -> None:
+        with self._metrics_lock:
+            for key, value in kwargs.items():
+                setattr(self.metrics, key, getattr(self.metrics, key) + value)
+
+    def _prefetch_loop(self) -> None:
+        while not self.stopping:
+            try:
+                messages = self.client.recv(timeout=self.recv_timeout)
+                received_at = time.time()
+                if messages and self.idempotency is not None:
+                    messages = self.idempotency.filter_messages(self.client, messages)
+            except Exception as e:
+                logger.error("sqs_consumer_recv_error", exc_info=e)
+                time.sleep(1.0)
+                continue
+            if not messages:
+                continue
+            self._count(received=len(messages))
+            if self.heartbeat is not None:
+                # visibility timeout 은 receive 시점부터 흐르므로 dispatch 를 기다리는 동안에도 연장한다
+                for message in messages:
+                    self.heartbeat.track(message.header, received_at=received_at)
+            self._batches.put(messages)
+
+    def _dispatch(self, message: ModelMessage) -> None:
+        self._in_flight.acquire()
+        error = submit_in_flight(
+            self._executor,
+            self._in_flight,
+            self.handler,
+            message,
+            lambda f: self._handle_result(f, message),
+        )
+        if error is not None:
+            self._on_failed(message, error)
+            if is_executor_dead(error):
+                self.stop()
+
+    def _handle_result(self, future: Future, message: ModelMessage) -> None:
+        error = future.exception()
+        if error is not None:
+            self._on_failed(message, error)
+            return
+        if self.idempotency is not None:
+            self.idempotency.complete(self.idempotency.key(message))
+        self._count(processed=1)
+        self._acks.add(message.header)
+
+    def _on_failed(self, message: ModelMessage, error: BaseException) -> None:
+        """
+        처리하지 못한 message 는 ack 하지 않고 visibility timeout 이후 다시 받는다.
+        """
+        if self.heartbeat is not None:
+            self.heartbeat.untrack(message.header)
+        if self.idempotency is not None:
+            self.idempotency.release(self.idempotency.key(message))
+        self._count(failed=1)
+        logger.error(
+            "sqs_consumer_handler_error",
+            exc_info=error,
+            extra={"msg_id": message.header.id},
+        )
+
+    def _untrack(self, headers: list[ModelMessageHeader]) -> None:
+        for header in headers:
+            self.heartbeat.untrack(header)
+
+    def _dispatch_batches(self, prefetcher: threading.Thread) -> None:
+        while prefetcher.is_alive() or not self._batches.empty():
+            try:
+                messages = self._batches.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            for message in messages:
+                self._dispatch(message)
+
+    def run(self) -> SQSConsumerMetrics:
+        """
+        종료 요청이 올 때까지 message 를 처리합니다. (blocking)
+        :return: 최종 metrics
+        """
+        if self._own_executor:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        prefetcher = threading.Thread(
+            target=self._prefetch_loop, name="sqs-consumer-prefetch", daemon=True
+        )
+        ack_done = threading.Event()
+        acker = threading.Thread(
+            target=run_ack_loop,
+            args=([self._acks], self.ack_flush_interval, ack_done, self._ack_wakeup),
+            name="sqs-consumer-ack",
+            daemon=True,
+        )
+        if self.heartbeat is not None:
+            self.heartbeat.start()
+        prefetcher.start()
+        acker.start()
+
+        try:
+            self._dispatch_batches(prefetcher)
+        finally:
+            # drain: receive 를 멈추고 이미 받은 message 는 모두 처리 후 ack
+            self.stop()
+            self._dispatch_batches(prefetcher)
+            drain_in_flight(self._in_flight, self.max_in_flight)
+            if self._own_executor:
+                self._executor.shutdown(wait=True)
+            ack_done.set()
+            self._ack_wakeup.set()
+            acker.join()
+            if self.heartbeat is not None:
+                self.heartbeat.stop()
+
+        logger.info("sqs_consumer_stopped", extra={"metrics": self.metrics.to_dict()})
+        return self.metrics
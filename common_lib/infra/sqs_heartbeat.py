@@ -0,0 +1,162 @@
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from common_lib.infra.sqs_bulk import SQSClient
+from common_lib.models.message import ModelMessageHeader
+
+logger = logging.getLogger(__name__)
+
+SQS_MAX_VISIBILITY_SECONDS = 12 * 60 * 60  # receive 시점부터 최대 12시간
+
+
+@dataclass
+class _TrackedMessage:
+    header: ModelMessageHeader
+    received_at: float
+    expires_at: float
+
+
+class VisibilityHeartbeat:
+    def __init__(
+        self,
+        client: SQSClient,
+        visibility_timeout: int = 60,
+        extend_margin: float = 10.0,
+        initial_visibility_timeout: Optional[int] = None,
+        check_interval: float = 1.0,
+    ):
+        """
+        처리 중인 message 의 visibility timeout 이 끝나기 전에 주기적으로 연장합니다.
+        track() 한 message 는 untrack() (ack 또는 처리 실패 시) 할 때까지 계속 연장됩니다.
+        :param client: SQSClient
+        :param visibility_timeout: 연장할 때마다 설정할 visibility timeout (sec)
+        :param extend_margin: 만료 몇 초 전에 연장할지
+        :param initial_visibility_timeout: 수신 직후의 visibility timeout,
+                                           없으면 queue 의 VisibilityTimeout 속성을 사용
+        :param check_interval: 만료 임박 message 를 확인하는 주기 (sec)
+        """
+        if visibility_timeout <= extend_margin:
+            raise ValueError("visibility_timeout must be greater than extend_margin")
+        self.client = client
+        self.visibility_timeout = visibility_timeout
+        self.extend_margin = extend_margin
+        if initial_visibility_timeout is None:
+            initial_visibility_timeout = int(
+                client.queue.attributes.get("VisibilityTimeout", 30)
+            )
+        self.initial_visibility_timeout = initial_visibility_timeout
+        self.check_interval = check_interval
+
+        self.num_extended = 0
+        self.num_failed = 0
+        self._tracked: dict[str, _TrackedMessage] = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def __enter__(self) -> "VisibilityHeartbeat":
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.stop()
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="sqs-visibility-heartbeat", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def track(
+        self, header: ModelMessageHeader, received_at: Optional[float] = None
+    ) -> None:
+        now = time.time()
+        received_at = now if received_at is None else received_at
+        with self._lock:
+            self._tracked[header.handle] = _TrackedMessage(
+                header=header,
+                received_at=received_at,
+                expires_at=received_at + self.initial_visibility_timeout,
+            )
+
+    def untrack(self, header: ModelMessageHeader) -> None:
+        with self._lock:
+            self._tracked.pop(header.handle, None)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._tracked)
+
+    def _due(self, now: float) -> list[_TrackedMessage]:
+        with self._lock:
+            return [
+                x
+                for x in self._tracked.values()
+                if x.expires_at - now <= self.extend_margin
+            ]
+
+    def extend_due(self) -> None:
+        """
+        만료가 임박한 message 들의 visibility timeout 을 10개씩 묶어서 연장합니다.
+        receive 시점부터 12시간을 넘지 않도록 남은 시간만큼만 연장하고, 12시간에 도달한 message 는 더 연장하지 않습니다.
+        """
+        now = time.time()
+        due = self._due(now)
+        if not due:
+            return
+
+        # 연장할 timeout 별로 묶어서 요청한다 (change_visibility_batch 는 timeout 하나만 받음)
+        by_timeout: dict[int, list[_TrackedMessage]] = {}
+        for tracked in due:
+            remaining = SQS_MAX_VISIBILITY_SECONDS - (now - tracked.received_at)
+            if remaining <= self.extend_margin:
+                self.untrack(tracked.header)
+                logger.warning(
+                    "sqs_visibility_limit_reached",
+                    extra={"msg_id": tracked.header.id},
+                )
+                continue
+            timeout = min(self.visibility_timeout, int(remaining))
+            by_timeout.setdefault(timeout, []).append(tracked)
+
+        for timeout, extendable in by_timeout.items():
+            self._extend(extendable, timeout, now)
+
+    def _extend(
+        self, extendable: list[_TrackedMessage], timeout: int, now: float
+    ) -> None:
+        try:
+            failed_ids = set(
+                self.client.change_visibility_batch(
+                    [x.header for x in extendable], timeout
+                )
+            )
+        except Exception as e:
+            logger.error("sqs_visibility_heartbeat_error", exc_info=e)
+            return
+
+        with self._lock:
+            for tracked in extendable:
+                if tracked.header.id in failed_ids:
+                    # 이미 삭제되었거나 handle 이 만료된 message
+                    self._tracked.pop(tracked.header.handle, None)
+                    self.num_failed += 1
+                elif tracked.header.handle in self._tracked:
+                    tracked.expires_at = now + timeout
+                    self.num_extended += 1
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(self.check_interval):
+            self.extend_due()
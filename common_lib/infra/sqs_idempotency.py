@@ -0,0 +1,183 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Callable, Optional
+
+from common_lib.infra.sqs_bulk import SQSClient
+from common_lib.models.message import ModelMessage
+
+logger = logging.getLogger(__name__)
+
+STATUS_NEW = "new"
+STATUS_IN_PROGRESS = "in_progress"
+STATUS_DONE = "done"
+
+
+@dataclass
+class IdempotencyStats:
+    hits: int = 0  # 이미 처리 완료된 key
+    misses: int = 0  # 처음 보는 key (처리 대상)
+    skipped: int = 0  # 처리하지 않고 바로 ack 한 message
+    in_progress: int = 0  # 다른 worker 가 처리 중이라 보류한 message
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+class _LocalTTLCache:
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._data: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at <= time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, ttl: float) -> None:
+        with self._lock:
+            self._data[key] = (value, time.time() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+
+class IdempotencyCache:
+    def __init__(
+        self,
+        max_size: int = 100000,
+        ttl: int = 24 * 60 * 60,
+        in_progress_ttl: int = 15 * 60,
+        redis_client: Optional[any] = None,
+        key_prefix: str = "sqs-idempotency:",
+        key_func: Optional[Callable[[ModelMessage], str]] = None,
+    ):
+        """
+        이미 처리 완료된 message 를 다시 처리하지 않도록 처리 상태를 기록합니다.
+        process 내부 LRU 를 먼저 보고, redis_client 가 주어지면 여러 process / host 가 상태를 공유합니다.
+        처리 시작 시 redis SET NX 로 key 를 선점하므로 같은 message 를 동시에 두 worker 가 처리하지 않습니다.
+        redis 오류 시에는 LRU 만으로 판단합니다. (중복 처리 가능, 유실 없음)
+        :param max_size: LRU 에 보관할 최대 key 수
+        :param ttl: 처리 완료 상태를 기억할 시간 (sec), SQS message 보관 기간 이상 권장
+        :param in_progress_ttl: 처리 중 상태의 유효 시간 (sec), worker 가 죽어도 이후 재처리되도록 visibility timeout 정도로 설정
+        :param redis_client: (optional) redis.Redis
+        :param key_prefix: redis key prefix
+        :param key_func: (optional) message 에서 key 를 만드는 함수 (기본: message id)
+                         같은 내용을 여러 번 publish 하는 경우 body 의 고유 값을 key 로 사용
+        """
+        self.ttl = ttl
+        self.in_progress_ttl = in_progress_ttl
+        self.redis = redis_client
+        self.key_prefix = key_prefix
+        self.key_func = key_func or (lambda message: message.header.id)
+        self.stats = IdempotencyStats()
+        self._local = _LocalTTLCache(max_size)
+        self._stats_lock = threading.Lock()
+
+    def _count(self, **kwargs) -> None:
+        with self._stats_lock:
+            for key, value in kwargs.items():
+                setattr(self.stats, key, getattr(self.stats, key) + value)
+
+    def key(self, message: ModelMessage) -> str:
+        return self.key_func(message)
+
+    def begin(self, key: str) -> str:
+        """
+        key 의 처리를 시작합니다.
+        :return: STATUS_NEW (처리해야 함) / STATUS_DONE (이미 완료) / STATUS_IN_PROGRESS (다른 곳에서 처리 중)
+        """
+        status = self._local.get(key)
+        if status is None and self.redis is not None:
+            try:
+                claimed = self.redis.set(
+                    self.key_prefix + key,
+                    STATUS_IN_PROGRESS,
+                    nx=True,
+                    ex=self.in_progress_ttl,
+                )
+                if not claimed:
+                    value = self.redis.get(self.key_prefix + key)
+                    if isinstance(value, bytes):
+                        value = value.decode("utf-8")
+                    # 확인 사이에 만료된 경우 처리 중으로 보고 다음 재전송 때 다시 시도
+                    status = value or STATUS_IN_PROGRESS
+                    if status == STATUS_DONE:
+                        self._local.set(key, STATUS_DONE, self.ttl)
+            except Exception as e:
+                logger.warning("idempotency_redis_error", exc_info=e)
+
+        if status == STATUS_DONE:
+            self._count(hits=1)
+            return STATUS_DONE
+        if status == STATUS_IN_PROGRESS:
+            self._count(in_progress=1)
+            return STATUS_IN_PROGRESS
+        self._local.set(key, STATUS_IN_PROGRESS, self.in_progress_ttl)
+        self._count(misses=1)
+        return STATUS_NEW
+
+    def complete(self, key: str) -> None:
+        """
+        처리 완료를 기록합니다. (ack 전에 호출)
+        """
+        self._local.set(key, STATUS_DONE, self.ttl)
+        if self.redis is not None:
+            try:
+                self.redis.set(self.key_prefix + key, STATUS_DONE, ex=self.ttl)
+            except Exception as e:
+                logger.warning("idempotency_redis_error", exc_info=e)
+
+    def release(self, key: str) -> None:
+        """
+        처리에 실패한 key 의 선점을 해제해서 재전송 시 다시 처리되도록 합니다.
+        """
+        self._local.delete(key)
+        if self.redis is not None:
+            try:
+                self.redis.delete(self.key_prefix + key)
+            except Exception as e:
+                logger.warning("idempotency_redis_error", exc_info=e)
+
+    def filter_messages(
+        self, client: SQSClient, messages: list[ModelMessage]
+    ) -> list[ModelMessage]:
+        """
+        이미 처리 완료된 message 는 바로 ack 하고, 처리 중인 message 는 ack 없이 제외합니다.
+        (visibility timeout 이후 다시 확인)
+        반환된 message 는 처리 후 complete() 또는 release() 를 호출해야 합니다.
+        :return: 처리해야 할 message 목록
+        """
+        result, done = [], []
+        for message in messages:
+            status = self.begin(self.key(message))
+            if status == STATUS_NEW:
+                result.append(message)
+            elif status == STATUS_DONE:
+                done.append(message.header)
+        if done:
+            try:
+                client.ack_batch(done)
+                self._count(skipped=len(done))
+            except Exception as e:
+                # 다음 재전송 때 다시 ack 를 시도한다
+                logger.error(
+                    "idempotency_ack_error",
+                    exc_info=e,
+                    extra={"msg_ids": [x.id for x in done]},
+                )
+        return result
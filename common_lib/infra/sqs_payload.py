@@ -0,0 +1,166 @@
+import gzip
+import json
+import logging
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Optional
+
+from common_lib.infra.s3 import S3
+
+logger = logging.getLogger(__name__)
+
+PAYLOAD_POINTER_KEY = "__sqs_payload_s3__"
+PAYLOAD_COMPRESSION_GZIP = "gzip"
+DEFAULT_PAYLOAD_THRESHOLD = 180 * 1024  # sqs_bulk.SQS_MAX_BYTES
+
+
+class S3PayloadStore:
+    def __init__(
+        self,
+        s3: S3,
+        prefix: str = "sqs-payload",
+        threshold: int = DEFAULT_PAYLOAD_THRESHOLD,
+        compress: bool = True,
+        max_workers: int = 16,
+    ):
+        """
+        SQS 에 보내기에 큰 message body 를 S3 에 저장하고, message 에는 작은 pointer 만 보냅니다.
+        (AWS SQS Extended Client 와 같은 방식)
+        저장한 object 는 지우지 않습니다. 재전송된 message 가 다시 읽을 수 있어야 하므로
+        prefix 에 S3 lifecycle 만료 규칙을 걸어서 정리합니다.
+        :param s3: payload 를 저장할 bucket 의 S3
+        :param prefix: payload object key prefix
+        :param threshold: 이 byte 수를 넘는 body 만 S3 에 저장
+        :param compress: gzip 으로 압축해서 저장할지 여부
+        :param max_workers: upload / download 를 동시에 진행할 수
+        """
+        self.s3 = s3
+        self.prefix = prefix.rstrip("/")
+        self.threshold = threshold
+        self.compress = compress
+        self.max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="sqs-payload"
+            )
+        return self._executor
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    @staticmethod
+    def is_pointer(body: str) -> bool:
+        return body.startswith('{"' + PAYLOAD_POINTER_KEY)
+
+    def _make_key(self) -> str:
+        now = datetime.utcnow()
+        ext = ".gz" if self.compress else ""
+        return f"{self.prefix}/{now:%Y/%m/%d}/{uuid.uuid4().hex}{ext}"
+
+    def offload(self, body: str, size: Optional[int] = None) -> str:
+        """
+        body 가 threshold 를 넘으면 S3 에 저장하고 pointer body 를 반환합니다. 아니면 body 그대로 반환합니다.
+        :param body: message body
+        :param size: (optional) 미리 계산한 body 의 UTF-8 byte 수
+        """
+        if size is not None and size <= self.threshold:
+            return body
+        data = body.encode("utf-8")
+        size = len(data)
+        if size <= self.threshold:
+            return body
+
+        key = self._make_key()
+        compression = None
+        if self.compress:
+            data = gzip.compress(data, compresslevel=6)
+            compression = PAYLOAD_COMPRESSION_GZIP
+        self.s3.client.put_object(Bucket=self.s3.bucket_name, Key=key, Body=data)
+        return json.dumps(
+            {
+                PAYLOAD_POINTER_KEY: {
+                    "bucket": self.s3.bucket_name,
+                    "key": key,
+                    "compression": compression,
+                    "size": size,
+                }
+            }
+        )
+
+    def offload_many(self, bodies: list[str], sizes: list[int]) -> list[str]:
+        """
+        threshold 를 넘는 body 들을 병렬로 S3 에 저장하고, 순서를 유지한 body 목록을 반환합니다.
+        """
+        result = list(bodies)
+        targets = [idx for idx, size in enumerate(sizes) if size > self.threshold]
+        if not targets:
+            return result
+        for idx, pointer in zip(
+            targets,
+            self.executor.map(lambda i: self.offload(bodies[i], sizes[i]), targets),
+        ):
+            result[idx] = pointer
+        return result
+
+    def _parse_pointer(self, body: str) -> dict:
+        """
+        이 store 가 만든 pointer 인지 확인합니다. (같은 bucket, prefix 아래의 key)
+        다른 bucket / key 를 가리키는 pointer 로 임의의 object 를 읽게 할 수 없도록 그 외에는 ValueError
+        """
+        parsed = json.loads(body)
+        pointer = parsed.get(PAYLOAD_POINTER_KEY) if isinstance(parsed, dict) else None
+        if not isinstance(pointer, dict) or len(parsed) != 1:
+            raise ValueError("invalid payload pointer")
+        bucket, key = pointer.get("bucket"), pointer.get("key")
+        if bucket != self.s3.bucket_name:
+            raise ValueError(f"payload pointer to unexpected bucket {bucket!r}")
+        if (
+            not isinstance(key, str)
+            or not key.startswith(self.prefix + "/")
+            or ".." in key.split("/")
+        ):
+            raise ValueError(f"payload pointer to unexpected key {key!r}")
+        return pointer
+
+    def resolve(self, body: str) -> str:
+        """
+        pointer body 이면 S3 에서 원래 body 를 읽어서 반환합니다. 아니면 body 그대로 반환합니다.
+        이 store 의 bucket / prefix 밖을 가리키는 pointer 는 ValueError 입니다.
+        """
+        if not self.is_pointer(body):
+            return body
+        pointer = self._parse_pointer(body)
+        result = self.s3.client.get_object(Bucket=pointer["bucket"], Key=pointer["key"])
+        data = result["Body"].read()
+        if pointer.get("compression") == PAYLOAD_COMPRESSION_GZIP:
+            data = gzip.decompress(data)
+        return data.decode("utf-8")
+
+    def resolve_many(self, bodies: list[str]) -> list[Optional[str]]:
+        """
+        pointer body 들을 병렬로 download 해서 순서를 유지한 body 목록을 반환합니다.
+        download 에 실패한 body 는 None 입니다.
+        """
+        result: list[Optional[str]] = list(bodies)
+        targets = [idx for idx, body in enumerate(bodies) if self.is_pointer(body)]
+        if not targets:
+            return result
+        futures = [self.executor.submit(self.resolve, bodies[idx]) for idx in targets]
+        for idx, future in zip(targets, futures):
+            try:
+                result[idx] = future.result()
+            except Exception as e:
+                logger.error(
+                    "sqs_payload_resolve_error",
+                    exc_info=e,
+                    extra={"pointer": bodies[idx]},
+                )
+                result[idx] = None
+        return result
@@ -0,0 +1,292 @@
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from common_lib.infra.sqs_bulk import SQSClient, SQS_MAX_ENTRIES
+from common_lib.infra.sqs_consumer import (
+    AckBuffer,
+    SQSConsumerMetrics,
+    drain_in_flight,
+    is_executor_dead,
+    run_ack_loop,
+    submit_in_flight,
+)
+from common_lib.infra.sqs_heartbeat import VisibilityHeartbeat
+from common_lib.models.message import ModelMessage, ModelMessageHeader
+from common_lib.utils.graceful_kill_helper import GracefulKillHelper
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class QueueSpec:
+    client: SQSClient
+    handler: Callable[[ModelMessage], any]
+    weight: int = 1
+    max_starvation: float = 30.0
+    prefetch: int = SQS_MAX_ENTRIES
+    recv_timeout: Optional[int] = None
+    # 주어지면 receive 부터 ack 까지 (buffer 에서 기다리는 동안 포함) visibility timeout 을 연장
+    heartbeat: Optional[VisibilityHeartbeat] = None
+
+    @property
+    def name(self) -> str:
+        return self.client.sqs_name
+
+
+class _QueueState:
+    def __init__(self, spec: QueueSpec, acks: AckBuffer):
+        self.spec = spec
+        self.buffer: deque[tuple[ModelMessage, float]] = deque()
+        self.current_weight = 0
+        self.metrics = acks.metrics
+        self.acks = acks
+
+
+class MultiQueueConsumer:
+    def __init__(
+        self,
+        queues: list[QueueSpec],
+        max_workers: int = 10,
+        executor: Optional[Executor] = None,
+        max_in_flight: Optional[int] = None,
+        ack_batch_size: int = SQS_MAX_ENTRIES,
+        ack_flush_interval: float = 1.0,
+    ):
+        """
+        여러 queue 를 동시에 long polling 하고, 하나의 worker pool 로 처리합니다.
+         + queue 마다 polling thread 가 최대 prefetch 개까지 message 를 미리 받아둡니다.
+         + worker 가 비면 message 가 있는 queue 중에서 weight 비율 (smooth weighted round-robin) 로 고릅니다.
+           비어있는 queue 는 건너뛰므로 idle queue 의 몫은 자동으로 바쁜 queue 로 넘어갑니다.
+         + 받아둔 message 가 max_starvation 초 이상 기다린 queue 는 weight 와 관계없이 먼저 처리합니다.
+         + 처리 완료된 message 는 queue 별로 모아서 ack 합니다. handler 에서 exception 이 발생하면 ack 하지 않습니다.
+        GracefulKillHelper.kill_now 또는 stop() 이후에는 receive 를 멈추고, 받은 message 를 모두 처리/ack 한 뒤 종료합니다.
+        :param queues: QueueSpec 목록 (queue 별 SQSClient, handler, weight, max_starvation, prefetch, heartbeat)
+        :param max_workers: executor 를 주지 않은 경우 생성할 ThreadPoolExecutor 크기
+        :param executor: (optional) 모든 queue 가 공유할 ThreadPoolExecutor / ProcessPoolExecutor
+        :param max_in_flight: 동시에 처리 중일 수 있는 message 수 (기본: max_workers)
+        :param ack_batch_size: ack 를 모아서 보낼 크기 (최대 10)
+        :param ack_flush_interval: ack buffer 를 비우는 최대 주기 (sec)
+        """
+        if not queues:
+            raise ValueError("queues must not be empty")
+        if any(x.weight <= 0 for x in queues):
+            raise ValueError("weight must be positive")
+        self.max_workers = max_workers
+        self._executor = executor
+        self._own_executor = executor is None
+        self.max_in_flight = max_in_flight or max_workers
+        self.ack_batch_size = min(ack_batch_size, SQS_MAX_ENTRIES)
+        self.ack_flush_interval = ack_flush_interval
+
+        self._stop_event = threading.Event()
+        self._in_flight = threading.BoundedSemaphore(self.max_in_flight)
+        # buffer / current_weight / metrics 는 모두 이 condition 의 lock 으로 보호한다
+        self._cond = threading.Condition()
+        self._ack_wakeup = threading.Event()
+        self.queues = [
+            _QueueState(
+                x,
+                AckBuffer(
+                    x.client,
+                    SQSConsumerMetrics(),
+                    self._cond,
+                    batch_size=self.ack_batch_size,
+                    flush_interval=ack_flush_interval,
+                    wakeup=self._ack_wakeup,
+                    on_acked=self._untrack(x.heartbeat),
+                ),
+            )
+            for x in queues
+        ]
+        self._pollers: list[threading.Thread] = []
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        with self._cond:
+            self._cond.notify_all()
+
+    @property
+    def stopping(self) -> bool:
+        return self._stop_event.is_set() or GracefulKillHelper.kill_now
+
+    @property
+    def metrics(self) -> dict[str, SQSConsumerMetrics]:
+        return {x.spec.name: x.metrics for x in self.queues}
+
+    @staticmethod
+    def _untrack(
+        heartbeat: Optional[VisibilityHeartbeat],
+    ) -> Optional[Callable[[list[ModelMessageHeader]], None]]:
+        if heartbeat is None:
+            return None
+
+        def untrack(headers: list[ModelMessageHeader]) -> None:
+            for header in headers:
+                heartbeat.untrack(header)
+
+        return untrack
+
+    def _poll_loop(self, state: _QueueState) -> None:
+        spec = state.spec
+        while not self.stopping:
+            with self._cond:
+                while len(state.buffer) >= spec.prefetch and not self.stopping:
+                    self._cond.wait(timeout=1.0)
+            if self.stopping:
+                break
+            try:
+                messages = spec.client.recv(timeout=spec.recv_timeout)
+                received_at = time.time()
+            except Exception as e:
+                logger.error(
+                    "sqs_scheduler_recv_error", exc_info=e, extra={"queue": spec.name}
+                )
+                time.sleep(1.0)
+                continue
+            if not messages:
+                continue
+            if spec.heartbeat is not None:
+                # weight 가 낮은 queue 는 buffer 에서 오래 기다릴 수 있으므로 receive 시점부터 연장한다
+                for message in messages:
+                    spec.heartbeat.track(message.header, received_at=received_at)
+            with self._cond:
+                state.metrics.received += len(messages)
+                state.buffer.extend((x, received_at) for x in messages)
+                self._cond.notify_all()
+
+    def _pick(self, now: float) -> Optional[_QueueState]:
+        ready = [x for x in self.queues if x.buffer]
+        if not ready:
+            return None
+        starving = [x for x in ready if now - x.buffer[0][1] >= x.spec.max_starvation]
+        if starving:
+            return max(starving, key=lambda x: now - x.buffer[0][1])
+
+        total = 0
+        for state in ready:
+            state.current_weight += state.spec.weight
+            total += state.spec.weight
+        chosen = max(ready, key=lambda x: x.current_weight)
+        chosen.current_weight -= total
+        return chosen
+
+    def _next(self) -> Optional[tuple[_QueueState, ModelMessage]]:
+        """
+        다음에 처리할 message 를 고릅니다. 종료 중이고 남은 message 가 없으면 None
+        """
+        with self._cond:
+            while True:
+                state = self._pick(time.time())
+                if state is not None:
+                    message, _ = state.buffer.popleft()
+                    self._cond.notify_all()
+                    return state, message
+                if self.stopping and not any(x.is_alive() for x in self._pollers):
+                    return None
+                self._cond.wait(timeout=0.5)
+
+    def _dispatch_all(self) -> None:
+        while True:
+            self._in_flight.acquire()
+            picked = self._next()
+            if picked is None:
+                self._in_flight.release()
+                return
+            state, message = picked
+            error = submit_in_flight(
+                self._executor,
+                self._in_flight,
+                state.spec.handler,
+                message,
+                lambda f, s=state, m=message: self._on_done(f, s, m),
+            )
+            if error is not None:
+                self._on_failed(state, message, error)
+                if is_executor_dead(error):
+                    self.stop()
+
+    def _on_done(self, future: Future, state: _QueueState, message: ModelMessage):
+        error = future.exception()
+        if error is not None:
+            self._on_failed(state, message, error)
+            return
+        with self._cond:
+            state.metrics.processed += 1
+        state.acks.add(message.header)
+
+    def _on_failed(
+        self, state: _QueueState, message: ModelMessage, error: BaseException
+    ) -> None:
+        """
+        처리하지 못한 message 는 ack 하지 않고 visibility timeout 이후 다시 받는다.
+        """
+        if state.spec.heartbeat is not None:
+            state.spec.heartbeat.untrack(message.header)
+        with self._cond:
+            state.metrics.failed += 1
+        logger.error(
+            "sqs_scheduler_handler_error",
+            exc_info=error,
+            extra={"queue": state.spec.name, "msg_id": message.header.id},
+        )
+
+    def run(self) -> dict[str, SQSConsumerMetrics]:
+        """
+        종료 요청이 올 때까지 message 를 처리합니다. (blocking)
+        :return: queue 이름 별 최종 metrics
+        """
+        if self._own_executor:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        self._pollers = [
+            threading.Thread(
+                target=self._poll_loop,
+                args=(state,),
+                name=f"sqs-scheduler-poll-{state.spec.name}",
+                daemon=True,
+            )
+            for state in self.queues
+        ]
+        ack_done = threading.Event()
+        acker = threading.Thread(
+            target=run_ack_loop,
+            args=(
+                [x.acks for x in self.queues],
+                self.ack_flush_interval,
+                ack_done,
+                self._ack_wakeup,
+            ),
+            name="sqs-scheduler-ack",
+            daemon=True,
+        )
+        heartbeats = [x.spec.heartbeat for x in self.queues if x.spec.heartbeat]
+        for heartbeat in heartbeats:
+            heartbeat.start()
+        for poller in self._pollers:
+            poller.start()
+        acker.start()
+
+        try:
+            self._dispatch_all()
+        finally:
+            # drain: polling 을 멈추고 이미 받은 message 는 모두 처리 후 ack
+            self.stop()
+            self._dispatch_all()
+            drain_in_flight(self._in_flight, self.max_in_flight)
+            if self._own_executor:
+                self._executor.shutdown(wait=True)
+            ack_done.set()
+            self._ack_wakeup.set()
+            acker.join()
+            for heartbeat in heartbeats:
+                heartbeat.stop()
+
+        logger.info(
+            "sqs_scheduler_stopped",
+            extra={"metrics": {k: v.to_dict() for k, v in self.metrics.items()}},
+        )
+        return self.metrics
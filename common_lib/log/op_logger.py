@@ -0,0 +1,160 @@
+import logging
+import random
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Optional
+
+
+@dataclass
+class OpStats:
+    calls: int = 0
+    errors: int = 0
+    num_bytes: int = 0
+    latency_sum: float = 0.0
+    latency_max: float = 0.0
+
+    @property
+    def latency_avg(self) -> float:
+        return self.latency_sum / self.calls if self.calls else 0.0
+
+    def to_dict(self) -> dict:
+        return {**asdict(self), "latency_avg": self.latency_avg}
+
+
+class _Tracker:
+    __slots__ = ("metrics", "op", "num_bytes", "started_at")
+
+    def __init__(self, metrics: "OperationMetrics", op: str):
+        self.metrics = metrics
+        self.op = op
+        self.num_bytes = 0
+        self.started_at = 0.0
+
+    def __enter__(self) -> "_Tracker":
+        self.started_at = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self.metrics.record(
+            self.op,
+            time.perf_counter() - self.started_at,
+            num_bytes=self.num_bytes,
+            error=exc_type is not None,
+        )
+        return False
+
+
+class OperationMetrics:
+    def __init__(self):
+        """
+        operation 별 호출 수 / 오류 수 / 전송 byte / latency 를 모읍니다. (thread-safe)
+        """
+        self._stats: dict[str, OpStats] = {}
+        self._lock = threading.Lock()
+
+    def record(
+        self, op: str, latency: float, num_bytes: int = 0, error: bool = False
+    ) -> None:
+        with self._lock:
+            stats = self._stats.get(op)
+            if stats is None:
+                stats = self._stats[op] = OpStats()
+            stats.calls += 1
+            stats.errors += error
+            stats.num_bytes += num_bytes
+            stats.latency_sum += latency
+            if latency > stats.latency_max:
+                stats.latency_max = latency
+
+    def track(self, op: str) -> _Tracker:
+        """
+        with 블록의 소요 시간을 기록합니다. 블록에서 exception 이 발생하면 오류로 기록합니다.
+        usage:
+            with metrics.track("get_file") as op:
+                data = ...
+                op.num_bytes = len(data)
+        """
+        return _Tracker(self, op)
+
+    def snapshot(self) -> dict[str, dict]:
+        with self._lock:
+            return {op: stats.to_dict() for op, stats in self._stats.items()}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+
+class RateLimitedLogger:
+    def __init__(
+        self,
+        logger: logging.Logger,
+        interval: float = 10.0,
+        max_per_interval: int = 10,
+        sample_rate: float = 1.0,
+    ):
+        """
+        같은 event 의 반복 log 를 interval 초 당 max_per_interval 개로 제한합니다.
+        제한된 개수는 다음에 출력되는 같은 event 의 log 에 suppressed 로 붙습니다.
+        level 이 꺼져 있으면 extra 를 만들기 전에 바로 반환하므로 비용이 거의 없습니다.
+        :param logger: 실제로 출력할 logger
+        :param interval: rate limit 주기 (sec)
+        :param max_per_interval: 주기 당 event 별 최대 출력 수, 0 이하이면 제한 없음
+        :param sample_rate: DEBUG / INFO log 를 출력할 비율 (WARNING 이상은 항상 rate limit 만 적용)
+        """
+        self.logger = logger
+        self.interval = interval
+        self.max_per_interval = max_per_interval
+        self.sample_rate = sample_rate
+        # event -> [window 시작 시각, window 내 출력 수, 제한된 수]
+        self._windows: dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def _allow(self, event: str) -> Optional[int]:
+        """
+        :return: 출력해도 되면 그동안 제한된 수, 아니면 None
+        """
+        if self.max_per_interval <= 0:
+            return 0
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(event)
+            if window is None or now - window[0] >= self.interval:
+                suppressed = window[2] if window is not None else 0
+                self._windows[event] = [now, 1, 0]
+                return suppressed
+            if window[1] < self.max_per_interval:
+                window[1] += 1
+                suppressed, window[2] = window[2], 0
+                return suppressed
+            window[2] += 1
+            return None
+
+    def log(self, level: int, event: str, exc_info=None, **extra) -> None:
+        if not self.logger.isEnabledFor(level):
+            return
+        if (
+            level < logging.WARNING
+            and self.sample_rate < 1.0
+            and random.random() >= self.sample_rate
+        ):
+            return
+        suppressed = self._allow(event)
+        if suppressed is None:
+            return
+        if suppressed:
+            extra["suppressed"] = suppressed
+        self.logger.log(level, event, exc_info=exc_info, extra=extra)
+
+    def debug(self, event: str, **extra) -> None:
+        self.log(logging.DEBUG, event, **extra)
+
+    def info(self, event: str, **extra) -> None:
+        self.log(logging.INFO, event, **extra)
+
+    def warning(self, event: str, **extra) -> None:
+        self.log(logging.WARNING, event, **extra)
+
+    def error(self, event: str, **extra) -> None:
+        self.log(logging.ERROR, event, **extra)
@@ -6,6 +6,7 @@ import ujson as json
 from common_lib.errors import ErrorWithExtraInfo
 from common_lib.errors.exception import ExtraModel
 from common_lib.infra.sqs_bulk import SQSClient
+from common_lib.infra.sqs_codec import MessageCodec
 from common_lib.models.pipeline_logger import PipelineLogItem
 from common_lib.utils.singleton import Singleton, initialize_once
 
@@ -42,10 +43,17 @@ class PipelineLogger(Singleton):
         self,
         app_name: str,
         pipeline_log_queue: str,
+        codec: Optional[MessageCodec] = None,
     ):
+        """
+        :param app_name: 로그에 기록할 app 이름
+        :param pipeline_log_queue: 로그를 보낼 SQS Queue Name
+        :param codec: (optional) 로그 body 압축 codec (GzipCodec / ZstdCodec), consumer 는 자동으로 압축을 풉니다.
+        """
         self.app_name = app_name
         self.sqs = SQSClient(
             sqs_name=pipeline_log_queue,
+            codec=codec,
         )
 
     def put(
@@ -54,6 +62,7 @@ class PipelineLogger(Singleton):
         logger=None,
         event: Optional[str] = None,
         status: Optional[str] = None,
+        max_workers: Optional[int] = None,
     ):
         """
         DataLake에 로그를 기록합니다. Exception 발생하는 경우 모든 data가 들어가지 않으니 로직상 검토가 필요합니다.
@@ -69,6 +78,8 @@ class PipelineLogger(Singleton):
                               소문자로 ["insert", "update-tagging","update-metadata", "unknown"] 만 입력 가능합니다.
         @param status: (optional) 값이 있는 경우 입력 항목의 모든 status 값을 해당 값으로 대체합니다.
                               소문자로 ["ok", "fail", "drop"] 만 입력 가능합니다.
+        @param max_workers: (optional) 값이 있는 경우 chunk 들을 동시에 보내고 실패한 항목만 재시도합니다.
+                              재시도 후에도 실패한 항목이 있으면 PipelineLoggerRuntimeError 가 발생합니다.
         @return:
         """
         now = datetime.utcnow()
@@ -79,7 +90,18 @@ class PipelineLogger(Singleton):
             )
             for item in data
         ]
-        self.sqs.publish_batch(records, logger)
+        if max_workers is None:
+            self.sqs.publish_batch(records, logger)
+            return
+
+        result = self.sqs.publish_batch_concurrent(
+            records, logger, max_workers=max_workers
+        )
+        if not result.ok:
+            raise PipelineLoggerRuntimeError(
+                f"failed to put {len(result.failed)} of {len(records)} records",
+                extra=ExtraModel(etc={"failed": [vars(x) for x in result.failed[:10]]}),
+            )
 
     def _convert_item(
         self,
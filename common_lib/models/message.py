@@ -1,4 +1,6 @@
 from dataclasses import dataclass
+from typing import Any, Optional
+
 from dataclasses_json import DataClassJsonMixin
 
 
@@ -9,15 +11,28 @@ class ModelMessageHeader(DataClassJsonMixin):
     handle: str
     attributes: dict
     num_trial: int
+    message_attributes: Optional[dict] = None  # 받은 그대로의 MessageAttributes
 
 
 @dataclass
 class ModelMessage(DataClassJsonMixin):
     header: ModelMessageHeader
     body: str
+    raw_body: Optional[str] = None  # decode 전의 body (압축 / S3 pointer), decode 한 경우에만
 
 
 @dataclass
 class MessageSet(DataClassJsonMixin):
     header: ModelMessageHeader
     parsed: dict
+
+
+@dataclass
+class TypedMessageSet(MessageSet):
+    data: Any = None  # parsed 를 recv_typed 의 model_cls 로 decode 한 값
+
+
+@dataclass
+class MessageDecodeFailure:
+    message: ModelMessage
+    error: str
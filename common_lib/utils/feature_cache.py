@@ -0,0 +1,885 @@
+import binascii
+import json
+import logging
+import os
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from os.path import join, exists
+from typing import Callable, Optional, Union
+
+import numpy as np
+
+from common_lib.models.img_feature import (
+    FeatureColorWeight,
+    FeatureListForGroup,
+    FeatureSet,
+    ModelFeature,
+)
+from common_lib.utils.ulid_generator import ulid_generator
+
+try:
+    import fcntl
+except ImportError:  # windows 에서는 worker 간 index lock 없이 동작
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Row order of the feature tensor: (weight, row, dim)
+FEATURE_COLOR_WEIGHTS = (
+    FeatureColorWeight.LOW,
+    FeatureColorWeight.MEDIUM,
+    FeatureColorWeight.HIGH,
+)
+FEATURE_DTYPE = np.float32
+
+LEGACY_SUFFIX = ".npz"
+FEATURES_SUFFIX = ".features.npy"
+FEAT_HASH_SUFFIX = ".feat_hash.npy"
+PRODUCT_ID_SUFFIX = ".product_id.npy"
+FEAT_HASH_DTYPE = "S32"  # md5 hexdigest
+DIGEST_DTYPE = "S16"  # md5 digest
+
+INDEX_NAME = "feature_index"
+INDEX_MANIFEST = INDEX_NAME + ".json"
+INDEX_LOCK = INDEX_NAME + ".lock"
+INDEX_ROW_BITS = 32
+
+
+def _weight_index(feature_color_weight: Union[str, FeatureColorWeight]) -> int:
+    return FEATURE_COLOR_WEIGHTS.index(FeatureColorWeight(feature_color_weight))
+
+
+def to_digests(feat_hashes: Union[list[str], np.ndarray]) -> np.ndarray:
+    """
+    md5 hexdigest 들을 16 byte digest 배열 (S16) 로 변환한다.
+    """
+    hexes = np.ascontiguousarray(feat_hashes, dtype=FEAT_HASH_DTYPE)
+    return np.frombuffer(binascii.unhexlify(hexes.tobytes()), dtype=DIGEST_DTYPE)
+
+
+def split_digests(digests: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    S16 digest 를 big-endian uint64 (hi, lo) 두 컬럼으로 나눈다.
+    문자열 비교 대신 정수 비교를 쓰기 위함.
+    """
+    pairs = np.ascontiguousarray(digests, dtype=DIGEST_DTYPE).view(">u8")
+    pairs = pairs.reshape(-1, 2).astype(np.uint64)
+    return pairs[:, 0].copy(), pairs[:, 1].copy()
+
+
+class FeatureHashIndex:
+    """
+    digest 의 hi 를 정렬해두고 searchsorted 로 row 를 찾는다. (O(log n) / query)
+    같은 digest 가 여러 row 에 있으면 가장 앞 row 를 돌려준다.
+    """
+
+    def __init__(self, hi: np.ndarray, lo: np.ndarray, rows: np.ndarray):
+        """
+        :param hi: hi 기준 정렬된 uint64
+        :param lo: hi 와 같은 순서의 uint64
+        :param rows: hi 와 같은 순서의 row
+        """
+        self.hi = hi
+        self.lo = lo
+        self.rows = rows
+
+    @classmethod
+    def from_digests(cls, digests: np.ndarray) -> "FeatureHashIndex":
+        hi, lo = split_digests(digests)
+        order = np.argsort(hi, kind="stable")
+        return cls(hi=hi[order], lo=lo[order], rows=order.astype(np.int64))
+
+    def __len__(self) -> int:
+        return len(self.hi)
+
+    def lookup(
+        self,
+        digests: np.ndarray,
+        accept: Optional[Callable[[np.ndarray], np.ndarray]] = None,
+    ) -> np.ndarray:
+        """
+        :param digests: S16 digest 배열
+        :param accept: (optional) rows -> bool 배열, False 인 row 는 없는 것으로 보고 같은 digest 의 다음 row 를 찾는다
+        :return: 각 digest 의 row (없으면 -1)
+        """
+        result = np.full(len(digests), -1, dtype=np.int64)
+        if len(self) == 0 or len(digests) == 0:
+            return result
+
+        q_hi, q_lo = split_digests(digests)
+        # query 를 정렬해서 찾으면 searchsorted 의 memory access 가 순차적이 된다
+        q_order = np.argsort(q_hi)
+        pos = np.empty(len(q_hi), dtype=np.int64)
+        pos[q_order] = np.searchsorted(self.hi, q_hi[q_order])
+        np.minimum(pos, len(self) - 1, out=pos)
+        same_hi = self.hi[pos] == q_hi
+        hit = same_hi & (self.lo[pos] == q_lo)
+        if accept is not None:
+            hit[hit] = accept(self.rows[pos[hit]])
+        result[hit] = self.rows[pos[hit]]
+
+        # hi 가 같고 lo 가 다르거나 (중복 digest / prefix 충돌) accept 되지 않은 경우는 run 전체를 확인
+        for idx in np.flatnonzero(same_hi & ~hit).tolist():
+            start = pos[idx]
+            end = np.searchsorted(self.hi, q_hi[idx], side="right")
+            matched = start + np.flatnonzero(self.lo[start:end] == q_lo[idx])
+            if accept is not None and len(matched) > 0:
+                matched = matched[accept(self.rows[matched])]
+            if len(matched) > 0:
+                result[idx] = self.rows[matched[0]]
+        return result
+
+
+def shard_paths(file_dir: str, name: str) -> tuple[str, str, str]:
+    """
+    columnar shard 를 구성하는 파일 경로 (features, feat_hash, product_id)
+    """
+    stem = join(file_dir, name)
+    return (
+        stem + FEATURES_SUFFIX,
+        stem + FEAT_HASH_SUFFIX,
+        stem + PRODUCT_ID_SUFFIX,
+    )
+
+
+def _save_npy_atomic(path: str, array: np.ndarray) -> None:
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    with open(tmp_path, "wb") as f:
+        np.save(f, array, allow_pickle=False)
+    os.replace(tmp_path, path)
+
+
+class FeatureCacheShard:
+    """
+    하나의 feature 파일 묶음.
+     + features: float32 (3, N, D), FEATURE_COLOR_WEIGHTS 순서
+     + feat_hashes: S32 (N,)
+     + product_ids: S* (N,), utf-8
+    open() 으로 연 경우 모든 배열은 read-only memmap 이라 실제로 접근한 page 만 메모리에 올라간다.
+    fingerprint 는 feat_hash 파일의 (크기, mtime) 으로, 같은 이름으로 다시 만들어진 shard 를 구분한다.
+    (파일에서 열지 않은 shard 는 None)
+    """
+
+    def __init__(
+        self,
+        name: str,
+        features: np.ndarray,
+        feat_hashes: np.ndarray,
+        product_ids: np.ndarray,
+        fingerprint: Optional[str] = None,
+    ):
+        if features.ndim != 3 or features.shape[0] != len(FEATURE_COLOR_WEIGHTS):
+            raise ValueError(f"invalid feature shape {features.shape} ({name})")
+        if not (features.shape[1] == len(feat_hashes) == len(product_ids)):
+            raise ValueError(f"row count mismatch ({name})")
+        self.name = name
+        self.features = features
+        self.feat_hashes = feat_hashes
+        self.product_ids = product_ids
+        self.fingerprint = fingerprint
+
+    @classmethod
+    def open(cls, file_dir: str, name: str) -> "FeatureCacheShard":
+        features_path, feat_hash_path, product_id_path = shard_paths(file_dir, name)
+        stat = os.stat(feat_hash_path)
+        return cls(
+            name=name,
+            features=np.load(features_path, mmap_mode="r", allow_pickle=False),
+            feat_hashes=np.load(feat_hash_path, mmap_mode="r", allow_pickle=False),
+            product_ids=np.load(product_id_path, mmap_mode="r", allow_pickle=False),
+            fingerprint=f"{stat.st_size}-{stat.st_mtime_ns}",
+        )
+
+    def __len__(self) -> int:
+        return len(self.feat_hashes)
+
+    @property
+    def dim(self) -> int:
+        return self.features.shape[2]
+
+    def get_features(
+        self,
+        feature_color_weight: Union[str, FeatureColorWeight],
+        rows: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        matrix = self.features[_weight_index(feature_color_weight)]
+        return matrix if rows is None else matrix[rows]
+
+    def save(self, file_dir: str, name: Optional[str] = None) -> "FeatureCacheShard":
+        name = self.name if name is None else name
+        features_path, feat_hash_path, product_id_path = shard_paths(file_dir, name)
+        _save_npy_atomic(
+            features_path, np.ascontiguousarray(self.features, FEATURE_DTYPE)
+        )
+        _save_npy_atomic(feat_hash_path, np.asarray(self.feat_hashes, FEAT_HASH_DTYPE))
+        _save_npy_atomic(product_id_path, np.asarray(self.product_ids, np.bytes_))
+        return FeatureCacheShard.open(file_dir, name)
+
+
+class PersistentFeatureIndex:
+    """
+    file_dir 에 저장되는 feat_hash -> (shard, row) index. 같은 file_dir 의 여러 FeatureSet 이 함께 사용한다.
+     + feature_index.json: shard 목록 (name, rows, fingerprint), segment 목록
+     + feature_index.{seq}.npy: uint64 (3, n) = (hi, lo, shard << 32 | row), hi 기준 정렬
+    segment 는 memmap 으로 열기 때문에 lookup 은 segment 마다 O(log n) page 만 읽는다.
+    shard 가 추가되면 segment 를 하나 더 쓰고 manifest 만 교체한다. (기존 segment 는 그대로)
+    빠지거나 다시 만들어진 shard 는 segment 를 고치지 않고 manifest 에서 name 을 None 으로 표시하며 (tombstone),
+    compact 할 때 segment 에서도 지운다.
+    index 를 바꾸는 method 는 feature_index.lock 을 잡고 최신 manifest 를 다시 읽은 뒤 수정하므로
+    여러 worker 가 같은 file_dir 을 동시에 갱신해도 segment 이름이나 manifest 가 겹치지 않는다.
+    """
+
+    def __init__(
+        self,
+        file_dir: str,
+        shards: Optional[list[dict]] = None,
+        segments: Optional[list[str]] = None,
+        next_segment: int = 0,
+    ):
+        self.file_dir = file_dir
+        self.shards: list[dict] = list(shards or [])
+        self.segments: list[str] = list(segments or [])
+        self.next_segment = next_segment
+        self._segment_indexes = [self._open_segment(name) for name in self.segments]
+
+    @staticmethod
+    def _read_manifest(file_dir: str) -> Optional[dict]:
+        path = join(file_dir, INDEX_MANIFEST)
+        if not exists(path):
+            return None
+        with open(path, "r") as f:
+            return json.load(f)
+
+    @classmethod
+    def open(cls, file_dir: str) -> "PersistentFeatureIndex":
+        manifest = cls._read_manifest(file_dir)
+        if manifest is None:
+            return cls(file_dir)
+        return cls(
+            file_dir,
+            shards=manifest["shards"],
+            segments=manifest["segments"],
+            next_segment=manifest["next_segment"],
+        )
+
+    def _reload(self) -> None:
+        manifest = self._read_manifest(self.file_dir) or {
+            "shards": [],
+            "segments": [],
+            "next_segment": self.next_segment,
+        }
+        self.shards = manifest["shards"]
+        self.next_segment = manifest["next_segment"]
+        if manifest["segments"] != self.segments:
+            self.segments = manifest["segments"]
+            self._segment_indexes = [self._open_segment(name) for name in self.segments]
+
+    @contextmanager
+    def _locked(self):
+        """
+        다른 worker 와 동시에 index 를 바꾸지 않도록 lock 을 잡고 최신 manifest 를 다시 읽는다.
+        (flock 은 같은 process 안에서도 재진입할 수 없으므로 public method 에서만 사용)
+        """
+        with open(join(self.file_dir, INDEX_LOCK), "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                self._reload()
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def __len__(self) -> int:
+        return sum(len(index) for index in self._segment_indexes)
+
+    @property
+    def shard_names(self) -> list[Optional[str]]:
+        """
+        shard index 순서의 이름 목록 (빠진 shard 는 None)
+        """
+        return [shard["name"] for shard in self.shards]
+
+    def _open_segment(self, name: str) -> FeatureHashIndex:
+        columns = np.load(join(self.file_dir, name), mmap_mode="r", allow_pickle=False)
+        return FeatureHashIndex(hi=columns[0], lo=columns[1], rows=columns[2])
+
+    def _write_segment(self, hi: np.ndarray, lo: np.ndarray, locs: np.ndarray) -> str:
+        order = np.argsort(hi, kind="stable")
+        name = f"{INDEX_NAME}.{self.next_segment:04d}.npy"
+        _save_npy_atomic(
+            join(self.file_dir, name), np.stack([hi[order], lo[order], locs[order]])
+        )
+        self.next_segment += 1
+        return name
+
+    def _write_manifest(self) -> None:
+        path = join(self.file_dir, INDEX_MANIFEST)
+        tmp_path = f"{path}.tmp.{os.getpid()}"
+        with open(tmp_path, "w") as f:
+            json.dump(
+                {
+                    "shards": self.shards,
+                    "segments": self.segments,
+                    "next_segment": self.next_segment,
+                },
+                f,
+            )
+        os.replace(tmp_path, path)
+
+    def _remove_segment_files(self, names: list[str]) -> None:
+        for name in names:
+            try:
+                os.remove(join(self.file_dir, name))
+            except FileNotFoundError:
+                pass
+
+    def append_shard(self, shard: FeatureCacheShard) -> None:
+        """
+        shard 하나를 새 segment 로 추가한다. 이미 있는 shard 는 무시한다.
+        """
+        with self._locked():
+            self._append_shard(shard)
+
+    def _append_shard(self, shard: FeatureCacheShard) -> None:
+        if shard.name in self.shard_names:
+            return
+        if len(self.shards) >= 1 << (64 - INDEX_ROW_BITS - 1):
+            raise ValueError("too many shards in the feature index, compact() first")
+        shard_idx = np.uint64(len(self.shards))
+        hi, lo = split_digests(to_digests(shard.feat_hashes))
+        locs = (shard_idx << np.uint64(INDEX_ROW_BITS)) | np.arange(
+            len(shard), dtype=np.uint64
+        )
+        name = self._write_segment(hi, lo, locs)
+        self.shards.append(
+            {"name": shard.name, "rows": len(shard), "fingerprint": shard.fingerprint}
+        )
+        self.segments.append(name)
+        self._segment_indexes.append(self._open_segment(name))
+        self._write_manifest()
+
+    def sync(self, shards: list[FeatureCacheShard]) -> None:
+        """
+        index 에 없는 shard 를 추가한다. 같은 이름인데 row 수나 fingerprint 가 다른 shard 는
+        (offline 재생성 등) 기존 항목을 빼고 다시 추가한다. 다른 FeatureSet 의 shard 는 그대로 둔다.
+        """
+        with self._locked():
+            indexed = {x["name"]: x for x in self.shards if x["name"] is not None}
+            changed = [
+                shard.name
+                for shard in shards
+                if shard.name in indexed
+                and (
+                    indexed[shard.name]["rows"] != len(shard)
+                    or indexed[shard.name].get("fingerprint") != shard.fingerprint
+                )
+            ]
+            if changed:
+                self._remove_shards(changed)
+            for shard in shards:
+                self._append_shard(shard)
+
+    def replace_shards(
+        self, removed: list[str], added: list[FeatureCacheShard]
+    ) -> None:
+        """
+        removed 이름의 shard 를 빼고 added shard 를 추가한다. (FeatureSet compaction 등)
+        """
+        with self._locked():
+            self._remove_shards(removed)
+            for shard in added:
+                self._append_shard(shard)
+
+    def _remove_shards(self, names: list[str]) -> None:
+        names = set(names)
+        removed = False
+        for shard in self.shards:
+            if shard["name"] in names:
+                shard["name"] = None
+                removed = True
+        if removed:
+            self._write_manifest()
+
+    def rebuild(self, shards: list[FeatureCacheShard]) -> None:
+        """
+        index 를 shards 만으로 처음부터 다시 만든다. 다른 FeatureSet 의 shard 도 빠지므로
+        file_dir 전체의 shard 를 넘기는 경우에만 사용한다.
+        """
+        with self._locked():
+            self._reset()
+            for shard in shards:
+                self._append_shard(shard)
+
+    def reset(self) -> None:
+        with self._locked():
+            self._reset()
+
+    def _reset(self) -> None:
+        old_segments = self.segments
+        self.shards, self.segments, self._segment_indexes = [], [], []
+        self._write_manifest()
+        self._remove_segment_files(old_segments)
+
+    def compact(self) -> None:
+        """
+        모든 segment 를 하나로 합치고, 빠진 shard 의 항목을 지운다.
+        """
+        with self._locked():
+            self._compact()
+
+    def _compact(self) -> None:
+        live = np.array([x["name"] is not None for x in self.shards], dtype=bool)
+        if len(self.segments) <= 1 and live.all():
+            return
+        hi = np.concatenate([index.hi for index in self._segment_indexes])
+        lo = np.concatenate([index.lo for index in self._segment_indexes])
+        locs = np.concatenate([index.rows for index in self._segment_indexes])
+
+        # 남는 shard 에 새 번호를 매긴다
+        shard_idx = (locs >> np.uint64(INDEX_ROW_BITS)).astype(np.int64)
+        keep = live[shard_idx]
+        new_idx = np.cumsum(live) - 1
+        row_mask = np.uint64((1 << INDEX_ROW_BITS) - 1)
+        locs = (
+            new_idx[shard_idx[keep]].astype(np.uint64) << np.uint64(INDEX_ROW_BITS)
+        ) | (locs[keep] & row_mask)
+        name = self._write_segment(hi[keep], lo[keep], locs)
+
+        old_segments = self.segments
+        self.shards = [x for x in self.shards if x["name"] is not None]
+        self.segments = [name]
+        self._segment_indexes = [self._open_segment(name)]
+        self._write_manifest()
+        self._remove_segment_files(old_segments)
+
+    def lookup(
+        self, digests: np.ndarray, shard_mask: Optional[np.ndarray] = None
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        :param digests: S16 digest 배열
+        :param shard_mask: (optional) self.shards 기준 bool 배열, 주어지면 True 인 shard 의 row 만 찾는다.
+                           (다른 shard 에 같은 digest 가 먼저 있어도 다음 항목 / segment 를 계속 찾음)
+        :return: (shard index (self.shards 기준), row), 없으면 둘 다 -1
+        """
+        accept = None
+        if shard_mask is not None:
+            shard_mask = np.asarray(shard_mask, dtype=bool)
+
+            def accept(locs: np.ndarray) -> np.ndarray:
+                return shard_mask[(locs >> np.uint64(INDEX_ROW_BITS)).astype(np.int64)]
+
+        locs = np.full(len(digests), -1, dtype=np.int64)
+        for index in self._segment_indexes:
+            pending = np.flatnonzero(locs < 0)
+            if len(pending) == 0:
+                break
+            locs[pending] = index.lookup(digests[pending], accept)
+
+        hit = locs >= 0
+        shard_idx = np.full(len(digests), -1, dtype=np.int64)
+        rows = np.full(len(digests), -1, dtype=np.int64)
+        shard_idx[hit] = locs[hit] >> INDEX_ROW_BITS
+        rows[hit] = locs[hit] & ((1 << INDEX_ROW_BITS) - 1)
+        return shard_idx, rows
+
+
+class FeatureCache:
+    """
+    FeatureSet 에 속한 shard 들을 하나의 row 공간으로 보여준다.
+    global row i 는 offsets 로 (shard, local row) 로 변환된다.
+    """
+
+    def __init__(self, shards: list[FeatureCacheShard]):
+        self.shards = shards
+        self.offsets = np.cumsum([0] + [len(shard) for shard in shards])
+        self._hash_index: Optional[FeatureHashIndex] = None
+        self._persistent_index: Optional[PersistentFeatureIndex] = None
+        self._index_shard_pos: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return int(self.offsets[-1])
+
+    @property
+    def dim(self) -> int:
+        return self.shards[0].dim if self.shards else 0
+
+    @property
+    def feat_hashes(self) -> np.ndarray:
+        if not self.shards:
+            return np.empty(0, dtype=FEAT_HASH_DTYPE)
+        return np.concatenate([shard.feat_hashes for shard in self.shards])
+
+    @property
+    def hash_index(self) -> FeatureHashIndex:
+        if self._hash_index is None:
+            self._hash_index = FeatureHashIndex.from_digests(
+                to_digests(self.feat_hashes)
+            )
+        return self._hash_index
+
+    def attach_index(self, persistent_index: PersistentFeatureIndex) -> None:
+        """
+        lookup 에 in-memory index 대신 persistent index 를 사용한다.
+        index 에 없는 shard 의 row 는 찾지 못하므로 먼저 sync() 해두어야 한다.
+        index 의 다른 shard (같은 file_dir 의 다른 FeatureSet, compaction 전후 shard) 는 무시한다.
+        """
+        positions = {shard.name: pos for pos, shard in enumerate(self.shards)}
+        self._index_shard_pos = np.array(
+            # 마지막 -1 은 miss (shard index -1) 를 위한 자리
+            [positions.get(name, -1) for name in persistent_index.shard_names] + [-1],
+            dtype=np.int64,
+        )
+        self._persistent_index = persistent_index
+
+    def lookup_digests(self, digests: np.ndarray) -> np.ndarray:
+        """
+        digest 들의 global row 를 찾는다. (없으면 -1)
+        """
+        if self._persistent_index is None:
+            return self.hash_index.lookup(digests)
+
+        if len(self._index_shard_pos) != len(self._persistent_index.shards) + 1:
+            # attach 이후 index 에 shard 가 추가된 경우
+            self.attach_index(self._persistent_index)
+        shard_idx, rows = self._persistent_index.lookup(
+            digests, self._index_shard_pos[:-1] >= 0
+        )
+        positions = self._index_shard_pos[shard_idx]
+        hit = positions >= 0
+        result = np.full(len(digests), -1, dtype=np.int64)
+        result[hit] = self.offsets[positions[hit]] + rows[hit]
+        return result
+
+    def lookup(self, feat_hashes: Union[list[str], np.ndarray]) -> np.ndarray:
+        """
+        feat_hash 들의 global row 를 찾는다. (없으면 -1)
+        """
+        return self.lookup_digests(to_digests(feat_hashes))
+
+    def _locate(self, rows: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        rows = np.asarray(rows, dtype=np.int64)
+        shard_idx = np.searchsorted(self.offsets, rows, side="right") - 1
+        return shard_idx, rows - self.offsets[shard_idx]
+
+    def take(
+        self,
+        rows: np.ndarray,
+        feature_color_weight: Union[str, FeatureColorWeight],
+        out: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """
+        global row 들의 feature 를 (len(rows), D) float32 행렬로 모은다.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        if out is None:
+            out = np.empty((len(rows), self.dim), dtype=FEATURE_DTYPE)
+        shard_idx, local_rows = self._locate(rows)
+        for idx in np.unique(shard_idx):
+            mask = shard_idx == idx
+            out[mask] = self.shards[idx].get_features(
+                feature_color_weight, local_rows[mask]
+            )
+        return out
+
+    def get_product_ids(self, rows: np.ndarray) -> list[str]:
+        shard_idx, local_rows = self._locate(rows)
+        return [
+            self.shards[s].product_ids[r].decode("utf-8")
+            for s, r in zip(shard_idx.tolist(), local_rows.tolist())
+        ]
+
+
+@dataclass
+class CachedFeatureDiff:
+    """
+    download_list 와 FeatureCache 의 비교 결과
+     + download_idx: cache 에 있는 항목의 download_list 내 위치
+     + cached_rows: download_idx 에 대응하는 FeatureCache 의 global row
+     + new_download_list: cache 에 없는 항목 (입력 순서 유지, feat_hash 중복 제거)
+    """
+
+    download_idx: np.ndarray = field(
+        default_factory=lambda: np.empty(0, dtype=np.int64)
+    )
+    cached_rows: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int64))
+    new_download_list: list[FeatureListForGroup] = field(default_factory=list)
+
+
+def diff_download_list(
+    feature_cache: FeatureCache, download_list: list[FeatureListForGroup]
+) -> CachedFeatureDiff:
+    """
+    download_list 중 cache 에 없는 항목만 골라낸다. dict/set 을 만들지 않고
+    digest 배열의 정렬 + searchsorted 로 membership 을 판단한다.
+    """
+    if not download_list:
+        return CachedFeatureDiff()
+
+    digests = to_digests([x.feat_hash for x in download_list])
+    rows = feature_cache.lookup_digests(digests)
+    hit = rows >= 0
+    download_idx = np.flatnonzero(hit)
+
+    miss_idx = np.flatnonzero(~hit)
+    _, first = np.unique(digests[miss_idx], return_index=True)
+    miss_idx = miss_idx[np.sort(first)]
+
+    return CachedFeatureDiff(
+        download_idx=download_idx,
+        cached_rows=rows[download_idx],
+        new_download_list=[download_list[i] for i in miss_idx.tolist()],
+    )
+
+
+def _legacy_feature_vectors(feature) -> list:
+    if isinstance(feature, (bytes, bytearray)):
+        from common_lib.utils.img_feature import deserialize
+
+        feature = deserialize(feature)
+    elif isinstance(feature, dict):
+        feature = ModelFeature.from_dict(feature)
+
+    if isinstance(feature, ModelFeature):
+        return [
+            feature.feature_without_color,
+            feature.feature_with_color,
+            feature.feature_with_color_more,
+        ]
+    vectors = np.asarray(feature, dtype=FEATURE_DTYPE)
+    if vectors.ndim == 2 and vectors.shape[0] == len(FEATURE_COLOR_WEIGHTS):
+        return list(vectors)
+    raise TypeError(f"unsupported legacy feature type: {type(feature)}")
+
+
+def read_legacy_npz(path: str, name: Optional[str] = None) -> FeatureCacheShard:
+    """
+    기존 npz (feature_lists: FeatureListForGroup, features: ModelFeature) 파일을 읽어
+    in-memory shard 로 변환한다. pickle 을 풀기 때문에 변환 용도로만 사용한다.
+    """
+    if name is None:
+        name = os.path.basename(path)[: -len(LEGACY_SUFFIX)]
+    npzfile = np.load(path, allow_pickle=True)
+    feature_lists = npzfile["feature_lists"]
+    vectors = [_legacy_feature_vectors(feature) for feature in npzfile["features"]]
+
+    dim = next(
+        (len(v) for row in vectors for v in row if v is not None and len(v) > 0), 0
+    )
+    features = np.zeros((len(FEATURE_COLOR_WEIGHTS), len(vectors), dim), FEATURE_DTYPE)
+    for row, row_vectors in enumerate(vectors):
+        for weight_idx, vector in enumerate(row_vectors):
+            if vector is not None and len(vector) > 0:
+                features[weight_idx, row] = vector
+
+    return FeatureCacheShard(
+        name=name,
+        features=features,
+        feat_hashes=np.array(
+            [x.feat_hash for x in feature_lists], dtype=FEAT_HASH_DTYPE
+        ),
+        product_ids=np.array(
+            [x.product_id.encode("utf-8") for x in feature_lists], dtype=np.bytes_
+        ),
+    )
+
+
+def convert_npz_to_columnar(
+    path: str, file_dir: Optional[str] = None, name: Optional[str] = None
+) -> FeatureCacheShard:
+    """
+    기존 npz 파일을 columnar shard 로 변환해 저장하고, memmap 으로 다시 연다.
+    :param path: npz 파일 경로
+    :param file_dir: (optional) 저장할 디렉터리, 없으면 npz 와 같은 디렉터리
+    :param name: (optional) shard 이름, 없으면 npz 파일명에서 확장자를 뗀 값
+    :return: 변환된 shard
+    """
+    file_dir = os.path.dirname(path) if file_dir is None else file_dir
+    shard = read_legacy_npz(path, name)
+    return shard.save(file_dir)
+
+
+def open_feature_shard(
+    file_dir: str, name: str, convert_legacy: bool = True
+) -> FeatureCacheShard:
+    """
+    file_names 의 항목 하나를 연다. '.npz' 로 끝나면 legacy 파일로 취급하며,
+    convert_legacy=True 이면 옆에 columnar shard 를 만들어두고 이후에는 그것을 사용한다.
+    """
+    if not name.endswith(LEGACY_SUFFIX):
+        return FeatureCacheShard.open(file_dir, name)
+
+    stem = name[: -len(LEGACY_SUFFIX)]
+    if all(exists(path) for path in shard_paths(file_dir, stem)):
+        return FeatureCacheShard.open(file_dir, stem)
+    if convert_legacy:
+        return convert_npz_to_columnar(join(file_dir, name), file_dir, stem)
+    return read_legacy_npz(join(file_dir, name), stem)
+
+
+def load_feature_cache(
+    feature_set: FeatureSet, convert_legacy: bool = True, use_index: bool = True
+) -> FeatureCache:
+    """
+    FeatureSet 의 모든 shard 를 memmap 으로 연다. 읽을 수 없는 파일은 건너뛴다.
+    use_index=True 이면 file_dir 의 persistent index 를 사용하며, 없거나 빠진 shard 는 추가해둔다.
+    """
+    shards = []
+    if not feature_set or not feature_set.file_names:
+        return FeatureCache(shards)
+
+    for name in feature_set.file_names.split(","):
+        name = name.strip()
+        if not name:
+            continue
+        try:
+            shard = open_feature_shard(feature_set.file_dir, name, convert_legacy)
+        except Exception as e:  # noqa
+            logger.warning(
+                "load_feature_cache_error",
+                exc_info=e,
+                extra={"file_dir": feature_set.file_dir, "file_name": name},
+            )
+            continue
+        if len(shard) > 0:
+            shards.append(shard)
+
+    feature_cache = FeatureCache(shards)
+    if use_index:
+        try:
+            persistent_index = PersistentFeatureIndex.open(feature_set.file_dir)
+            persistent_index.sync(shards)
+            feature_cache.attach_index(persistent_index)
+        except Exception as e:  # noqa
+            # index 를 쓸 수 없으면 (read-only 등) in-memory index 로 동작
+            logger.warning(
+                "feature_index_error",
+                exc_info=e,
+                extra={"file_dir": feature_set.file_dir},
+            )
+    return feature_cache
+
+
+def _file_name_list(feature_set: FeatureSet) -> list[str]:
+    if not feature_set.file_names:
+        return []
+    return [name.strip() for name in feature_set.file_names.split(",") if name.strip()]
+
+
+def _set_file_names(feature_set: FeatureSet, names: list[str], num_rows: int) -> None:
+    feature_set.file_names = ",".join(names)
+    feature_set.file_count = len(names)
+    feature_set.feature_count = num_rows
+
+
+def append_feature_shard(
+    feature_set: FeatureSet,
+    feat_hashes: list[str],
+    product_ids: list[str],
+    features: np.ndarray,
+    name: Optional[str] = None,
+) -> Optional[FeatureCacheShard]:
+    """
+    새로 download 한 feature 를 shard 파일 하나로 추가하고 FeatureSet 의
+    file_names / file_count / feature_count 를 갱신한다. (FeatureSet 저장은 호출한 쪽에서)
+    :param feature_set: 대상 FeatureSet (file_dir 필수)
+    :param feat_hashes: (N,) feat_hash
+    :param product_ids: (N,) product_id
+    :param features: (N, 3, D) float32, FEATURE_COLOR_WEIGHTS 순서
+    :param name: (optional) shard 이름, 없으면 '{set_id}.{ulid}'
+    :return: 추가된 shard, 추가할 row 가 없으면 None
+    """
+    if len(feat_hashes) == 0:
+        return None
+    features = np.asarray(features, dtype=FEATURE_DTYPE)
+    if features.ndim != 3 or len(features) != len(feat_hashes):
+        raise ValueError(f"invalid feature shape {features.shape}")
+
+    name = f"{feature_set.set_id}.{ulid_generator()}" if name is None else name
+    shard = FeatureCacheShard(
+        name=name,
+        features=features.transpose(1, 0, 2),
+        feat_hashes=np.array(feat_hashes, dtype=FEAT_HASH_DTYPE),
+        product_ids=np.array([x.encode("utf-8") for x in product_ids], np.bytes_),
+    ).save(feature_set.file_dir)
+
+    names = _file_name_list(feature_set) + [name]
+    _set_file_names(feature_set, names, (feature_set.feature_count or 0) + len(shard))
+    try:
+        PersistentFeatureIndex.open(feature_set.file_dir).append_shard(shard)
+    except Exception as e:  # noqa
+        logger.warning(
+            "feature_index_error", exc_info=e, extra={"file_dir": feature_set.file_dir}
+        )
+    return shard
+
+
+def compact_feature_set(
+    feature_set: FeatureSet,
+    min_shard_rows: int = 100000,
+    max_small_shards: int = 8,
+) -> list[str]:
+    """
+    row 수가 min_shard_rows 보다 작은 shard 가 max_small_shards 개 이상이면 하나로 합친다.
+    합쳐진 shard 는 FeatureSet 에서 첫 번째 small shard 자리에 들어가며, 같은 feat_hash 는 앞의 것만 남긴다.
+    기존 파일은 다른 worker 가 아직 사용할 수 있으므로 지우지 않고 이름만 반환한다.
+    FeatureSet 을 저장한 뒤 delete_feature_shards 로 지우면 된다.
+    :return: 합쳐져서 더 이상 쓰이지 않는 shard 이름 목록
+    """
+    names = _file_name_list(feature_set)
+    shards = [open_feature_shard(feature_set.file_dir, name, True) for name in names]
+    small = [idx for idx, shard in enumerate(shards) if len(shard) < min_shard_rows]
+    if len(small) < max(max_small_shards, 2):
+        return []
+
+    small_shards = [shards[idx] for idx in small]
+    feat_hashes = np.concatenate([shard.feat_hashes for shard in small_shards])
+    _, keep = np.unique(to_digests(feat_hashes), return_index=True)
+    keep.sort()
+    merged = FeatureCacheShard(
+        name=f"{feature_set.set_id}.{ulid_generator()}",
+        features=np.concatenate([shard.features for shard in small_shards], axis=1)[
+            :, keep
+        ],
+        feat_hashes=feat_hashes[keep],
+        product_ids=np.concatenate([shard.product_ids for shard in small_shards])[keep],
+    ).save(feature_set.file_dir)
+
+    small_set = set(small)
+    new_shards = []
+    for idx, shard in enumerate(shards):
+        if idx == small[0]:
+            new_shards.append(merged)
+        elif idx not in small_set:
+            new_shards.append(shard)
+    _set_file_names(
+        feature_set,
+        [shard.name for shard in new_shards],
+        sum(len(shard) for shard in new_shards),
+    )
+    try:
+        # 같은 file_dir 의 다른 FeatureSet shard 는 그대로 두고 합쳐진 shard 만 바꾼다
+        PersistentFeatureIndex.open(feature_set.file_dir).replace_shards(
+            [shard.name for shard in small_shards], [merged]
+        )
+    except Exception as e:  # noqa
+        logger.warning(
+            "feature_index_error", exc_info=e, extra={"file_dir": feature_set.file_dir}
+        )
+    return [names[idx] for idx in small]
+
+
+def delete_feature_shards(file_dir: str, names: list[str]) -> None:
+    """
+    shard 파일들을 지운다. legacy npz 이름이면 npz 와 변환된 파일을 모두 지운다.
+    """
+    for name in names:
+        stem = name[: -len(LEGACY_SUFFIX)] if name.endswith(LEGACY_SUFFIX) else name
+        paths = list(shard_paths(file_dir, stem))
+        if name.endswith(LEGACY_SUFFIX):
+            paths.append(join(file_dir, name))
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
@@ -1,7 +1,8 @@
 import hashlib
+from concurrent.futures import Executor, ProcessPoolExecutor
 from os.path import join
 from timeit import default_timer as timer
-from typing import Optional, Iterator
+from typing import Optional, Iterator, Iterable, Union
 
 import numpy as np
 from model_embedding_msgspec import embedding_pb2
@@ -15,6 +16,33 @@ from common_lib.models.img_feature import (
     FeatureColorWeight,
 )
 from common_lib.models.intra_similarity import ModelIndexFeature
+from common_lib.utils.feature_cache import (
+    FEATURE_COLOR_WEIGHTS,
+    FEATURE_DTYPE,
+    FeatureCache,
+    CachedFeatureDiff,
+    append_feature_shard,
+    compact_feature_set,
+    diff_download_list,
+    load_feature_cache,
+)
+
+# FeatureColorWeight -> EmbeddingObject field
+FEATURE_FIELD_NAMES = {
+    FeatureColorWeight.LOW: "feature_without_color",
+    FeatureColorWeight.MEDIUM: "feature_with_color",
+    FeatureColorWeight.HIGH: "feature_with_color_more",
+}
+FEATURE_FIELD_NUMBERS = {
+    weight: embedding_pb2.EmbeddingObject.DESCRIPTOR.fields_by_name[name].number
+    for weight, name in FEATURE_FIELD_NAMES.items()
+}
+
+# protobuf wire types
+_WIRE_VARINT = 0
+_WIRE_FIXED64 = 1
+_WIRE_LENGTH_DELIMITED = 2
+_WIRE_FIXED32 = 5
 
 
 def extract_major_version(version: str) -> Optional[str]:
@@ -82,9 +110,96 @@ def deserialize(feature_byte: bytes) -> ModelFeature:
     )
 
 
+def _read_varint(buf: memoryview, pos: int) -> tuple[int, int]:
+    result, shift = 0, 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+
+def deserialize_np(
+    feature_byte: bytes, feature_color_weight: str = FeatureColorWeight.MEDIUM
+) -> np.ndarray:
+    """
+    serialize 된 EmbeddingObject 에서 요청한 FeatureColorWeight 의 vector 만 꺼냅니다.
+    packed repeated float 영역을 np.frombuffer 로 바로 가리키기 때문에 복사가 없습니다.
+    (반환값은 feature_byte 를 참조하는 read-only float32 배열입니다)
+    :param feature_byte: EmbeddingObject.SerializeToString() 결과
+    :param feature_color_weight: LOW / MEDIUM / HIGH
+    :return: float32 (D,) 배열, 필드가 없으면 빈 배열
+    """
+    target = FEATURE_FIELD_NUMBERS[FeatureColorWeight(feature_color_weight)]
+    buf = memoryview(feature_byte)
+    chunks, unpacked = [], []
+    pos, end = 0, len(buf)
+    while pos < end:
+        tag, pos = _read_varint(buf, pos)
+        field_number, wire_type = tag >> 3, tag & 0x07
+        if wire_type == _WIRE_LENGTH_DELIMITED:
+            length, pos = _read_varint(buf, pos)
+            if field_number == target:
+                chunks.append(
+                    np.frombuffer(buf, dtype="<f4", count=length // 4, offset=pos)
+                )
+            pos += length
+        elif wire_type == _WIRE_VARINT:
+            _, pos = _read_varint(buf, pos)
+        elif wire_type == _WIRE_FIXED32:
+            if field_number == target:
+                # packed 가 아닌 repeated float
+                unpacked.append(np.frombuffer(buf, dtype="<f4", count=1, offset=pos))
+            pos += 4
+        elif wire_type == _WIRE_FIXED64:
+            pos += 8
+        else:
+            raise ValueError(
+                f"unsupported wire type {wire_type} (field {field_number})"
+            )
+
+    if unpacked:
+        chunks.append(np.concatenate(unpacked))
+    if not chunks:
+        return np.empty(0, dtype=FEATURE_DTYPE)
+    features = chunks[0] if len(chunks) == 1 else np.concatenate(chunks)
+    return features.astype(FEATURE_DTYPE, copy=False)
+
+
+def deserialize_many(
+    feature_bytes: Iterable[bytes],
+    feature_color_weight: str = FeatureColorWeight.MEDIUM,
+) -> Iterator[np.ndarray]:
+    """
+    deserialize_np 의 batch 버전. 입력 순서대로 float32 배열을 yield 합니다.
+    """
+    for feature_byte in feature_bytes:
+        yield deserialize_np(feature_byte, feature_color_weight)
+
+
+def deserialize_stacked(feature_byte: bytes) -> np.ndarray:
+    """
+    세 FeatureColorWeight vector 를 FEATURE_COLOR_WEIGHTS 순서의 (3, D) float32 배열로 꺼냅니다.
+    비어있는 vector 는 0 으로 채웁니다. (feature cache shard 의 row 형식)
+    """
+    vectors = [deserialize_np(feature_byte, weight) for weight in FEATURE_COLOR_WEIGHTS]
+    dim = max(len(vector) for vector in vectors)
+    stacked = np.zeros((len(vectors), dim), dtype=FEATURE_DTYPE)
+    for idx, vector in enumerate(vectors):
+        if len(vector) > 0:
+            stacked[idx] = vector
+    return stacked
+
+
 def load_cached_feature_list(
     feature_set: FeatureSet,
 ) -> tuple[list, list]:
+    """
+    legacy npz 파일 전체를 unpickle 해서 list 로 반환합니다.
+    새 코드는 common_lib.utils.feature_cache.load_feature_cache (memmap, columnar) 를 사용하세요.
+    """
     cached_feature_lists, cached_features = [], []
     filenames = [
         join(feature_set.file_dir, filename)
@@ -113,10 +228,11 @@ def get_download_list_from_cached_feature(
         feature_list.feat_hash: feature
         for feature_list, feature in zip(cached_feature_lists, cached_features)
     }
-    feat_hash_set = set(feature_dict)
-    cached_feat_hash_set = set(cached_feature_dict)
-    new_feat_hash_set = feat_hash_set.difference(cached_feat_hash_set)
-    new_download_list = [feature_dict[feat_hash] for feat_hash in new_feat_hash_set]
+    new_download_list = [
+        feature_list
+        for feat_hash, feature_list in feature_dict.items()
+        if feat_hash not in cached_feature_dict
+    ]
     return cached_feature_dict, new_download_list
 
 
@@ -145,6 +261,97 @@ def get_cached_feature(
     return cached_feature_dict, new_download_list
 
 
+def get_cached_feature_rows(
+    time_measures: dict,
+    feature_set: FeatureSet,
+    download_list: list[FeatureListForGroup],
+) -> tuple[FeatureCache, CachedFeatureDiff]:
+    """
+    get_cached_feature 의 memmap 버전.
+    dict 대신 FeatureCache 와 row index (CachedFeatureDiff) 를 반환합니다.
+    cache 된 feature 는 feature_cache.take(diff.cached_rows, feature_color_weight) 로 꺼냅니다.
+    """
+    tic_load = timer()
+    feature_cache = load_feature_cache(feature_set=feature_set)
+    time_measures["load_cached_feature_list"] += timer() - tic_load
+
+    tic_append = timer()
+    diff = diff_download_list(feature_cache=feature_cache, download_list=download_list)
+    time_measures["new_download_list"] += timer() - tic_append
+
+    return feature_cache, diff
+
+
+def build_index_feature(
+    download_list: list[FeatureListForGroup],
+    feature_cache: FeatureCache,
+    diff: CachedFeatureDiff,
+    downloaded: Iterable[tuple[str, np.ndarray]],
+    feature_color_weight: str,
+) -> ModelIndexFeature:
+    """
+    cache 된 feature 와 새로 download 한 feature 를 download_list 순서의 ModelIndexFeature 로 합칩니다.
+    download 에 실패한 항목은 결과에서 빠집니다.
+    :param download_list: 전체 대상
+    :param feature_cache: get_cached_feature_rows 결과
+    :param diff: get_cached_feature_rows 결과
+    :param downloaded: (feat_hash, (3, D) feature) 목록, S3FeatureFetcher.fetch 결과
+    :param feature_color_weight: LOW / MEDIUM / HIGH
+    """
+    weight_idx = FEATURE_COLOR_WEIGHTS.index(FeatureColorWeight(feature_color_weight))
+    downloaded_features = {
+        feat_hash: feature[weight_idx] for feat_hash, feature in downloaded
+    }
+    cached_pos = dict(zip(diff.download_idx.tolist(), range(len(diff.download_idx))))
+    cached_features = feature_cache.take(diff.cached_rows, feature_color_weight)
+
+    dim = feature_cache.dim if len(cached_features) > 0 else 0
+    if dim == 0 and downloaded_features:
+        dim = len(next(iter(downloaded_features.values())))
+    matrix = np.empty((len(download_list), dim), dtype=FEATURE_DTYPE)
+    product_ids = []
+    for idx, feature_list in enumerate(download_list):
+        if idx in cached_pos:
+            matrix[len(product_ids)] = cached_features[cached_pos[idx]]
+        elif feature_list.feat_hash in downloaded_features:
+            matrix[len(product_ids)] = downloaded_features[feature_list.feat_hash]
+        else:
+            continue
+        product_ids.append(feature_list.product_id)
+    return ModelIndexFeature(
+        product_ids=product_ids, features=matrix[: len(product_ids)]
+    )
+
+
+def write_back_features(
+    feature_set: FeatureSet,
+    download_list: list[FeatureListForGroup],
+    downloaded: list[tuple[str, np.ndarray]],
+    min_shard_rows: int = 100000,
+    max_small_shards: int = 8,
+) -> list[str]:
+    """
+    새로 download 한 feature 를 FeatureSet 에 shard 로 추가하고, 작은 shard 가 많으면 합칩니다.
+    FeatureSet 의 file_names / file_count / feature_count 가 바뀌므로 호출한 쪽에서 저장해야 합니다.
+    :param feature_set: 대상 FeatureSet
+    :param download_list: get_cached_feature_rows 의 diff.new_download_list
+    :param downloaded: (feat_hash, (3, D) feature) 목록, S3FeatureFetcher.fetch 결과
+    :return: compaction 으로 더 이상 쓰이지 않는 shard 이름 (FeatureSet 저장 후 delete_feature_shards 로 삭제)
+    """
+    product_ids = {x.feat_hash: x.product_id for x in download_list}
+    rows = [(h, feature) for h, feature in downloaded if h in product_ids]
+    if rows:
+        append_feature_shard(
+            feature_set,
+            feat_hashes=[h for h, _ in rows],
+            product_ids=[product_ids[h] for h, _ in rows],
+            features=np.stack([feature for _, feature in rows]),
+        )
+    return compact_feature_set(
+        feature_set, min_shard_rows=min_shard_rows, max_small_shards=max_small_shards
+    )
+
+
 class ModelFeatureSelector:
     def __init__(self, model_feature: ModelFeature):
         self.features = {
@@ -161,3 +368,94 @@ def parse_binary_feature(feature: ModelFeature, feature_color_weight: str):
     model_feature_selector = ModelFeatureSelector(feature)
     features = model_feature_selector.get_model_feature(feature_color_weight)
     return ModelIndexFeature(features=features)
+
+
+def _get_feature_vector(
+    feature: Union[bytes, ModelFeature], feature_color_weight: str
+) -> Union[np.ndarray, list[float]]:
+    if isinstance(feature, ModelFeature):
+        vector = getattr(feature, FEATURE_FIELD_NAMES[feature_color_weight])
+        return [] if vector is None else vector
+    return deserialize_np(feature, feature_color_weight)
+
+
+def _stack_features(
+    features: list[Union[bytes, ModelFeature]],
+    feature_color_weight: str,
+    dim: int,
+    out: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    if out is None:
+        out = np.empty((len(features), dim), dtype=FEATURE_DTYPE)
+    for idx, feature in enumerate(features):
+        vector = _get_feature_vector(feature, feature_color_weight)
+        if len(vector) != dim:
+            raise ValueError(f"feature dim mismatch: {len(vector)} != {dim} ({idx})")
+        out[idx] = vector
+    return out
+
+
+def parse_binary_features(
+    features: list[Union[bytes, ModelFeature]],
+    feature_color_weight: str,
+    product_ids: list[str],
+    executor: Optional[Executor] = None,
+    chunk_size: int = 10000,
+) -> ModelIndexFeature:
+    """
+    parse_binary_feature 의 batch 버전.
+    N 개의 feature (serialize 된 bytes 또는 ModelFeature) 를 미리 할당한 (N, D) float32 행렬 하나에 채웁니다.
+    :param features: serialize 된 EmbeddingObject 또는 ModelFeature 목록
+    :param feature_color_weight: LOW / MEDIUM / HIGH
+    :param product_ids: features 와 같은 순서의 product_id
+    :param executor: (optional) 주어지면 chunk_size 단위로 나누어 병렬로 decode 합니다.
+                     ThreadPoolExecutor 는 행렬의 slice 를 직접 채우고,
+                     ProcessPoolExecutor 는 chunk 별 행렬을 받아 복사합니다.
+    :param chunk_size: executor 사용 시 작업 하나의 크기
+    :return: ModelIndexFeature(product_ids, features (N, D))
+    """
+    if len(features) != len(product_ids):
+        raise ValueError(
+            f"length mismatch: features={len(features)}, product_ids={len(product_ids)}"
+        )
+    feature_color_weight = FeatureColorWeight(feature_color_weight)
+    if not features:
+        return ModelIndexFeature(
+            product_ids=[], features=np.empty((0, 0), dtype=FEATURE_DTYPE)
+        )
+
+    dim = len(_get_feature_vector(features[0], feature_color_weight))
+    matrix = np.empty((len(features), dim), dtype=FEATURE_DTYPE)
+
+    if executor is None or len(features) <= chunk_size:
+        _stack_features(features, feature_color_weight, dim, out=matrix)
+    else:
+        starts = range(0, len(features), chunk_size)
+        if isinstance(executor, ProcessPoolExecutor):
+            futures = [
+                executor.submit(
+                    _stack_features,
+                    features[start : start + chunk_size],
+                    feature_color_weight,
+                    dim,
+                )
+                for start in starts
+            ]
+            for start, future in zip(starts, futures):
+                chunk = future.result()
+                matrix[start : start + len(chunk)] = chunk
+        else:
+            futures = [
+                executor.submit(
+                    _stack_features,
+                    features[start : start + chunk_size],
+                    feature_color_weight,
+                    dim,
+                    matrix[start : start + chunk_size],
+                )
+                for start in starts
+            ]
+            for future in futures:
+                future.result()
+
+    return ModelIndexFeature(product_ids=list(product_ids), features=matrix)
@@ -0,0 +1,179 @@
+from typing import Optional, Union
+
+import numpy as np
+
+from common_lib.models.img_feature import FeatureColorWeight, ModelFeature
+from common_lib.models.intra_similarity import (
+    ModelIndexFeature,
+    ModelIntraSimilarity,
+)
+from common_lib.utils.feature_cache import FEATURE_DTYPE
+from common_lib.utils.img_feature import parse_binary_features
+
+
+def normalize_features(features: np.ndarray, inplace: bool = False) -> np.ndarray:
+    """
+    row 단위 L2 normalize (float32). 길이가 0 인 row 는 그대로 0 으로 둔다.
+    """
+    if inplace and features.dtype == FEATURE_DTYPE:
+        normalized = features
+    else:
+        normalized = np.array(features, dtype=FEATURE_DTYPE, copy=True)
+    norms = np.linalg.norm(normalized, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    normalized /= norms
+    return normalized
+
+
+class IntraSimilaritySearcher:
+    """
+    ModelIndexFeature 내부의 product 끼리 cosine 유사도 top-k 를 찾는다.
+    (query block x candidate block) 단위로 행렬곱을 하고, block 마다 argpartition 으로
+    top-k 만 남겨 누적하기 때문에 추가 메모리는
+    query_block_size * candidate_block_size * 4 byte 정도로 제한된다.
+    (기본값 1024 x 65536 -> 256 MB, 1M x 512 입력이면 normalize 된 복사본 2 GB 가 더 필요)
+    """
+
+    def __init__(
+        self,
+        top_k: int = 10,
+        query_block_size: int = 1024,
+        candidate_block_size: int = 65536,
+        exclude_self: bool = True,
+    ):
+        """
+        :param top_k: product 당 이웃 수
+        :param query_block_size: 한 번에 처리할 query row 수
+        :param candidate_block_size: 한 번에 비교할 candidate row 수
+        :param exclude_self: 자기 자신을 결과에서 제외
+        """
+        if top_k < 1:
+            raise ValueError(f"top_k must be positive: {top_k}")
+        self.top_k = top_k
+        self.query_block_size = query_block_size
+        self.candidate_block_size = candidate_block_size
+        self.exclude_self = exclude_self
+
+    def search_arrays(
+        self, features: np.ndarray, normalized: bool = False
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        :param features: (N, D) feature 행렬
+        :param normalized: 이미 L2 normalize 된 경우 True (복사하지 않음)
+        :return: (indices (N, k), distances (N, k)), distance = 1 - cosine, 오름차순
+        """
+        matrix = (
+            np.asarray(features, dtype=FEATURE_DTYPE)
+            if normalized
+            else normalize_features(features)
+        )
+        num = len(matrix)
+        top_k = min(self.top_k, num - 1 if self.exclude_self else num)
+        if top_k < 1:
+            return (
+                np.empty((num, 0), dtype=np.int64),
+                np.empty((num, 0), dtype=FEATURE_DTYPE),
+            )
+
+        indices = np.empty((num, top_k), dtype=np.int64)
+        scores = np.empty((num, top_k), dtype=FEATURE_DTYPE)
+        score_buf = np.empty(
+            (min(self.query_block_size, num), min(self.candidate_block_size, num)),
+            dtype=FEATURE_DTYPE,
+        )
+
+        for q_start in range(0, num, self.query_block_size):
+            q_end = min(q_start + self.query_block_size, num)
+            q_indices, q_scores = self._search_block(
+                matrix, q_start, q_end, top_k, score_buf
+            )
+            indices[q_start:q_end] = q_indices
+            scores[q_start:q_end] = q_scores
+
+        order = np.argsort(-scores, axis=1)
+        indices = np.take_along_axis(indices, order, axis=1)
+        distances = 1.0 - np.take_along_axis(scores, order, axis=1)
+        return indices, distances
+
+    def _search_block(
+        self,
+        matrix: np.ndarray,
+        q_start: int,
+        q_end: int,
+        top_k: int,
+        score_buf: np.ndarray,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        queries = matrix[q_start:q_end]
+        num_query = q_end - q_start
+        best_scores = np.full((num_query, top_k), -np.inf, dtype=FEATURE_DTYPE)
+        best_indices = np.full((num_query, top_k), -1, dtype=np.int64)
+        query_rows = np.arange(num_query)
+
+        for c_start in range(0, len(matrix), self.candidate_block_size):
+            c_end = min(c_start + self.candidate_block_size, len(matrix))
+            block_scores = score_buf[:num_query, : c_end - c_start]
+            np.matmul(queries, matrix[c_start:c_end].T, out=block_scores)
+
+            if self.exclude_self:
+                overlap = (query_rows + q_start >= c_start) & (
+                    query_rows + q_start < c_end
+                )
+                block_scores[
+                    query_rows[overlap], query_rows[overlap] + q_start - c_start
+                ] = -np.inf
+
+            k = min(top_k, c_end - c_start)
+            part = np.argpartition(block_scores, -k, axis=1)[:, -k:]
+            merged_scores = np.concatenate(
+                [best_scores, np.take_along_axis(block_scores, part, axis=1)], axis=1
+            )
+            merged_indices = np.concatenate([best_indices, part + c_start], axis=1)
+            selected = np.argpartition(merged_scores, -top_k, axis=1)[:, -top_k:]
+            best_scores = np.take_along_axis(merged_scores, selected, axis=1)
+            best_indices = np.take_along_axis(merged_indices, selected, axis=1)
+
+        return best_indices, best_scores
+
+    def search(
+        self, index_feature: ModelIndexFeature, normalized: bool = False
+    ) -> ModelIntraSimilarity:
+        """
+        :param index_feature: product_ids / features (N, D)
+        :param normalized: features 가 이미 L2 normalize 된 경우 True
+        :return: [(product_id, [(neighbor product_id, distance), ...]), ...]
+        """
+        indices, distances = self.search_arrays(index_feature.features, normalized)
+        product_ids = index_feature.product_ids
+        return [
+            (
+                product_id,
+                [
+                    (product_ids[neighbor], distance)
+                    for neighbor, distance in zip(row_indices, row_distances)
+                ],
+            )
+            for product_id, row_indices, row_distances in zip(
+                product_ids, indices.tolist(), distances.tolist()
+            )
+        ]
+
+    def search_by_color_weight(
+        self,
+        features: list[Union[bytes, ModelFeature]],
+        product_ids: list[str],
+        feature_color_weights: Optional[list[FeatureColorWeight]] = None,
+    ) -> dict[FeatureColorWeight, ModelIntraSimilarity]:
+        """
+        FeatureColorWeight 별로 ModelIndexFeature 를 만들어 search 한다.
+        :param features: serialize 된 EmbeddingObject 또는 ModelFeature 목록
+        :param product_ids: features 와 같은 순서의 product_id
+        :param feature_color_weights: (optional) 없으면 LOW / MEDIUM / HIGH 모두
+        """
+        if feature_color_weights is None:
+            feature_color_weights = list(FeatureColorWeight)
+        return {
+            FeatureColorWeight(weight): self.search(
+                parse_binary_features(features, weight, product_ids)
+            )
+            for weight in feature_color_weights
+        }
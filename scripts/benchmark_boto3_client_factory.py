@@ -0,0 +1,58 @@
+"""
+boto3 client 생성 비용 비교
+ + per-call: 요청마다 boto3.client 를 새로 만듦 (기존 S3 / SQS __init__ 방식)
+ + registry: common_lib.infra.boto3_registry 의 공유 client 를 가져옴
+get_bucket_location / get_queue_url 같은 network 요청은 제외하고 client 생성만 측정합니다.
+
+usage: AWS_DEFAULT_REGION=ap-northeast-2 PYTHONPATH=. python scripts/benchmark_boto3_client_factory.py \
+    --num 50
+"""
+import argparse
+from timeit import default_timer as timer
+
+import boto3
+from botocore.client import Config
+
+from common_lib.infra.boto3_registry import get_client
+
+
+def per_call(service: str):
+    return boto3.client(
+        service,
+        config=Config(
+            read_timeout=20.0,
+            connect_timeout=10.0,
+            max_pool_connections=30,
+            retries={"max_attempts": 10},
+        ),
+    )
+
+
+def registry(service: str):
+    return get_client(
+        service,
+        read_timeout=20.0,
+        connect_timeout=10.0,
+        max_pool_connections=30,
+        max_retry=10,
+    )
+
+
+def run(num: int):
+    for name, factory in (("per-call", per_call), ("registry", registry)):
+        for service in ("s3", "sqs"):
+            tic = timer()
+            for _ in range(num):
+                factory(service)
+            elapsed = timer() - tic
+            print(
+                f"{name:9s} {service:4s} total={elapsed:8.3f}s "
+                f"per_instance={elapsed / num * 1000:8.3f}ms"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--num", type=int, default=50)
+    args = parser.parse_args()
+    run(args.num)
@@ -0,0 +1,84 @@
+"""
+get_download_list_from_cached_feature (dict/set) 와 diff_download_list (digest + searchsorted) 비교
+
+usage: PYTHONPATH=. python scripts/benchmark_feature_cache_diff.py --sizes 1000000,10000000
+"""
+import argparse
+import hashlib
+from timeit import default_timer as timer
+
+import numpy as np
+
+from common_lib.models.img_feature import FeatureListForGroup
+from common_lib.utils.feature_cache import (
+    FeatureCache,
+    FeatureCacheShard,
+    FEAT_HASH_DTYPE,
+    diff_download_list,
+)
+from common_lib.utils.img_feature import get_download_list_from_cached_feature
+
+
+def make_hashes(n: int, seed: int) -> list[str]:
+    return [hashlib.md5(f"{seed}:{i}".encode("utf-8")).hexdigest() for i in range(n)]
+
+
+def run(size: int, hit_ratio: float, dim: int):
+    cached = make_hashes(size, seed=0)
+    num_hit = int(size * hit_ratio)
+    download_hashes = cached[:num_hit] + make_hashes(size - num_hit, seed=1)
+    download_list = [
+        FeatureListForGroup(
+            model_version="5.0", feature_id="f", product_id=str(i), feat_hash=h
+        )
+        for i, h in enumerate(download_hashes)
+    ]
+
+    # legacy path: FeatureListForGroup / feature 객체 list
+    cached_feature_lists = download_list[:num_hit] + [
+        FeatureListForGroup(
+            model_version="5.0", feature_id="f", product_id=str(i), feat_hash=h
+        )
+        for i, h in enumerate(cached[num_hit:])
+    ]
+    cached_features = [None] * size
+    tic = timer()
+    _, legacy_new = get_download_list_from_cached_feature(
+        download_list, cached_feature_lists, cached_features
+    )
+    legacy_sec = timer() - tic
+
+    # vectorized path
+    shard = FeatureCacheShard(
+        name="bench",
+        features=np.zeros((3, size, dim), dtype=np.float32),
+        feat_hashes=np.array(cached, dtype=FEAT_HASH_DTYPE),
+        product_ids=np.zeros(size, dtype="S1"),
+    )
+    feature_cache = FeatureCache([shard])
+    tic = timer()
+    diff = diff_download_list(feature_cache, download_list)
+    vectorized_sec = timer() - tic
+
+    # hash index 가 이미 만들어진 경우 (같은 FeatureCache 재사용)
+    tic = timer()
+    diff_download_list(feature_cache, download_list)
+    warm_sec = timer() - tic
+
+    assert len(legacy_new) == len(diff.new_download_list)
+    print(
+        f"size={size:>10,} hit={hit_ratio:.2f} "
+        f"legacy={legacy_sec:8.3f}s vectorized={vectorized_sec:8.3f}s "
+        f"vectorized(warm)={warm_sec:8.3f}s "
+        f"speedup={legacy_sec / vectorized_sec:6.2f}x/{legacy_sec / warm_sec:6.2f}x"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="1000000,10000000")
+    parser.add_argument("--hit-ratio", type=float, default=0.9)
+    parser.add_argument("--dim", type=int, default=1)
+    args = parser.parse_args()
+    for _size in args.sizes.split(","):
+        run(int(_size), args.hit_ratio, args.dim)
@@ -0,0 +1,64 @@
+"""
+deserialize + parse_binary_feature 와 deserialize_np 비교
+
+usage: PYTHONPATH=. python scripts/benchmark_feature_deserialize.py --num 100000 --dim 512
+"""
+import argparse
+from timeit import default_timer as timer
+
+import numpy as np
+
+from common_lib.models.img_feature import FeatureColorWeight, ModelFeature
+from common_lib.utils.img_feature import (
+    deserialize,
+    deserialize_many,
+    parse_binary_feature,
+    serialize,
+)
+
+
+def make_blobs(num: int, dim: int) -> list[bytes]:
+    rng = np.random.default_rng(0)
+    vectors = rng.random((3, num, dim), dtype=np.float32)
+    return [
+        serialize(
+            ModelFeature(
+                feature_without_color=vectors[0, i].tolist(),
+                feature_with_color=vectors[1, i].tolist(),
+                feature_with_color_more=vectors[2, i].tolist(),
+            )
+        )
+        for i in range(num)
+    ]
+
+
+def run(num: int, dim: int, feature_color_weight: FeatureColorWeight):
+    blobs = make_blobs(num, dim)
+
+    tic = timer()
+    legacy = [
+        parse_binary_feature(deserialize(blob), feature_color_weight).features
+        for blob in blobs
+    ]
+    legacy_sec = timer() - tic
+
+    tic = timer()
+    zero_copy = list(deserialize_many(blobs, feature_color_weight))
+    zero_copy_sec = timer() - tic
+
+    assert all(np.array_equal(a, b) for a, b in zip(legacy, zero_copy))
+    print(
+        f"num={num:,} dim={dim} weight={feature_color_weight.value} "
+        f"deserialize+parse_binary_feature={num / legacy_sec:12,.0f}/s "
+        f"deserialize_np={num / zero_copy_sec:12,.0f}/s "
+        f"speedup={legacy_sec / zero_copy_sec:6.2f}x"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--num", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=512)
+    args = parser.parse_args()
+    for weight in FeatureColorWeight:
+        run(args.num, args.dim, weight)
@@ -0,0 +1,61 @@
+"""
+IntraSimilaritySearcher 처리량 (products/sec) 측정
+
+usage: PYTHONPATH=. python scripts/benchmark_intra_similarity.py --num 100000 --dim 512 \
+    --query-block-sizes 512,1024,4096 --candidate-block-size 65536
+"""
+import argparse
+from timeit import default_timer as timer
+
+import numpy as np
+
+from common_lib.utils.intra_similarity import (
+    IntraSimilaritySearcher,
+    normalize_features,
+)
+
+
+def run(
+    features: np.ndarray, top_k: int, query_block_size: int, candidate_block_size: int
+):
+    searcher = IntraSimilaritySearcher(
+        top_k=top_k,
+        query_block_size=query_block_size,
+        candidate_block_size=candidate_block_size,
+    )
+    tic = timer()
+    searcher.search_arrays(features, normalized=True)
+    elapsed = timer() - tic
+
+    num = len(features)
+    score_mb = (
+        min(query_block_size, num) * min(candidate_block_size, num) * 4 / 1024 / 1024
+    )
+    print(
+        f"num={num:,} dim={features.shape[1]} top_k={top_k} "
+        f"query_block={query_block_size} candidate_block={candidate_block_size} "
+        f"score_buf={score_mb:,.0f}MB "
+        f"elapsed={elapsed:8.2f}s throughput={num / elapsed:12,.0f} products/s"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--num", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=512)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--query-block-sizes", default="512,1024,4096")
+    parser.add_argument("--candidate-block-size", type=int, default=65536)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    _features = normalize_features(
+        rng.random((args.num, args.dim), dtype=np.float32), inplace=True
+    )
+    for _query_block_size in args.query_block_sizes.split(","):
+        run(
+            _features,
+            args.top_k,
+            int(_query_block_size),
+            args.candidate_block_size,
+        )
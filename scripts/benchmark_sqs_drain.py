@@ -0,0 +1,59 @@
+"""
+SQS.receive_message_batch_no_wait 순차 / 병렬 drain 소요 시간 비교
+receive_message 한 번에 --latency-ms 가 걸리는 가짜 client 로 측정합니다.
+
+usage: PYTHONPATH=. python scripts/benchmark_sqs_drain.py --backlog 5000 --latency-ms 20 \
+    --max-workers 1,4,8,16
+"""
+import argparse
+import threading
+import time
+from timeit import default_timer as timer
+
+from common_lib.infra.sqs import SQS
+
+
+class FakeSQSClient:
+    def __init__(self, backlog: int, latency: float):
+        self.backlog = backlog
+        self.latency = latency
+        self.num_calls = 0
+        self._lock = threading.Lock()
+
+    def get_queue_url(self, QueueName: str) -> dict:
+        return {"QueueUrl": f"https://sqs.local/{QueueName}"}
+
+    def receive_message(self, MaxNumberOfMessages: int = 1, **kwargs) -> dict:
+        time.sleep(self.latency)
+        with self._lock:
+            self.num_calls += 1
+            count = min(MaxNumberOfMessages, self.backlog)
+            self.backlog -= count
+        return {
+            "Messages": [
+                {"MessageId": str(i), "ReceiptHandle": str(i), "Body": "{}"}
+                for i in range(count)
+            ]
+        }
+
+
+def run(backlog: int, latency_ms: float, max_workers: int):
+    client = FakeSQSClient(backlog, latency_ms / 1000)
+    sqs = SQS("benchmark", boto3_sqs_client=client)
+    tic = timer()
+    messages = sqs.receive_message_batch_no_wait(backlog, max_workers=max_workers)
+    elapsed = timer() - tic
+    print(
+        f"max_workers={max_workers:3d} received={len(messages):7,} "
+        f"calls={client.num_calls:6,} elapsed={elapsed:8.3f}s"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backlog", type=int, default=5000)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--max-workers", default="1,4,8,16")
+    args = parser.parse_args()
+    for _max_workers in args.max_workers.split(","):
+        run(args.backlog, args.latency_ms, int(_max_workers))
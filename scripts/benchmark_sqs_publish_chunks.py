@@ -0,0 +1,116 @@
+"""
+SQSClient.publish_batch 의 chunk 방식 별 send_messages 호출 수 비교 (10k messages 기준)
+--scale 을 주면 body 없이 크기 목록만으로 message 수에 따른 chunk 계산 시간을 비교한다.
+
+usage: PYTHONPATH=. python scripts/benchmark_sqs_publish_chunks.py --num 10000 --scale 100000 1000000
+"""
+import argparse
+import random
+from base64 import b64encode
+from timeit import default_timer as timer
+
+from common_lib.infra.sqs_bulk import (
+    PACKING_DECREASING,
+    PACKING_SEQUENTIAL,
+    SQS_MAX_BATCH_BYTES,
+    SQS_MAX_BYTES,
+    SQS_MAX_ENTRIES,
+    make_publish_chunks,
+    utf8_size,
+)
+
+
+def legacy_make_chunk(entries: list[str]) -> list[list[str]]:
+    """이전 SQSClient.__make_chunk_to_publish 와 같은 동작 (base64 길이, SQS_MAX_BYTES)"""
+    lengths = [len(b64encode(x.encode("utf-8"))) for x in entries]
+    chunks = []
+    start_idx, end_idx, length, num_entry = 0, 1, 0, 0
+    for idx, entry_length in enumerate(lengths):
+        next_length, next_num_entry = length + entry_length, num_entry + 1
+        if next_num_entry >= SQS_MAX_ENTRIES or next_length >= SQS_MAX_BYTES:
+            chunks.append(entries[start_idx:end_idx])
+            start_idx, end_idx, length, num_entry = (
+                end_idx,
+                end_idx + 1,
+                entry_length,
+                0,
+            )
+        else:
+            end_idx, length, num_entry = end_idx + 1, next_length, next_num_entry
+    if num_entry > 0:
+        chunks.append(entries[start_idx:end_idx])
+    return chunks
+
+
+def make_sizes(num: int, profile: str) -> list[int]:
+    rng = random.Random(0)
+    if profile == "small":
+        return [rng.randint(200, 2000) for _ in range(num)]
+    if profile == "large":
+        return [rng.randint(20 * 1024, 120 * 1024) for _ in range(num)]
+    # mixed: 대부분 작은 log 와 일부 큰 tagging 결과
+    return [
+        rng.randint(40 * 1024, 150 * 1024)
+        if rng.random() < 0.2
+        else rng.randint(500, 8 * 1024)
+        for _ in range(num)
+    ]
+
+
+def make_bodies(num: int, profile: str) -> list[str]:
+    return ["x" * size for size in make_sizes(num, profile)]
+
+
+def over_limit(chunks: list[list[str]]) -> int:
+    return sum(
+        1 for chunk in chunks if sum(utf8_size(x) for x in chunk) > SQS_MAX_BATCH_BYTES
+    )
+
+
+def run(num: int, profile: str):
+    bodies = make_bodies(num, profile)
+
+    tic = timer()
+    legacy = legacy_make_chunk(bodies)
+    legacy_sec = timer() - tic
+    print(
+        f"[{profile:>5}] legacy      calls={len(legacy):6,} "
+        f"over_limit={over_limit(legacy):5,} elapsed={legacy_sec * 1000:8.2f}ms"
+    )
+
+    for packing in (PACKING_SEQUENTIAL, PACKING_DECREASING):
+        tic = timer()
+        sizes = [utf8_size(x) for x in bodies]
+        chunks = [
+            [bodies[idx] for idx in chunk]
+            for chunk in make_publish_chunks(sizes, packing=packing)
+        ]
+        elapsed = timer() - tic
+        print(
+            f"[{profile:>5}] {packing:<11.11} calls={len(chunks):6,} "
+            f"over_limit={over_limit(chunks):5,} elapsed={elapsed * 1000:8.2f}ms"
+        )
+
+
+def run_scale(num: int, profile: str):
+    sizes = make_sizes(num, profile)
+    for packing in (PACKING_SEQUENTIAL, PACKING_DECREASING):
+        tic = timer()
+        chunks = make_publish_chunks(sizes, packing=packing)
+        elapsed = timer() - tic
+        print(
+            f"[{profile:>5}] {packing:<11.11} num={num:10,} calls={len(chunks):9,} "
+            f"elapsed={elapsed * 1000:10.2f}ms"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--num", type=int, default=10000)
+    parser.add_argument("--scale", type=int, nargs="*", default=[])
+    args = parser.parse_args()
+    for _profile in ("small", "large", "mixed"):
+        run(args.num, _profile)
+    for _num in args.scale:
+        for _profile in ("small", "large", "mixed"):
+            run_scale(_num, _profile)
@@ -0,0 +1,63 @@
+"""
+SQS body -> dataclass decode 처리량 비교
+ + legacy: json.loads + DataClassJsonMixin.from_dict (message 마다)
+ + decoder: ujson.loads + common_lib.dataclass.decoder.get_decoder (SQSClient.recv_typed 와 같은 방식)
+
+usage: PYTHONPATH=. python scripts/benchmark_typed_decode.py --num 20000
+"""
+import argparse
+import json
+import random
+from datetime import datetime
+from timeit import default_timer as timer
+
+import ujson
+
+from common_lib.dataclass.decoder import get_decoder
+from common_lib.models.pipeline_logger import PipelineLogItem
+
+
+def make_bodies(num: int) -> list[str]:
+    rng = random.Random(0)
+    now = datetime.utcnow()
+    return [
+        PipelineLogItem(
+            timestamp=now,
+            tracking_id=f"tracking-{i}",
+            request_id=f"request-{i}",
+            company_id="company",
+            pool_id=f"pool-{rng.randint(0, 100)}",
+            product_id=str(rng.randint(0, 10**9)),
+            image_url=f"https://image.example.com/{i}.jpg",
+            app_name="tagger",
+            event=rng.choice(["insert", "tagging", "update-tagging"]),
+            status=rng.choice(["ok", "fail", "drop"]),
+            extra=json.dumps(
+                {"tags": [f"tag{rng.randint(0, 300)}" for _ in range(20)]}
+            ),
+        ).to_json(ensure_ascii=False)
+        for i in range(num)
+    ]
+
+
+def run(bodies: list[str]):
+    tic = timer()
+    legacy = [PipelineLogItem.from_dict(json.loads(x)) for x in bodies]
+    legacy_sec = timer() - tic
+
+    tic = timer()
+    decoder = get_decoder(PipelineLogItem)
+    decoded = [decoder(ujson.loads(x)) for x in bodies]
+    decoder_sec = timer() - tic
+
+    assert legacy == decoded
+    num = len(bodies)
+    print(f"legacy  : {legacy_sec:8.3f}s {num / legacy_sec:12,.0f} messages/s")
+    print(f"decoder : {decoder_sec:8.3f}s {num / decoder_sec:12,.0f} messages/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--num", type=int, default=20000)
+    args = parser.parse_args()
+    run(make_bodies(args.num))
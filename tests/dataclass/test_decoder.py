@@ -0,0 +1,97 @@
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from enum import Enum
+from typing import Optional
+
+import pytest
+from dataclasses_json import DataClassJsonMixin, LetterCase, config
+
+from common_lib.dataclass.decoder import DecodeError, get_decoder
+
+
+class Color(Enum):
+    RED = "red"
+    BLUE = "blue"
+
+
+@dataclass
+class Inner(DataClassJsonMixin):
+    num_trial: int
+    created_at: datetime
+    score: Optional[float] = None
+
+
+@dataclass
+class Outer(DataClassJsonMixin):
+    name: str
+    count: int
+    ratio: float
+    inner: Inner
+    items: list[Inner]
+    color: Color
+    limit: Optional[int] = None
+    started_at: Optional[datetime] = None
+    tags: list[str] = field(default_factory=list)
+    display_name: str = field(default="", metadata=config(letter_case=LetterCase.CAMEL))
+
+
+CASES = [
+    {
+        "name": "a",
+        "count": 1,
+        "ratio": 1,
+        "inner": {"num_trial": 2, "created_at": 1700000000},
+        "items": [],
+        "color": "red",
+    },
+    {
+        "name": "b",
+        "count": "2",
+        "ratio": "0.5",
+        "inner": {"num_trial": "3", "created_at": 1700000000.25, "score": 1},
+        "items": [{"num_trial": 1.0, "created_at": 0}],
+        "color": "blue",
+        "limit": "10",
+        "started_at": 1700000000,
+        "tags": ["x", "y"],
+        "displayName": "B",
+    },
+    {
+        "name": "c",
+        "count": 3,
+        "ratio": 2.5,
+        "inner": {"num_trial": 1, "created_at": 1, "score": None},
+        "items": [{"num_trial": "4", "created_at": 1700000000, "score": "1.5"}],
+        "color": "red",
+        "limit": None,
+        "started_at": None,
+    },
+]
+
+
+@pytest.mark.parametrize("data", CASES)
+def test_decoder_matches_from_dict(data):
+    decoded = get_decoder(Outer)(data)
+    expected = Outer.from_dict(data)
+    assert decoded == expected
+    assert type(decoded.count) is type(expected.count)
+    assert type(decoded.ratio) is type(expected.ratio)
+    assert type(decoded.inner.num_trial) is type(expected.inner.num_trial)
+
+
+def test_timestamp_is_utc_aware():
+    decoded = get_decoder(Inner)({"num_trial": 1, "created_at": 0})
+    assert decoded.created_at == datetime(1970, 1, 1, tzinfo=timezone.utc)
+    assert decoded.created_at.tzinfo is not None
+
+
+def test_invalid_value_reports_path():
+    with pytest.raises(DecodeError) as e:
+        get_decoder(Outer)({**CASES[0], "inner": {"num_trial": "x", "created_at": 0}})
+    assert e.value.path == "Outer.inner.num_trial"
+
+
+def test_missing_required_field():
+    with pytest.raises(DecodeError) as e:
+        get_decoder(Inner)({"created_at": 0})
+    assert e.value.path == "Inner.num_trial"
@@ -0,0 +1,26 @@
+import boto3
+import pytest
+
+from common_lib.infra.boto3_registry import registry
+
+
+@pytest.fixture
+def aws(monkeypatch):
+    """
+    moto 로 SQS / S3 를 띄운다. registry 의 client / queue url 은 test 마다 새로 만든다.
+    """
+    moto = pytest.importorskip("moto")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    with moto.mock_aws():
+        registry.reset()
+        yield boto3.resource("sqs")
+    registry.reset()
+
+
+@pytest.fixture
+def bucket(aws) -> str:
+    name = "test-bucket"
+    boto3.client("s3").create_bucket(Bucket=name)
+    return name
@@ -0,0 +1,251 @@
+import io
+import os
+
+import boto3
+import pytest
+from botocore.exceptions import ClientError
+
+from common_lib.infra.s3 import S3, S3_MIN_PART_SIZE, S3DiskCache, S3TransferError
+
+PART = S3_MIN_PART_SIZE
+
+
+def pending_uploads(s3: S3) -> list[str]:
+    response = s3.client.list_multipart_uploads(Bucket=s3.bucket_name)
+    return [x["UploadId"] for x in response.get("Uploads", [])]
+
+
+def fail_parts(monkeypatch, s3: S3, failing: set) -> list[int]:
+    """
+    upload_part 를 감싸서 failing 에 있는 PartNumber 는 항상 실패시키고, 호출된 PartNumber 를 기록한다
+    """
+    upload_part = s3.client.upload_part
+    calls = []
+
+    def flaky(**kwargs):
+        calls.append(kwargs["PartNumber"])
+        if kwargs["PartNumber"] in failing:
+            raise RuntimeError("boom")
+        return upload_part(**kwargs)
+
+    monkeypatch.setattr(s3.client, "upload_part", flaky)
+    return calls
+
+
+def count_get_object(monkeypatch, s3: S3) -> list[str]:
+    get_object = s3.client.get_object
+    calls = []
+
+    def counted(**kwargs):
+        calls.append(kwargs["Key"])
+        return get_object(**kwargs)
+
+    monkeypatch.setattr(s3.client, "get_object", counted)
+    return calls
+
+
+def expire(cache: S3DiskCache) -> None:
+    """
+    모든 ref 의 mtime 을 ttl 이전으로 돌려서 다음 읽기에서 조건부 GET 을 하게 한다
+    """
+    for root, _, files in os.walk(cache._refs_dir):
+        for name in files:
+            os.utime(os.path.join(root, name), (0, 0))
+
+
+def cached_files(directory: str) -> int:
+    return sum(len(files) for _, _, files in os.walk(directory))
+
+
+def test_upload_stream_and_ranged_download(bucket, tmp_path):
+    s3 = S3(bucket)
+    data = os.urandom(2 * PART + 123)
+    result = s3.upload_stream(io.BytesIO(data), "a/b", part_size=PART, max_workers=2)
+    assert (result.num_bytes, result.num_parts) == (len(data), 3)
+    assert result.upload_id is not None
+
+    out = io.BytesIO()
+    result = s3.download_to("a/b", out, part_size=PART // 2, max_workers=3)
+    assert out.getvalue() == data
+    assert result.num_parts == 5
+
+    # bytes iterator 도 part 크기로 다시 나눠서 올린다
+    chunks = (data[i : i + 100000] for i in range(0, len(data), 100000))
+    assert s3.upload_stream(chunks, "c", part_size=PART).num_parts == 3
+    path = tmp_path / "c.out"
+    s3.download_to("c", path)
+    assert path.read_bytes() == data
+    assert os.listdir(tmp_path) == ["c.out"]
+
+
+def test_upload_stream_small_object_uses_put_object(bucket):
+    s3 = S3(bucket)
+    result = s3.upload_stream(io.BytesIO(b"small"), "s")
+    assert (result.num_parts, result.upload_id) == (1, None)
+    out = io.BytesIO()
+    s3.download_to("s", out)
+    assert out.getvalue() == b"small"
+
+
+def test_upload_stream_resumes_failed_upload(bucket, monkeypatch):
+    s3 = S3(bucket)
+    data = os.urandom(3 * PART)
+    failing = {3}
+    calls = fail_parts(monkeypatch, s3, failing)
+    with pytest.raises(S3TransferError) as e:
+        s3.upload_stream(
+            io.BytesIO(data),
+            "r",
+            part_size=PART,
+            max_attempts=1,
+            abort_on_failure=False,
+        )
+    upload_id = e.value.upload_id
+    assert upload_id in pending_uploads(s3)
+
+    # 이미 올라간 part 는 건너뛰고 실패한 part 만 다시 올린다
+    failing.clear()
+    calls.clear()
+    result = s3.upload_stream(
+        io.BytesIO(data), "r", part_size=PART, upload_id=upload_id
+    )
+    assert calls == [3]
+    assert (result.num_bytes, result.num_parts) == (len(data), 3)
+    out = io.BytesIO()
+    s3.download_to("r", out)
+    assert out.getvalue() == data
+
+
+def test_upload_stream_aborts_on_failure(bucket, monkeypatch):
+    s3 = S3(bucket)
+    fail_parts(monkeypatch, s3, {2})
+    with pytest.raises(S3TransferError) as e:
+        s3.upload_stream(
+            io.BytesIO(os.urandom(2 * PART)), "x", part_size=PART, max_attempts=2
+        )
+    assert e.value.upload_id is None
+    assert pending_uploads(s3) == []
+    with pytest.raises(ClientError):
+        boto3.client("s3").head_object(Bucket=bucket, Key="x")
+
+
+def test_put_many_and_iter_objects_across_pages(bucket):
+    s3 = S3(bucket)
+    items = {f"f/{i:04d}": str(i).encode() for i in range(1050)}
+    result = s3.put_many(((k, v) for k, v in items.items()), max_workers=8)
+    assert (result.succeeded, result.ok) == (1050, True)
+    s3.put_image("g/x", b"keep")
+
+    keys = [x["Key"] for x in s3.iter_objects("f/", page_size=500)]
+    assert keys == sorted(items)
+    assert len(s3.get_file_list_all("f/")) == 1050
+    assert s3.get_many(["f/0001", "f/0002", "f/0001", "nope"]) == {
+        "f/0001": b"1",
+        "f/0002": b"2",
+        "nope": None,
+    }
+
+
+def test_rm_folder_deletes_more_than_one_batch(bucket):
+    s3 = S3(bucket)
+    s3.put_many({f"f/{i}": b"x" for i in range(1050)})
+    s3.put_image("g/x", b"keep")
+    assert s3.rm_folder("f/")
+    assert list(s3.iter_objects("f/")) == []
+    assert [x["Key"] for x in s3.iter_objects()] == ["g/x"]
+
+    result = s3.delete_keys(iter(["g/x"]))
+    assert (result.succeeded, result.ok) == (1, True)
+    assert list(s3.iter_objects()) == []
+
+
+def test_bulk_ops_report_failed_keys(bucket, monkeypatch):
+    s3 = S3(bucket)
+    put_object, delete_objects = s3.client.put_object, s3.client.delete_objects
+
+    def flaky_put(**kwargs):
+        if kwargs["Key"] == "bad":
+            raise ClientError(
+                {"Error": {"Code": "AccessDenied", "Message": "denied"}}, "PutObject"
+            )
+        return put_object(**kwargs)
+
+    def flaky_delete(Bucket, Delete):
+        # key 'keep' 은 지우지 않고 Errors 로 돌려준다
+        objects = [x for x in Delete["Objects"] if x["Key"] != "keep"]
+        response = (
+            delete_objects(Bucket=Bucket, Delete={**Delete, "Objects": objects})
+            if objects
+            else {}
+        )
+        if len(objects) < len(Delete["Objects"]):
+            response["Errors"] = [
+                {"Key": "keep", "Code": "AccessDenied", "Message": "denied"}
+            ]
+        return response
+
+    monkeypatch.setattr(s3.client, "put_object", flaky_put)
+    monkeypatch.setattr(s3.client, "delete_objects", flaky_delete)
+    result = s3.put_many({"a": b"1", "bad": b"2", "keep": b"3"})
+    assert (result.succeeded, result.errors) == (2, {"bad": "denied"})
+
+    result = s3.delete_keys(["a", "keep"], batch_size=1)
+    assert (result.succeeded, result.errors) == (1, {"keep": "denied"})
+    assert not s3.rm_folder("")
+    assert [x["Key"] for x in s3.iter_objects()] == ["keep"]
+
+
+def test_disk_cache_hits_and_revalidates_with_etag(bucket, monkeypatch, tmp_path):
+    cache = S3DiskCache(str(tmp_path), ttl=3600)
+    s3 = S3(bucket, cache=cache)
+    calls = count_get_object(monkeypatch, s3)
+    s3.put_file("a", b"v1", folder="f")
+
+    assert s3.get_file("a", folder="f") == b"v1"
+    assert s3.get_image("f/a") == b"v1"
+    assert (cache.stats.misses, cache.stats.hits, len(calls)) == (1, 1, 1)
+
+    # ttl 이 지나면 조건부 GET 으로 확인하고 바뀌지 않았으면 disk 에서 읽는다
+    expire(cache)
+    assert s3.get_file("a", folder="f") == b"v1"
+    assert s3.get_file("a", folder="f") == b"v1"
+    assert (cache.stats.revalidated, cache.stats.hits, len(calls)) == (1, 2, 2)
+
+    # object 가 바뀌면 새 ETag 로 다시 받는다
+    s3.put_file("a", b"v2", folder="f")
+    expire(cache)
+    assert s3.get_file("a", folder="f") == b"v2"
+    assert cache.stats.misses == 2
+    assert s3.get_file("missing") is None
+    assert cache.stats.errors == 0
+
+    # 같은 cache_dir 을 쓰는 다른 worker 도 S3 요청 없이 읽는다
+    other = S3(bucket, cache=S3DiskCache(str(tmp_path), ttl=3600))
+    other_calls = count_get_object(monkeypatch, other)
+    assert other.get_file("a", folder="f") == b"v2"
+    assert other.cache.stats.hits == 1 and other_calls == []
+
+
+def test_disk_cache_evicts_least_recently_used(bucket, monkeypatch, tmp_path):
+    cache = S3DiskCache(str(tmp_path), max_bytes=2500, ttl=3600)
+    s3 = S3(bucket, cache=cache)
+    for i in range(5):
+        s3.put_file(str(i), b"x" * 1000, folder="f")
+        assert s3.get_file(str(i), folder="f") == b"x" * 1000
+
+    assert cache.stats.misses == 5 and cache.stats.evictions == 3
+    assert cached_files(cache._objects_dir) == 2
+    # 삭제된 object 의 ref 도 정리된다
+    assert cached_files(cache._refs_dir) == 2
+
+    calls = count_get_object(monkeypatch, s3)
+    assert s3.get_file("4", folder="f") == b"x" * 1000
+    assert s3.get_file("0", folder="f") == b"x" * 1000
+    assert calls == ["f/0"]
+    assert cache.stats.to_dict() == {
+        "hits": 1,
+        "revalidated": 0,
+        "misses": 6,
+        "evictions": 4,
+        "errors": 0,
+    }
@@ -0,0 +1,87 @@
+import threading
+import time
+
+import boto3
+
+from common_lib.infra.sqs import SQS
+
+
+class CountingClient:
+    """
+    boto3 sqs client 의 receive_message 호출 수와 최대 동시 호출 수를 센다.
+    receive 마다 잠깐 기다려서 동시 요청이 겹치게 한다.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.calls = 0
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    def receive_message(self, **kwargs):
+        with self._lock:
+            self.calls += 1
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            time.sleep(0.02)
+            return self.client.receive_message(**kwargs)
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+def make_sqs(name: str, num: int) -> tuple[SQS, CountingClient]:
+    client = boto3.client("sqs")
+    queue_url = client.create_queue(QueueName=name)["QueueUrl"]
+    for idx in range(0, num, 10):
+        client.send_message_batch(
+            QueueUrl=queue_url,
+            Entries=[
+                {"Id": str(i), "MessageBody": f"m{i}"}
+                for i in range(idx, min(idx + 10, num))
+            ],
+        )
+    counting = CountingClient(client)
+    return SQS(name, boto3_sqs_client=counting), counting
+
+
+def test_receive_no_wait_drains_backlog_concurrently(aws):
+    sqs, client = make_sqs("q", 45)
+    messages = sqs.receive_message_batch_no_wait(100, max_workers=4)
+    # moto 는 동시 receive 에서 같은 message 를 두 번 줄 수 있으므로 body 집합으로 비교한다
+    assert {x["Body"] for x in messages} == {f"m{i}" for i in range(45)}
+    assert 1 < client.max_active <= 4
+    assert sqs.receive_message_batch_no_wait(100, max_workers=4) == []
+
+
+def test_receive_no_wait_respects_max_num_and_deadline(aws):
+    sqs, client = make_sqs("q", 45)
+    messages = sqs.receive_message_batch_no_wait(25, max_workers=4)
+    assert len(messages) == 25
+
+    calls = client.calls
+    assert sqs.receive_message_batch_no_wait(25, deadline_seconds=0) == []
+    assert client.calls == calls
+
+
+def test_iter_message_batches_streams_first_batch(aws):
+    sqs, client = make_sqs("q", 60)
+    batches = sqs.iter_message_batches(60, max_workers=2)
+    first = next(batches)
+    # 첫 batch 는 backlog 전체를 받기 전에 나오고, 진행 중인 요청은 max_workers 개 이하다
+    assert len(first) == 10
+    assert client.calls == 2
+    # generator 를 닫으면 새 receive 요청을 보내지 않는다
+    batches.close()
+    assert client.calls == 2
+
+    # 닫을 때 진행 중이던 batch 는 visibility timeout 동안 숨겨진다
+    rest = list(sqs.iter_message_batches(60, max_workers=2))
+    assert all(0 < len(batch) <= 10 for batch in rest)
+    bodies = {x["Body"] for batch in rest for x in batch}
+    assert len(bodies) >= 40 and not bodies & {x["Body"] for x in first}
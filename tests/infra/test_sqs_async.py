@@ -0,0 +1,154 @@
+import asyncio
+import itertools
+import time
+
+from common_lib.infra.sqs_async import AsyncSQSClient
+from common_lib.infra.sqs_bulk import RETRY_COUNT_ATTRIBUTE
+from common_lib.infra.sqs_codec import CODEC_ATTRIBUTE, GzipCodec
+
+QUEUE_URL = "https://sqs.local/000000000000/test-queue"
+
+
+class FakeAsyncSQS:
+    """
+    aiobotocore SQS client 와 같은 method 를 가진 in-memory queue
+    :param failures: send_message_batch 호출 순서별로 실패시킬 entry Id -> SenderFault
+    """
+
+    def __init__(self, failures: list[dict] = None):
+        self.messages: dict[str, dict] = {}
+        self.failures = list(failures or [])
+        self.batch_calls: list[list[str]] = []
+        self.deleted: list[str] = []
+        self.in_flight: set[str] = set()
+        self._ids = itertools.count()
+
+    async def get_queue_url(self, QueueName):
+        return {"QueueUrl": QUEUE_URL}
+
+    def _put(self, body, attributes=None, receive_count=1):
+        message_id = f"m-{next(self._ids)}"
+        self.messages[message_id] = {
+            "MessageId": message_id,
+            "ReceiptHandle": f"h-{message_id}",
+            "Body": body,
+            "Attributes": {
+                "SentTimestamp": str(int(time.time() * 1000)),
+                "ApproximateReceiveCount": str(receive_count),
+            },
+            "MessageAttributes": attributes or {},
+        }
+        return message_id
+
+    async def send_message(self, QueueUrl, MessageBody, DelaySeconds=0, **kwargs):
+        return {"MessageId": self._put(MessageBody, kwargs.get("MessageAttributes"))}
+
+    async def send_message_batch(self, QueueUrl, Entries):
+        self.batch_calls.append([x["Id"] for x in Entries])
+        failures = self.failures.pop(0) if self.failures else {}
+        response = {"Successful": [], "Failed": []}
+        for entry in Entries:
+            if entry["Id"] in failures:
+                response["Failed"].append(
+                    {
+                        "Id": entry["Id"],
+                        "Code": "InternalError",
+                        "SenderFault": failures[entry["Id"]],
+                    }
+                )
+                continue
+            message_id = self._put(entry["MessageBody"], entry.get("MessageAttributes"))
+            response["Successful"].append({"Id": entry["Id"], "MessageId": message_id})
+        return response
+
+    async def receive_message(
+        self, QueueUrl, AttributeNames, MessageAttributeNames, MaxNumberOfMessages, **kw
+    ):
+        # 받은 message 는 숨기고, 요청한 MessageAttributeNames 만 돌려준다 (SQS 와 같은 동작)
+        visible = [
+            x for x in self.messages.values() if x["MessageId"] not in self.in_flight
+        ]
+        out = []
+        for message in visible[:MaxNumberOfMessages]:
+            self.in_flight.add(message["MessageId"])
+            attributes = {
+                k: v
+                for k, v in message["MessageAttributes"].items()
+                if "All" in MessageAttributeNames or k in MessageAttributeNames
+            }
+            out.append({**message, "MessageAttributes": attributes})
+        return {"Messages": out} if out else {}
+
+    async def delete_message(self, QueueUrl, ReceiptHandle):
+        self.deleted.append(ReceiptHandle)
+
+    async def delete_message_batch(self, QueueUrl, Entries):
+        self.deleted.extend(x["ReceiptHandle"] for x in Entries)
+        for entry in Entries:
+            self.messages.pop(entry["Id"], None)
+        return {"Successful": [{"Id": x["Id"]} for x in Entries]}
+
+
+def test_publish_batch_and_recv_with_codec():
+    async def run():
+        client = FakeAsyncSQS()
+        sqs = await AsyncSQSClient.create(
+            "test-queue", client, codec=GzipCodec(min_bytes=0)
+        )
+        bodies = [f'{{"n": {i}, "pad": "{"x" * 100}"}}' for i in range(15)]
+        result = await sqs.publish_batch(bodies)
+        assert len(result.sent) == 15 and not result.failed
+        stored = list(client.messages.values())
+        assert all(CODEC_ATTRIBUTE in x["MessageAttributes"] for x in stored)
+
+        sqs.max_num_of_message = 20
+        messages = await sqs.recv(wait_time_seconds=0)
+        assert sorted(x.body for x in messages) == sorted(bodies)
+
+        await sqs.ack_batch([x.header for x in messages])
+        assert not client.messages
+
+    asyncio.run(run())
+
+
+def test_publish_batch_retries_only_non_sender_faults():
+    async def run():
+        client = FakeAsyncSQS(failures=[{"0": False, "1": True}])
+        sqs = await AsyncSQSClient.create("test-queue", client)
+        result = await sqs.publish_batch(
+            ["a", "b", "c"], backoff_seconds=0, raise_on_failure=False
+        )
+        assert sorted(result.sent) == [0, 2]
+        assert [(x.index, x.sender_fault) for x in result.failed] == [(1, True)]
+        assert client.batch_calls == [["0", "1", "2"], ["0"]]
+        assert result.num_calls == 2
+
+    asyncio.run(run())
+
+
+def test_publish_batch_gives_up_after_max_attempts():
+    async def run():
+        client = FakeAsyncSQS(failures=[{"0": False}] * 3)
+        sqs = await AsyncSQSClient.create("test-queue", client)
+        result = await sqs.publish_batch(
+            ["a"], max_attempts=3, backoff_seconds=0, raise_on_failure=False
+        )
+        assert not result.sent
+        assert [(x.index, x.attempts) for x in result.failed] == [(0, 3)]
+
+    asyncio.run(run())
+
+
+def test_recv_counts_retry_later_attempts():
+    async def run():
+        client = FakeAsyncSQS()
+        client._put(
+            "body",
+            {RETRY_COUNT_ATTRIBUTE: {"DataType": "Number", "StringValue": "2"}},
+            receive_count=1,
+        )
+        sqs = await AsyncSQSClient.create("test-queue", client)
+        messages = await sqs.recv(wait_time_seconds=0)
+        assert [x.header.num_trial for x in messages] == [3]
+
+    asyncio.run(run())
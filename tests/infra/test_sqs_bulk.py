@@ -0,0 +1,229 @@
+import random
+import threading
+import time
+
+import boto3
+import pytest
+
+from common_lib.infra.s3 import S3
+from common_lib.infra.sqs_bulk import (
+    DEAD_LETTER_REASON_ATTRIBUTE,
+    DEAD_LETTER_SOURCE_ATTRIBUTE,
+    PACKING_DECREASING,
+    PACKING_SEQUENTIAL,
+    RETRY_COUNT_ATTRIBUTE,
+    RecvPolicy,
+    SQSClient,
+    make_publish_chunks,
+)
+from common_lib.infra.sqs_codec import CODEC_ATTRIBUTE, GzipCodec
+from common_lib.infra.sqs_payload import PAYLOAD_POINTER_KEY, S3PayloadStore
+
+
+def reference_decreasing_chunks(sizes, max_bytes, max_entries):
+    """
+    PACKING_DECREASING 과 같은 선택을 정렬된 list 에서 pop 하는 방식으로 (O(n^2)) 계산한다
+    """
+    remaining = sorted((size, idx) for idx, size in enumerate(sizes))
+    chunks = []
+    while remaining:
+        chunk, capacity = [], max_bytes
+        while remaining and len(chunk) < max_entries:
+            reserved = sum(x for x, _ in remaining[: max_entries - len(chunk) - 1])
+            fits = [
+                pos for pos, (x, _) in enumerate(remaining) if x <= capacity - reserved
+            ]
+            if not fits:
+                fits = [pos for pos, (x, _) in enumerate(remaining) if x <= capacity]
+                if not fits:
+                    break
+            size, idx = remaining.pop(fits[-1])
+            chunk.append(idx)
+            capacity -= size
+        chunks.append(chunk)
+    return chunks
+
+
+@pytest.mark.parametrize("packing", [PACKING_SEQUENTIAL, PACKING_DECREASING])
+def test_publish_chunks_respect_limits(packing):
+    rng = random.Random(0)
+    for _ in range(200):
+        max_bytes, max_entries = rng.choice([100, 1000]), rng.randint(1, 10)
+        sizes = [rng.randint(0, max_bytes) for _ in range(rng.randint(0, 50))]
+        chunks = make_publish_chunks(sizes, max_bytes, max_entries, packing)
+        assert sorted(idx for chunk in chunks for idx in chunk) == list(
+            range(len(sizes))
+        )
+        assert all(0 < len(chunk) <= max_entries for chunk in chunks)
+        assert all(sum(sizes[idx] for idx in chunk) <= max_bytes for chunk in chunks)
+        if packing == PACKING_DECREASING:
+            assert chunks == reference_decreasing_chunks(sizes, max_bytes, max_entries)
+
+
+def test_decreasing_packing_uses_fewer_batches():
+    rng = random.Random(0)
+    sizes = [
+        rng.randint(40 * 1024, 150 * 1024)
+        if rng.random() < 0.2
+        else rng.randint(500, 8192)
+        for _ in range(2000)
+    ]
+    sequential = make_publish_chunks(sizes, packing=PACKING_SEQUENTIAL)
+    decreasing = make_publish_chunks(sizes, packing=PACKING_DECREASING)
+    assert len(decreasing) < len(sequential)
+    with pytest.raises(ValueError):
+        make_publish_chunks([300 * 1024])
+
+
+def make_client(resource, name: str, **kwargs) -> SQSClient:
+    resource.create_queue(QueueName=name, Attributes={"VisibilityTimeout": "1"})
+    return SQSClient(name, boto3_sqs_resource=resource, wait_time_seconds=0, **kwargs)
+
+
+def recv_all(client: SQSClient, rounds: int = 5) -> list:
+    messages = []
+    for _ in range(rounds):
+        messages.extend(client.recv())
+    return messages
+
+
+def payload_keys(bucket: str) -> list[str]:
+    response = boto3.client("s3").list_objects_v2(Bucket=bucket)
+    return [x["Key"] for x in response.get("Contents", [])]
+
+
+def test_publish_batch_concurrent_retries_only_failed_entries(aws, monkeypatch):
+    client = make_client(aws, "q", max_num_of_message=10)
+    send = client.client.send_message_batch
+    calls, seen = [], set()
+
+    def flaky_send(QueueUrl, Entries):
+        # chunk 의 첫 entry 는 처음 한 번 일시적으로 실패, body 가 'bad' 인 entry 는 항상 SenderFault
+        calls.append([x["Id"] for x in Entries])
+        retry = {Entries[0]["Id"]} - seen
+        seen.update(x["Id"] for x in Entries)
+        bad = {x["Id"] for x in Entries if x["MessageBody"] == "bad"}
+        response = send(
+            QueueUrl=QueueUrl,
+            Entries=[x for x in Entries if x["Id"] not in retry | bad],
+        )
+        response["Failed"] = [
+            {"Id": x, "Code": "InternalError", "SenderFault": False} for x in retry
+        ] + [{"Id": x, "Code": "InvalidMessage", "SenderFault": True} for x in bad]
+        return response
+
+    monkeypatch.setattr(client.client, "send_message_batch", flaky_send)
+    bodies = [f"m{i}" for i in range(25)]
+    bodies[7] = "bad"
+    result = client.publish_batch_concurrent(
+        bodies, max_workers=3, backoff_seconds=0.01
+    )
+
+    assert sorted(result.sent) == [i for i in range(25) if i != 7]
+    assert [(x.index, x.sender_fault, x.attempts) for x in result.failed] == [
+        (7, True, 1)
+    ]
+    # 재시도는 실패한 entry 만 다시 보낸다
+    assert sorted(len(x) for x in calls) == [1, 1, 1, 5, 10, 10]
+    assert result.num_calls == len(calls)
+    received = recv_all(client, rounds=10)
+    assert sorted(x.body for x in received) == sorted(
+        x for i, x in enumerate(bodies) if i != 7
+    )
+
+
+def test_payload_offload_round_trip(aws, bucket):
+    store = S3PayloadStore(S3(bucket), threshold=1000)
+    client = make_client(aws, "q", payload_store=store, max_num_of_message=10)
+    # 한 message 가 SQS 제한 (256 KB) 을 넘어도 S3 에 저장하고 pointer 만 보낸다
+    bodies = ["가" * 2000, "small", "x" * 300 * 1024]
+    result = client.publish_batch_concurrent(bodies)
+    assert result.ok
+    keys = payload_keys(bucket)
+    assert len(keys) == 2 and all(x.startswith("sqs-payload/") for x in keys)
+
+    raw = client.client.receive_message(
+        QueueUrl=client.queue_url, MaxNumberOfMessages=10, VisibilityTimeout=0
+    )["Messages"]
+    assert sum(PAYLOAD_POINTER_KEY in x["Body"] for x in raw) == 2
+    messages = recv_all(client)
+    assert sorted(x.body for x in messages) == sorted(bodies)
+    client.ack_batch([x.header for x in messages])
+
+    # 다른 bucket 을 가리키는 pointer 는 읽지 않고 message 를 건너뛴다
+    client.client.send_message(
+        QueueUrl=client.queue_url,
+        MessageBody=raw[0]["Body"].replace(bucket, "other-bucket"),
+    )
+    assert recv_all(client) == []
+    store.close()
+
+
+def test_retry_later_forwards_attributes_and_payload_pointer(aws, bucket):
+    store = S3PayloadStore(S3(bucket), threshold=100)
+    client = make_client(aws, "q", codec=GzipCodec(min_bytes=0), payload_store=store)
+    body = "".join(f"{i:05d}" for i in range(1000))
+    client.publish(body)
+    client.client.send_message(
+        QueueUrl=client.queue_url,
+        MessageBody="small",
+        MessageAttributes={"tenant": {"DataType": "String", "StringValue": "t1"}},
+    )
+    assert len(payload_keys(bucket)) == 1
+
+    messages = recv_all(client)
+    assert sorted(x.body for x in messages) == sorted([body, "small"])
+    assert client.retry_later(messages, RecvPolicy(retry_base_delay=0)) == []
+    # pointer 를 그대로 보내므로 S3 object 가 늘지 않는다
+    assert len(payload_keys(bucket)) == 1
+
+    retried = {x.body: x for x in recv_all(client)}
+    assert sorted(retried) == sorted([body, "small"])
+    assert retried[body].header.num_trial == 2
+    assert CODEC_ATTRIBUTE in retried[body].header.message_attributes
+    attributes = retried["small"].header.message_attributes
+    assert attributes["tenant"]["StringValue"] == "t1"
+    assert attributes[RETRY_COUNT_ATTRIBUTE]["StringValue"] == "1"
+    store.close()
+
+
+def test_poison_messages_move_to_dead_letter_queue(aws):
+    dlq = make_client(aws, "dlq")
+    client = make_client(
+        aws,
+        "q",
+        recv_policy=RecvPolicy(max_trials=1, dead_letter_queue=dlq),
+        codec=GzipCodec(min_bytes=0),
+    )
+    client.client.send_message(
+        QueueUrl=client.queue_url,
+        MessageBody="poison",
+        MessageAttributes={"tenant": {"DataType": "String", "StringValue": "t1"}},
+    )
+    client.publish("compressed")
+    assert len(recv_all(client)) == 2
+
+    # 다시 보이면 num_trial 이 2 가 되어 DLQ 로 옮겨진다
+    time.sleep(1.1)
+    assert recv_all(client) == []
+    moved = {x.body: x.header.message_attributes for x in recv_all(dlq)}
+    assert sorted(moved) == ["compressed", "poison"]
+    assert moved["poison"]["tenant"]["StringValue"] == "t1"
+    assert moved["poison"][DEAD_LETTER_REASON_ATTRIBUTE]["StringValue"] == "poison"
+    assert moved["compressed"][DEAD_LETTER_SOURCE_ATTRIBUTE]["StringValue"] == "q"
+    assert (
+        aws.get_queue_by_name(QueueName="q").attributes["ApproximateNumberOfMessages"]
+        == "0"
+    )
+
+
+def test_conn_is_a_session_per_thread(aws):
+    client = make_client(aws, "q")
+    sessions = []
+    thread = threading.Thread(target=lambda: sessions.append(client.conn))
+    thread.start()
+    thread.join()
+    assert client.conn is client.conn
+    assert sessions[0] is not client.conn
+    sqs = client.conn.client("sqs")
+    assert sqs.get_queue_url(QueueName="q")["QueueUrl"] == client.queue_url
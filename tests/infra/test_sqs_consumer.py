@@ -0,0 +1,221 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from common_lib.infra.sqs_consumer import SQSConsumer
+from common_lib.infra.sqs_scheduler import MultiQueueConsumer, QueueSpec
+from common_lib.models.message import ModelMessage, ModelMessageHeader
+from common_lib.utils.graceful_kill_helper import GracefulKillHelper
+
+
+class FakeSQSClient:
+    """
+    SQSClient 의 recv / ack_batch 만 가진 in-memory queue. message 를 모두 주면 on_empty 를 호출한다.
+    """
+
+    def __init__(self, sqs_name: str, num: int, on_empty=None):
+        self.sqs_name = sqs_name
+        self.pending = [
+            ModelMessage(
+                header=ModelMessageHeader(
+                    id=f"{sqs_name}-{i}",
+                    queue_url=sqs_name,
+                    handle=f"h-{i}",
+                    attributes={},
+                    num_trial=1,
+                ),
+                body=str(i),
+            )
+            for i in range(num)
+        ]
+        self.on_empty = on_empty
+        self.acked: list[str] = []
+        self.ack_calls: list[int] = []
+        self._lock = threading.Lock()
+
+    def recv(self, timeout=None):
+        with self._lock:
+            messages, self.pending = self.pending[:3], self.pending[3:]
+        if not messages and self.on_empty is not None:
+            self.on_empty()
+        return messages
+
+    def ack_batch(self, headers):
+        with self._lock:
+            self.acked.extend(x.id for x in headers)
+            self.ack_calls.append(len(headers))
+
+
+class FakeHeartbeat:
+    """
+    track / untrack 만 기록하는 VisibilityHeartbeat
+    """
+
+    def __init__(self):
+        self.tracked: set[str] = set()
+        self.num_tracked = 0
+        self.running = False
+        self._lock = threading.Lock()
+
+    def start(self):
+        self.running = True
+
+    def stop(self):
+        self.running = False
+
+    def track(self, header, received_at=None):
+        with self._lock:
+            self.tracked.add(header.handle)
+            self.num_tracked += 1
+
+    def untrack(self, header):
+        with self._lock:
+            self.tracked.discard(header.handle)
+
+
+class BrokenAfterExecutor(ThreadPoolExecutor):
+    """
+    limit 개를 submit 한 뒤에는 shutdown 된 executor 처럼 RuntimeError 를 낸다
+    """
+
+    def __init__(self, limit: int):
+        super().__init__(max_workers=2)
+        self.limit = limit
+        self.submitted = 0
+
+    def submit(self, fn, *args, **kwargs):
+        self.submitted += 1
+        if self.submitted > self.limit:
+            raise RuntimeError("cannot schedule new futures after shutdown")
+        return super().submit(fn, *args, **kwargs)
+
+
+def run_with_timeout(target, timeout: float = 10.0):
+    result = {}
+    thread = threading.Thread(target=lambda: result.setdefault("value", target()))
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "consumer did not finish draining"
+    return result["value"]
+
+
+def test_sqs_consumer_acks_processed_messages():
+    consumer = None
+    client = FakeSQSClient("q", 10, on_empty=lambda: consumer.stop())
+    consumer = SQSConsumer(client, handler=lambda m: m.body, ack_flush_interval=0.1)
+    metrics = run_with_timeout(consumer.run)
+    assert sorted(client.acked) == sorted(f"q-{i}" for i in range(10))
+    assert metrics.processed == metrics.acked == 10
+
+
+def test_sqs_consumer_flushes_acks_before_stop():
+    consumer = None
+
+    def on_empty():
+        # 종료 전에 (drain 의 강제 flush 없이) 모든 ack 가 나가야 멈춘다
+        if len(client.acked) == 13 or time.time() > deadline:
+            consumer.stop()
+        time.sleep(0.01)
+
+    client = FakeSQSClient("q", 13, on_empty=on_empty)
+    consumer = SQSConsumer(
+        client, handler=lambda m: m.body, ack_batch_size=10, ack_flush_interval=0.2
+    )
+    deadline = time.time() + 5
+    metrics = run_with_timeout(consumer.run)
+    assert sorted(client.acked) == sorted(f"q-{i}" for i in range(13))
+    assert time.time() < deadline
+    assert metrics.acked == 13 and metrics.ack_calls == sum(
+        -(-x // 10) for x in client.ack_calls
+    )
+    assert 0 < metrics.ack_latency_avg <= metrics.ack_latency_max < 5
+
+
+def test_sqs_consumer_drains_on_graceful_kill():
+    client = FakeSQSClient("q", 8)
+    client.on_empty = lambda: setattr(GracefulKillHelper, "kill_now", True)
+    processed = []
+    consumer = SQSConsumer(
+        client,
+        handler=lambda m: time.sleep(0.05) or processed.append(m.header.id),
+        max_workers=2,
+        ack_flush_interval=10,
+    )
+    try:
+        metrics = run_with_timeout(consumer.run)
+    finally:
+        GracefulKillHelper.kill_now = False
+    assert (
+        sorted(processed) == sorted(client.acked) == sorted(f"q-{i}" for i in range(8))
+    )
+    assert metrics.received == metrics.processed == metrics.acked == 8
+
+
+def test_sqs_consumer_releases_permit_on_submit_failure():
+    client = FakeSQSClient("q", 10)
+    executor = BrokenAfterExecutor(limit=2)
+    consumer = SQSConsumer(
+        client, handler=lambda m: m.body, executor=executor, max_in_flight=2
+    )
+    metrics = run_with_timeout(consumer.run)
+    executor.shutdown()
+    assert metrics.processed == 2
+    assert metrics.failed == metrics.received - 2
+    assert len(client.acked) == 2
+
+
+def test_multi_queue_consumer_acks_per_queue():
+    consumer = None
+    a = FakeSQSClient("a", 7, on_empty=lambda: consumer.stop())
+    b = FakeSQSClient("b", 5)
+    consumer = MultiQueueConsumer(
+        [
+            QueueSpec(client=a, handler=lambda m: m.body),
+            QueueSpec(client=b, handler=lambda m: m.body, weight=2),
+        ],
+        ack_flush_interval=0.1,
+    )
+    metrics = run_with_timeout(consumer.run)
+    assert sorted(a.acked) == sorted(f"a-{i}" for i in range(7))
+    assert metrics["a"].acked == 7
+    assert metrics["b"].acked == len(b.acked) == metrics["b"].processed
+
+
+def test_multi_queue_consumer_releases_permit_on_submit_failure():
+    client = FakeSQSClient("q", 10)
+    executor = BrokenAfterExecutor(limit=2)
+    consumer = MultiQueueConsumer(
+        [QueueSpec(client=client, handler=lambda m: m.body)],
+        executor=executor,
+        max_in_flight=2,
+    )
+    metrics = run_with_timeout(consumer.run)
+    executor.shutdown()
+    assert metrics["q"].processed == 2
+    assert metrics["q"].failed == metrics["q"].received - 2
+    assert len(client.acked) == 2
+
+
+def test_multi_queue_consumer_heartbeat_from_receive_to_ack():
+    consumer = None
+    heartbeat = FakeHeartbeat()
+    a = FakeSQSClient("a", 6, on_empty=lambda: consumer.stop())
+    buffered = []
+
+    def handler(message):
+        # 처리 시작 전 (buffer 에서 기다리는 동안) 에도 이미 연장 대상이다
+        buffered.append(message.header.handle in heartbeat.tracked)
+        if message.body == "3":
+            raise ValueError("fail")
+
+    consumer = MultiQueueConsumer(
+        [QueueSpec(client=a, handler=handler, heartbeat=heartbeat)],
+        ack_flush_interval=0.1,
+    )
+    metrics = run_with_timeout(consumer.run)
+    assert all(buffered) and len(buffered) == 6
+    assert heartbeat.num_tracked == 6
+    assert metrics["a"].acked == 5 and metrics["a"].failed == 1
+    # ack 또는 실패한 message 는 더 이상 연장하지 않는다
+    assert not heartbeat.tracked
+    assert not heartbeat.running
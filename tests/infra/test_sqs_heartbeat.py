@@ -0,0 +1,51 @@
+import time
+
+from common_lib.infra.sqs_heartbeat import (
+    SQS_MAX_VISIBILITY_SECONDS,
+    VisibilityHeartbeat,
+)
+from common_lib.models.message import ModelMessageHeader
+
+
+class FakeVisibilityClient:
+    """
+    change_visibility_batch 호출만 기록하는 SQSClient
+    """
+
+    def __init__(self):
+        self.calls: list[tuple[list[str], int]] = []
+
+    def change_visibility_batch(self, headers, visibility_timeout):
+        self.calls.append((sorted(x.id for x in headers), visibility_timeout))
+        return []
+
+
+def make_header(msg_id: str) -> ModelMessageHeader:
+    return ModelMessageHeader(
+        id=msg_id, queue_url="q", handle=f"h-{msg_id}", attributes={}, num_trial=1
+    )
+
+
+def test_extend_due_clamps_to_visibility_cap():
+    client = FakeVisibilityClient()
+    heartbeat = VisibilityHeartbeat(
+        client, visibility_timeout=60, extend_margin=10, initial_visibility_timeout=0
+    )
+    now = time.time()
+    heartbeat.track(make_header("new"), received_at=now)
+    heartbeat.track(
+        make_header("near"), received_at=now - SQS_MAX_VISIBILITY_SECONDS + 40
+    )
+    heartbeat.track(
+        make_header("done"), received_at=now - SQS_MAX_VISIBILITY_SECONDS + 5
+    )
+
+    heartbeat.extend_due()
+    assert sorted(client.calls) == [(["near"], 39), (["new"], 60)]
+    # 12시간에 도달한 message 는 더 이상 추적하지 않는다
+    assert len(heartbeat) == 2
+    assert heartbeat.num_extended == 2
+
+    client.calls.clear()
+    heartbeat.extend_due()
+    assert client.calls == []
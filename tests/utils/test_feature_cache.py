@@ -0,0 +1,341 @@
+import hashlib
+import os
+
+import numpy as np
+import pytest
+
+from common_lib.models.img_feature import FeatureListForGroup, FeatureSet, ModelFeature
+from common_lib.utils.feature_cache import (
+    FeatureCacheShard,
+    PersistentFeatureIndex,
+    append_feature_shard,
+    compact_feature_set,
+    convert_npz_to_columnar,
+    delete_feature_shards,
+    diff_download_list,
+    load_feature_cache,
+    open_feature_shard,
+    read_legacy_npz,
+    shard_paths,
+    to_digests,
+)
+
+DIM = 4
+
+
+def feat_hash(key) -> str:
+    return hashlib.md5(str(key).encode("utf-8")).hexdigest()
+
+
+def make_shard(file_dir: str, name: str, keys: list) -> FeatureCacheShard:
+    """
+    i 번째 row 의 feature 가 모두 i 인 shard 를 저장한다. (product_id 는 'p{key}')
+    """
+    features = np.array(
+        [[[float(i)] * DIM for i in range(len(keys))]] * 3, dtype=np.float32
+    ).reshape(3, len(keys), DIM)
+    return FeatureCacheShard(
+        name=name,
+        features=features,
+        feat_hashes=np.array([feat_hash(x) for x in keys], dtype="S32"),
+        product_ids=np.array([f"p{x}".encode("utf-8") for x in keys]),
+    ).save(file_dir)
+
+
+def make_feature_set(file_dir: str, set_id: str, names: list[str]) -> FeatureSet:
+    return FeatureSet(
+        set_id=set_id,
+        feature_id="f",
+        model_version="v1",
+        index_group_id="g",
+        file_dir=file_dir,
+        file_names=",".join(names),
+    )
+
+
+def make_legacy_npz(file_dir: str, name: str, keys: list) -> str:
+    """
+    기존 형식의 npz (FeatureListForGroup / ModelFeature object 배열) 를 저장한다.
+    i 번째 row 의 feature 는 LOW=i, MEDIUM=i+0.5, HIGH=없음
+    """
+    feature_lists = np.empty(len(keys), dtype=object)
+    features = np.empty(len(keys), dtype=object)
+    for i, key in enumerate(keys):
+        feature_lists[i] = FeatureListForGroup(
+            model_version="v1",
+            feature_id="f",
+            product_id=f"p{key}",
+            feat_hash=feat_hash(key),
+        )
+        features[i] = ModelFeature(
+            feature_without_color=[float(i)] * DIM,
+            feature_with_color=[i + 0.5] * DIM,
+            feature_with_color_more=None,
+        )
+    path = os.path.join(file_dir, name)
+    with open(path, "wb") as f:
+        np.savez(f, feature_lists=feature_lists, features=features)
+    return path
+
+
+def lookup(feature_set: FeatureSet, keys: list, use_index: bool) -> list[int]:
+    cache = load_feature_cache(feature_set, use_index=use_index)
+    return cache.lookup([feat_hash(x) for x in keys]).tolist()
+
+
+def test_index_ignores_hits_in_other_feature_sets(tmp_path):
+    file_dir = str(tmp_path)
+    make_shard(file_dir, "A.0", ["h", "a"])
+    make_shard(file_dir, "B.0", ["b", "h"])
+    set_a = make_feature_set(file_dir, "A", ["A.0"])
+    set_b = make_feature_set(file_dir, "B", ["B.0"])
+
+    # A 가 먼저 index 에 들어가서 h 의 첫 항목은 A.0 이다
+    assert lookup(set_a, ["x", "h", "a"], True) == [-1, 0, 1]
+    expected = lookup(set_b, ["x", "h", "b"], False)
+    assert expected == [-1, 1, 0]
+    assert lookup(set_b, ["x", "h", "b"], True) == expected
+
+
+def test_index_ignores_hits_in_same_segment_other_shard(tmp_path):
+    file_dir = str(tmp_path)
+    make_shard(file_dir, "A.0", ["h"])
+    make_shard(file_dir, "B.0", ["b", "h"])
+    index = PersistentFeatureIndex.open(file_dir)
+    index.sync([FeatureCacheShard.open(file_dir, x) for x in ("A.0", "B.0")])
+    index.compact()
+    assert len(index.segments) == 1
+
+    set_b = make_feature_set(file_dir, "B", ["B.0"])
+    assert lookup(set_b, ["h", "b"], True) == [1, 0]
+
+
+def test_sync_keeps_other_sets_and_reindexes_changed_shard(tmp_path):
+    file_dir = str(tmp_path)
+    make_shard(file_dir, "A.0", ["a"])
+    make_shard(file_dir, "B.0", ["b", "c"])
+    set_a = make_feature_set(file_dir, "A", ["A.0"])
+    set_b = make_feature_set(file_dir, "B", ["B.0"])
+    lookup(set_a, [], True)
+    assert lookup(set_b, ["b", "c"], True) == [0, 1]
+
+    # 같은 이름, 같은 row 수로 다시 만든 shard
+    shard = make_shard(file_dir, "B.0", ["c", "b"])
+    stat = os.stat(os.path.join(file_dir, "B.0.feat_hash.npy"))
+    os.utime(
+        os.path.join(file_dir, "B.0.feat_hash.npy"),
+        ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000),
+    )
+    assert lookup(set_b, ["b", "c"], True) == [1, 0]
+    assert lookup(set_a, ["a"], True) == [0]
+
+    index = PersistentFeatureIndex.open(file_dir)
+    assert sorted(x for x in index.shard_names if x) == ["A.0", "B.0"]
+    index.compact()
+    assert index.shard_names == ["A.0", "B.0"]
+    assert len(index) == 3
+    assert shard.name == "B.0"
+    assert lookup(set_b, ["b", "c"], True) == [1, 0]
+
+
+def test_index_persists_across_loads(tmp_path):
+    file_dir = str(tmp_path)
+    make_shard(file_dir, "A.0", ["a", "b"])
+    make_shard(file_dir, "A.1", ["c"])
+    set_a = make_feature_set(file_dir, "A", ["A.0", "A.1"])
+    assert lookup(set_a, ["c", "a", "z"], True) == [2, 0, -1]
+
+    index = PersistentFeatureIndex.open(file_dir)
+    assert index.shard_names == ["A.0", "A.1"]
+    assert len(index.segments) == 2
+    index.compact()
+    assert len(PersistentFeatureIndex.open(file_dir).segments) == 1
+    assert lookup(set_a, ["c", "a", "z"], True) == [2, 0, -1]
+
+
+def test_persistent_index_lookup_sync_and_rebuild(tmp_path):
+    file_dir = str(tmp_path)
+    shards = [
+        make_shard(file_dir, "A.0", ["a", "h"]),
+        make_shard(file_dir, "B.0", ["h", "b", "c"]),
+    ]
+    index = PersistentFeatureIndex.open(file_dir)
+    index.sync(shards)
+    segments = list(index.segments)
+    index.sync(shards)
+    assert index.segments == segments
+
+    digests = to_digests([feat_hash(x) for x in ["c", "h", "z"]])
+    shard_idx, rows = index.lookup(digests)
+    assert shard_idx.tolist() == [1, 0, -1]
+    assert rows.tolist() == [2, 1, -1]
+    shard_idx, rows = index.lookup(digests, np.array([False, True]))
+    assert (shard_idx.tolist(), rows.tolist()) == ([1, 1, -1], [2, 0, -1])
+
+    index.rebuild([shards[1]])
+    reopened = PersistentFeatureIndex.open(file_dir)
+    assert reopened.shard_names == ["B.0"]
+    assert len(reopened) == 3
+    assert reopened.lookup(digests)[0].tolist() == [0, 0, -1]
+    # 이전 segment 파일은 지운다
+    assert not any(os.path.exists(os.path.join(file_dir, x)) for x in segments)
+
+
+def download_item(key, product_id=None) -> FeatureListForGroup:
+    return FeatureListForGroup(
+        model_version="v1",
+        feature_id="f",
+        product_id=product_id or f"p{key}",
+        feat_hash=feat_hash(key),
+    )
+
+
+def test_diff_download_list_matches_legacy(tmp_path):
+    pytest.importorskip("model_embedding_msgspec")
+    from common_lib.utils.img_feature import (
+        get_download_list_from_cached_feature,
+        load_cached_feature_list,
+    )
+
+    file_dir = str(tmp_path)
+    make_legacy_npz(file_dir, "old.npz", ["a", "b", "c"])
+    make_shard(file_dir, "A.0", ["d"])
+    feature_set = make_feature_set(file_dir, "A", ["old.npz", "A.0"])
+    download_list = [
+        download_item(x) for x in ["x", "b", "y", "x", "d", "z", "a", "y", "b"]
+    ]
+
+    diff = diff_download_list(load_feature_cache(feature_set), download_list)
+    # legacy 는 npz 만 읽으므로 columnar shard 의 항목은 직접 넣는다
+    cached_lists, cached_features = load_cached_feature_list(
+        make_feature_set(file_dir, "A", ["old.npz"])
+    )
+    cached, new_download_list = get_download_list_from_cached_feature(
+        download_list, cached_lists + [download_item("d")], cached_features + [None]
+    )
+
+    # 입력 순서를 유지하고 feat_hash 중복은 처음 것만 남긴다
+    assert [x.feat_hash for x in diff.new_download_list] == [
+        x.feat_hash for x in new_download_list
+    ]
+    assert [x.feat_hash for x in diff.new_download_list] == [
+        feat_hash(x) for x in "xyz"
+    ]
+    assert diff.new_download_list[0] is download_list[0]
+    assert diff.download_idx.tolist() == [1, 4, 6, 8]
+    assert diff.cached_rows.tolist() == [1, 3, 0, 1]
+    assert all(download_list[i].feat_hash in cached for i in diff.download_idx)
+
+
+def test_diff_download_list_empty():
+    diff = diff_download_list(load_feature_cache(None), [download_item("a")])
+    assert diff.download_idx.tolist() == []
+    assert diff.new_download_list[0].product_id == "pa"
+    assert not diff_download_list(load_feature_cache(None), []).new_download_list
+
+
+def test_legacy_npz_round_trip(tmp_path):
+    file_dir = str(tmp_path)
+    path = make_legacy_npz(file_dir, "old.npz", ["a", "b", "c"])
+
+    legacy = read_legacy_npz(path)
+    shard = convert_npz_to_columnar(path)
+    assert shard.name == legacy.name == "old"
+    assert all(os.path.exists(x) for x in shard_paths(file_dir, "old"))
+    assert isinstance(shard.features, np.memmap)
+    assert shard.feat_hashes.tolist() == [feat_hash(x).encode() for x in "abc"]
+    assert shard.product_ids.tolist() == [b"pa", b"pb", b"pc"]
+    assert np.array_equal(shard.features, legacy.features)
+    assert shard.get_features("LOW", np.array([2])).tolist() == [[2.0] * DIM]
+    assert shard.get_features("MEDIUM").tolist() == [[i + 0.5] * DIM for i in range(3)]
+    # 없는 vector 는 0 으로 채운다
+    assert not shard.get_features("HIGH").any()
+
+
+def test_load_feature_cache_converts_legacy_npz_once(tmp_path):
+    file_dir = str(tmp_path)
+    make_legacy_npz(file_dir, "old.npz", ["a", "b"])
+    make_shard(file_dir, "A.0", ["c"])
+    feature_set = make_feature_set(file_dir, "A", ["old.npz", "A.0"])
+
+    assert lookup(feature_set, ["c", "b", "z"], True) == [2, 1, -1]
+    assert open_feature_shard(file_dir, "old.npz", convert_legacy=False).fingerprint
+    os.remove(os.path.join(file_dir, "old.npz"))
+    # 변환된 파일이 있으면 npz 없이도 열린다
+    cache = load_feature_cache(feature_set)
+    assert cache.get_product_ids(np.array([0, 2])) == ["pa", "pc"]
+    assert cache.take(np.array([1, 2]), "MEDIUM").tolist() == [[1.5] * DIM, [0.0] * DIM]
+
+    make_legacy_npz(file_dir, "old.npz", ["a", "b"])
+    delete_feature_shards(file_dir, ["old.npz"])
+    assert not any(x.startswith("old.") for x in os.listdir(file_dir))
+
+
+def append(feature_set: FeatureSet, keys: list) -> FeatureCacheShard:
+    # i 번째 row 의 feature 가 모두 i, (N, 3, D)
+    features = np.broadcast_to(
+        np.arange(len(keys), dtype=np.float32)[:, None, None], (len(keys), 3, DIM)
+    )
+    return append_feature_shard(
+        feature_set,
+        feat_hashes=[feat_hash(x) for x in keys],
+        product_ids=[f"p{x}" for x in keys],
+        features=features,
+    )
+
+
+def test_append_feature_shard_updates_feature_set_and_index(tmp_path):
+    feature_set = make_feature_set(str(tmp_path), "A", [])
+    feature_set.file_names = None
+    assert append(feature_set, []) is None
+
+    first = append(feature_set, ["a", "b"])
+    second = append(feature_set, ["c"])
+    assert feature_set.file_names == f"{first.name},{second.name}"
+    assert first.name.startswith("A.")
+    assert (feature_set.file_count, feature_set.feature_count) == (2, 3)
+    assert PersistentFeatureIndex.open(str(tmp_path)).shard_names == [
+        first.name,
+        second.name,
+    ]
+
+    cache = load_feature_cache(feature_set)
+    assert cache.lookup([feat_hash(x) for x in ["c", "a", "z"]]).tolist() == [2, 0, -1]
+    assert cache.get_product_ids(np.array([2, 1])) == ["pc", "pb"]
+    # (N, 3, D) 로 받은 feature 는 (3, N, D) 로 저장된다
+    assert cache.take(np.array([1]), "LOW").tolist() == [[1.0] * DIM]
+
+
+def test_compact_feature_set_keeps_other_sets_in_index(tmp_path):
+    file_dir = str(tmp_path)
+    set_a = make_feature_set(file_dir, "A", [])
+    set_b = make_feature_set(file_dir, "B", [])
+    set_a.file_names = set_b.file_names = None
+    append(set_b, ["b", "h"])
+    for keys in (["a", "h"], ["h", "c"], ["d"]):
+        append(set_a, keys)
+    names = set_a.file_names.split(",")
+    segments_before = PersistentFeatureIndex.open(file_dir).segments
+
+    assert compact_feature_set(set_a, min_shard_rows=3, max_small_shards=4) == []
+    removed = compact_feature_set(set_a, min_shard_rows=3, max_small_shards=3)
+    assert removed == names
+    assert set_a.file_count == 1
+    # 같은 feat_hash 는 앞의 것만 남는다
+    assert set_a.feature_count == 4
+
+    index = PersistentFeatureIndex.open(file_dir)
+    # B 의 segment 는 다시 만들지 않는다
+    assert index.segments[: len(segments_before)] == segments_before
+    assert sorted(x for x in index.shard_names if x) == sorted(
+        set_b.file_names.split(",") + [set_a.file_names]
+    )
+
+    delete_feature_shards(file_dir, removed)
+    keys = ["a", "h", "c", "d", "b"]
+    expected = lookup(set_a, keys, False)
+    assert expected == [0, 1, 2, 3, -1]
+    assert lookup(set_a, keys, True) == expected
+    assert lookup(set_b, keys, True) == lookup(set_b, keys, False) == [-1, 1, -1, -1, 0]
+    cache = load_feature_cache(set_a)
+    assert cache.get_product_ids(np.array([0, 1, 2, 3])) == ["pa", "ph", "pc", "pd"]